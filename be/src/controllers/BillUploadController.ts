@@ -1,11 +1,12 @@
 import { Request, Response } from "express";
-import { spawn } from "child_process";
-import path from "path";
 import fs from "fs";
+import os from "os";
+import path from "path";
 import { asyncHandler } from "../utils/AsyncHandler";
 import { ApiResponse } from "../utils/ApiResponse";
 import { ApiError } from "../utils/ApiError";
 import { AILogger } from "../utils/aiLogger";
+import { AgentWorker } from "../services/AgentWorker";
 
 // eslint-disable-next-line @typescript-eslint/no-require-imports
 const pdfParse = require("pdf-parse");
@@ -58,20 +59,10 @@ export class BillUploadController {
         );
       }
 
-      // Spawn Python agent for AI extraction
-      const pythonScriptPath = path.join(
-        __dirname,
-        "../python-agent/bill_parser_agent.py"
-      );
-      const pythonExecutable = path.resolve(
-        __dirname,
-        "../../venv/Scripts/python.exe"
-      );
-
       // Verify Python executable exists
-      if (!fs.existsSync(pythonExecutable)) {
+      if (!fs.existsSync(AgentWorker.pythonExecutable)) {
         console.error(
-          `[BillUploadController] ❌ Python executable not found: ${pythonExecutable}`
+          `[BillUploadController] ❌ Python executable not found: ${AgentWorker.pythonExecutable}`
         );
         throw new ApiError(
           500,
@@ -79,59 +70,27 @@ export class BillUploadController {
         );
       }
 
-      // Verify Python script exists
-      if (!fs.existsSync(pythonScriptPath)) {
-        console.error(
-          `[BillUploadController] ❌ Python script not found: ${pythonScriptPath}`
-        );
-        throw new ApiError(500, "Bill parser script not found.");
-      }
-
-      console.log(
-        `[BillUploadController] Python script path: ${pythonScriptPath}`
-      );
-      console.log(
-        `[BillUploadController] Python executable: ${pythonExecutable}`
-      );
-      console.log(`[BillUploadController] Spawning Python agent...`);
       console.log(
         `[BillUploadController] Mode: ${isImageBased ? "VISION" : "TEXT"}`
       );
 
-      console.log(`[BillUploadController] Spawning Python agent process...`);
-      const pythonProcess = spawn(pythonExecutable, [pythonScriptPath]);
-
-      let outputData = "";
-      let errorData = "";
-
-      // Handle process errors
-      pythonProcess.on("error", (err) => {
-        console.error(
-          `[BillUploadController] ❌ Failed to spawn Python process:`,
-          err
-        );
-        if (!res.headersSent) {
-          const errorResponse = new ApiError(
-            500,
-            `Failed to start bill parser: ${err.message}`
-          );
-          res.status(errorResponse.statusCode).json(errorResponse);
-        }
-      });
-
-      // Prepare payload - include base64 for image-based PDFs
+      // Prepare payload - scanned PDFs are handed over as a temp file path
       const payload: {
         pdfText?: string;
-        pdfBase64?: string;
+        pdfPath?: string;
         isImageBased: boolean;
       } = {
         isImageBased,
       };
 
       if (isImageBased) {
-        payload.pdfBase64 = pdfBuffer.toString("base64");
+        payload.pdfPath = path.join(
+          os.tmpdir(),
+          `wattwise-bill-${process.pid}-${Date.now()}.pdf`
+        );
+        fs.writeFileSync(payload.pdfPath, pdfBuffer);
         console.log(
-          `[BillUploadController] Prepared payload with BASE64 data (${payload.pdfBase64.length} chars)`
+          `[BillUploadController] Prepared payload with PDF file (${pdfBuffer.length} bytes)`
         );
       } else {
         payload.pdfText = pdfText;
@@ -140,116 +99,33 @@ export class BillUploadController {
         );
       }
 
-      // Handle stream errors
-      pythonProcess.stdin.on("error", (err) => {
-        console.error(`[BillUploadController] ❌ Stdin Error:`, err);
-      });
-
+      let result: any;
       try {
-        pythonProcess.stdin.write(JSON.stringify(payload));
-        pythonProcess.stdin.end();
-        console.log(
-          `[BillUploadController] Payload written to Python stdin. Waiting for response...`
-        );
-      } catch (writeErr) {
-        console.error(
-          `[BillUploadController] ❌ Failed to write to stdin:`,
-          writeErr
-        );
-        throw new ApiError(500, "Failed to communicate with analysis agent");
-      }
-
-      pythonProcess.stdout.on("data", (data) => {
-        const chunk = data.toString();
-        outputData += chunk;
-      });
-
-      pythonProcess.stderr.on("data", (data) => {
-        const errChunk = data.toString();
-        errorData += errChunk;
-        console.log(`[BillUploadController] ⚠️ Agent Log/Error: ${errChunk}`);
-      });
-
-      pythonProcess.on("close", (code) => {
-        console.log(
-          `[BillUploadController] Python agent exited with code: ${code}`
-        );
-
-        console.log(
-          `[BillUploadController] Full Output Data Length: ${outputData.length}`
-        );
-        // Log first 200 chars to see what we got
-        console.log(
-          `[BillUploadController] Output Preview: ${outputData.substring(
-            0,
-            200
-          )}...`
-        );
-
-        if (errorData) {
-          console.log(`[BillUploadController] Full Stderr Data: ${errorData}`);
+        result = await AgentWorker.call("bill", payload, "Bill Parser");
+      } catch (agentErr: any) {
+        AILogger.error("Bill Parser Agent reported error", agentErr.message);
+        const errorResponse = new ApiError(500, agentErr.message);
+        return res.status(errorResponse.statusCode).json(errorResponse);
+      } finally {
+        if (payload.pdfPath) {
+          fs.rm(payload.pdfPath, { force: true }, () => {});
         }
+      }
 
-        // Guard against multiple responses
-        if (res.headersSent) {
-          console.log(
-            `[BillUploadController] ⚠️ Response already sent, skipping.`
-          );
-          return;
-        }
-
-        if (code !== 0) {
-          console.error(
-            `[BillUploadController] ❌ Agent failed with non-zero exit code.`
-          );
-          AILogger.error("Bill Parser Agent failed", errorData);
-          const errorResponse = new ApiError(
-            500,
-            "Failed to parse bill data - Agent Error"
-          );
-          return res.status(errorResponse.statusCode).json(errorResponse);
-        }
-
-        try {
-          const result = JSON.parse(outputData);
-
-          if (result.error) {
-            AILogger.error("Bill Parser Agent reported error", result.error);
-            const errorResponse = new ApiError(500, result.error);
-            return res.status(errorResponse.statusCode).json(errorResponse);
-          }
-
-          console.log(
-            `[BillUploadController] Parsed result:`,
-            JSON.stringify(result, null, 2)
-          );
-          AILogger.log("Bill parsing complete");
-          console.log(
-            `[BillUploadController] ========== PDF UPLOAD SUCCESS ==========`
-          );
-          const successResponse = new ApiResponse(
-            200,
-            result,
-            "Bill parsed successfully"
-          );
-          res.status(200).json(successResponse);
-        } catch (err: any) {
-          console.error(
-            `[BillUploadController] ❌ JSON Parse Error:`,
-            err.message
-          );
-          console.error(
-            `[BillUploadController] Raw output that failed to parse:`,
-            outputData
-          );
-          AILogger.error("Failed to parse agent output", err);
-          const errorResponse = new ApiError(
-            500,
-            "Invalid response from bill parser"
-          );
-          res.status(errorResponse.statusCode).json(errorResponse);
-        }
-      });
+      console.log(
+        `[BillUploadController] Parsed result:`,
+        JSON.stringify(result, null, 2)
+      );
+      AILogger.log("Bill parsing complete");
+      console.log(
+        `[BillUploadController] ========== PDF UPLOAD SUCCESS ==========`
+      );
+      const successResponse = new ApiResponse(
+        200,
+        result,
+        "Bill parsed successfully"
+      );
+      res.status(200).json(successResponse);
     } catch (error: any) {
       AILogger.error("PDF parsing error", error);
       throw new ApiError(500, `Failed to process PDF: ${error.message}`);
@@ -1,32 +1,35 @@
 import sys
 import json
-import os
-import google.generativeai as genai
-from dotenv import load_dotenv
+from wattwise_agents.cache import get_cache
+from wattwise_agents.metrics import span
+from wattwise_agents.prompts import appliance_table, budget, record
+from wattwise_agents.runtime import GeminiAgent
+from wattwise_agents.schema import SUGGESTIONS, Decoder, object_schema
 
-# Load environment variables
-load_dotenv()
+OUTPUT = Decoder(object_schema({"carbonFootprint": {"type": "STRING"}, "suggestions": SUGGESTIONS}))
 
-class CarbonFootprintAgent:
-    def __init__(self):
-        self.api_key = os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
-            raise ValueError("GEMINI_API_KEY not found")
-        genai.configure(api_key=self.api_key)
-        # Using gemini-1.5-flash for better availability/speed
-        self.model = genai.GenerativeModel('gemini-2.5-pro')
+class CarbonFootprintAgent(GeminiAgent):
+    name = "carbon"
+    # Using gemini-1.5-flash for better availability/speed
+    model_name = 'gemini-2.5-pro'
 
-    def analyze(self, data):
-        """
-        Analyzes the bill data and returns carbon footprint + savings percentages.
-        """
-        breakdown = data.get('breakdown', [])
-        
-        prompt = f"""
+    def __init__(self, cache=None):
+        super().__init__()
+        self.cache = cache or get_cache()
+
+    def build_prompt(self, breakdown):
+        with span("carbon.prompt") as s:
+            table = appliance_table(breakdown, budget("carbon"))
+            prompt = self.render_prompt(table)
+            record(s, "carbon", prompt, table, json.dumps(breakdown, indent=2))
+        return prompt
+
+    def render_prompt(self, table):
+        return f"""
         You are an Energy Efficiency Agent. Your goal is to analyze appliance usage and suggest savings.
         
-        Input Data (Normalized Bill):
-        {json.dumps(breakdown, indent=2)}
+        Input Data (Normalized Bill, biggest consumers first):
+        {table}
         
         Task:
         1. Calculate the estimated Carbon Footprint (in kg CO2) for this monthly usage. (Approx 0.82 kg CO2 per kWh).
@@ -47,11 +50,18 @@ class CarbonFootprintAgent:
         
         Return ONLY valid JSON.
         """
-        
+
+    def analyze(self, data):
+        """
+        Analyzes the bill data and returns carbon footprint + savings percentages.
+        """
+        breakdown = data.get('breakdown', [])
+        return self.cache.get_or_compute("carbon", {"breakdown": breakdown}, lambda: self._analyze(breakdown))
+
+    def _analyze(self, breakdown):
+        prompt = self.build_prompt(breakdown)
         try:
-            response = self.model.generate_content(prompt)
-            text = response.text.replace('```json', '').replace('```', '').strip()
-            return json.loads(text)
+            return self.generate_routed(prompt, OUTPUT, appliances=len(breakdown))
         except Exception as e:
             return {"error": str(e)}
 
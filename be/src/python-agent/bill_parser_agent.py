@@ -1,162 +1,291 @@
 import sys
 import json
 import os
-import base64
-import google.generativeai as genai
-from dotenv import load_dotenv
+import importlib.util
+from functools import lru_cache
+from wattwise_agents import vision
+from wattwise_agents.bill_rules import ACCEPT_CONFIDENCE, FIELDS, REQUIRED_FIELDS, extract_fields
+from wattwise_agents.bill_store import document_key, fingerprint, get_bill_store, text_key
+from wattwise_agents.metrics import span
+from wattwise_agents.prompts import bill_excerpt, budget, record
+from wattwise_agents.runtime import CallPolicy, GeminiAgent, answered_by
+from wattwise_agents.schema import Decoder, object_schema
+from wattwise_agents.vision import load_pdf, prepare, read_request
 
-# Load environment variables
-load_dotenv()
+# Set WATTWISE_BILL_RULES=off to always send text bills to Gemini
+RULES_ENABLED = os.getenv("WATTWISE_BILL_RULES", "on") != "off"
+# Vision calls on multi-page scans are the slowest we make
+BILL_TIMEOUT = float(os.getenv("WATTWISE_BILL_TIMEOUT", "60"))
+# Bump when extraction code changes (rules, page selection, merging), to drop stored bills
+EXTRACTOR_VERSION = 2
 
-def log(message):
-    """Log to stderr so it doesn't interfere with JSON stdout output"""
-    print(f"[BillParserAgent] {message}", file=sys.stderr)
+CONFIDENCE_LEVELS = ["low", "medium", "high"]
 
-class BillPdfParserAgent:
-    def __init__(self):
-        log("Initializing BillPdfParserAgent...")
-        self.api_key = os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
-            log("ERROR: GEMINI_API_KEY not found!")
-            raise ValueError("GEMINI_API_KEY not found")
-        log("API key found, configuring Gemini...")
-        genai.configure(api_key=self.api_key)
-        # Using Gemini 2.0 Flash (stable) for speed and vision support
-        self.model = genai.GenerativeModel('gemini-2.0-flash')
-        log("Model initialized: gemini-2.0-flash")
+# field -> (description for the prompt, example value)
+FIELD_PROMPTS = {
+    "totalAmount": ("Total Bill Amount (in INR or the currency shown)", 3450.50),
+    "totalUnits": ("Total Units Consumed (in kWh)", 420),
+    "billingPeriod": ("Billing Period (if available)", "Oct 2023 - Nov 2023"),
+    "consumerNumber": ("Consumer/Account Number (if available)", "1234567890"),
+}
 
-    def extract_from_text(self, pdf_text: str):
-        """
-        Extracts bill details from raw PDF text using Gemini.
-        """
-        log(f"TEXT MODE: Received PDF text of length: {len(pdf_text)} characters")
-        log(f"First 200 chars of input: {pdf_text[:200]}...")
-        
-        prompt = f"""
-        You are an Electricity Bill Parser Agent. Your task is to extract key billing information from the provided bill text.
-        
-        Bill Text:
-        {pdf_text[:8000]}
+FIELD_SCHEMAS = {
+    "totalAmount": {"type": "NUMBER", "nullable": True},
+    "totalUnits": {"type": "NUMBER", "nullable": True},
+    "billingPeriod": {"type": "STRING", "nullable": True},
+    "consumerNumber": {"type": "STRING", "nullable": True},
+}
+
+VISION_PROMPT = """
+        You are an Electricity Bill Parser Agent. Analyze this electricity bill image and extract the following information:
         
-        Extract the following information:
         1. Total Bill Amount (in INR or the currency shown)
         2. Total Units Consumed (in kWh)
         3. Billing Period (if available)
         4. Consumer/Account Number (if available)
         
         Output ONLY valid JSON in this exact format:
-        {{
+        {
             "totalAmount": 3450.50,
             "totalUnits": 420,
             "billingPeriod": "Oct 2023 - Nov 2023",
             "consumerNumber": "1234567890",
             "confidence": "high"
-        }}
+        }
         
         Notes:
         - If a field is not found, use null for that field.
         - "confidence" should be "high", "medium", or "low" based on how clearly the data was identified.
         - Return ONLY valid JSON, no explanations.
         """
+
+@lru_cache(maxsize=None)
+def output_decoder(fields):
+    """Decoder for a response carrying `fields` (a tuple) plus the confidence level."""
+    properties = {field: FIELD_SCHEMAS[field] for field in fields}
+    properties["confidence"] = {"type": "STRING", "enum": CONFIDENCE_LEVELS}
+    return Decoder(object_schema(properties))
+
+def log(message):
+    """Log to stderr so it doesn't interfere with JSON stdout output"""
+    print(f"[BillParserAgent] {message}", file=sys.stderr)
+
+def confident(result):
+    """Whether a model answer is good enough to stop at, or worth asking a stronger tier."""
+    return str(result.get("confidence")).lower() != "low"
+
+def validate_payload(data):
+    """Returns an error message if the payload lacks the data for its mode, else None."""
+    if data.get("isImageBased", False):
+        if not (data.get("pdfData") or data.get("pdfPath") or data.get("pdfBase64")):
+            return "No PDF base64 data provided"
+    elif not data.get("pdfText"):
+        return "No PDF text provided"
+    return None
+
+class BillPdfParserAgent(GeminiAgent):
+    name = "bill"
+    # Using Gemini 2.0 Flash (stable) for speed and vision support
+    model_name = 'gemini-2.0-flash'
+    policy = CallPolicy(timeout=BILL_TIMEOUT)
+    # Someone is waiting on the upload
+    priority = "interactive"
+
+    def __init__(self, store=None):
+        log("Initializing BillPdfParserAgent...")
+        # Text bills the layout rules answer in full need no key
+        super().__init__(require_model=not RULES_ENABLED)
+        log(f"Model initialized: {self.model_name}" if self.model else "No GEMINI_API_KEY, text bills use the layout rules only")
+        self.store = store or get_bill_store()
+        self.fingerprints = {"text": self.fingerprint("text"), "vision": self.fingerprint("vision")}
+        swept = self.store.sweep(list(self.fingerprints.values()))
+        if swept:
+            log(f"Dropped {swept} stored bills parsed by an older extractor")
+
+    def fingerprint(self, mode):
+        """
+        A digest of what a `mode` ("text" or "vision") extraction depends on:
+        EXTRACTOR_VERSION, the prompt, output schema and model tiers, and the
+        settings that change what the model is shown.
+        """
+        tiers = list(self.router.tiers) if self.router.enabled else [self.model_name]
+        if mode == "vision":
+            settings = {
+                "maxPages": vision.MAX_PAGES, "maxEdge": vision.MAX_EDGE, "maxDpi": vision.MAX_DPI,
+                "jpegQuality": vision.JPEG_QUALITY, "minBytes": vision.MIN_BYTES,
+                "rasterize": importlib.util.find_spec("fitz") is not None,
+            }
+            return fingerprint(EXTRACTOR_VERSION, mode, tiers, VISION_PROMPT, FIELD_SCHEMAS, settings)
+        settings = {"rules": RULES_ENABLED, "acceptConfidence": ACCEPT_CONFIDENCE, "budget": budget("bill")}
+        prompt = self.render_text_prompt("{excerpt}", FIELDS)
+        return fingerprint(EXTRACTOR_VERSION, mode, tiers, prompt, FIELD_PROMPTS, FIELD_SCHEMAS, settings)
+
+    def extract_from_text(self, pdf_text: str):
+        """
+        Extracts bill details from raw PDF text. Layout templates and generic
+        patterns run first; Gemini is only asked for fields they could not
+        find with enough confidence. When the rules found the required fields,
+        a failed call for the optional ones still returns the rule result.
+        """
+        log(f"TEXT MODE: Received PDF text of length: {len(pdf_text)} characters")
+        log(f"First 200 chars of input: {pdf_text[:200]}...")
+
+        if not RULES_ENABLED:
+            return self.extract_text_with_model(pdf_text, FIELDS)
+
+        with span("bill.rules"):
+            rules = extract_fields(pdf_text)
+        log(f"Rule extraction ({rules.layout or 'generic'}): {json.dumps(rules.values)} scores={json.dumps(rules.scores)}")
+        fields = rules.low_confidence_fields()
+        if not fields:
+            log("Rule extraction is confident, skipping Gemini")
+            return {**rules.result(), "source": "rules"}
+
+        result = self.extract_text_with_model(pdf_text, fields)
+        if "error" in result:
+            if rules.needs_model():
+                return result
+            log("Optional fields left empty")
+            return {**rules.result(), "source": "rules"}
+
+        merged = rules.result()
+        for field in fields:
+            merged[field] = result.get(field)
+        # The merged result is only as trustworthy as its weakest part: the
+        # required fields the rules kept, and the model's answer
+        model_confidence = str(result.get("confidence")).lower()
+        if model_confidence not in CONFIDENCE_LEVELS:
+            model_confidence = "low"
+        kept = [field for field in REQUIRED_FIELDS if field not in fields]
+        merged["confidence"] = min(rules.confidence(kept), model_confidence, key=CONFIDENCE_LEVELS.index)
+        merged["source"] = "rules+model"
+        log(f"Merged result: {json.dumps(merged)}")
+        return merged
+
+    def extract_text_with_model(self, pdf_text: str, fields):
+        """
+        Asks Gemini for the given fields only.
+        """
+        if self.model is None:
+            return {"error": "GEMINI_API_KEY not found"}
+        with span("bill.prompt") as s:
+            excerpt = bill_excerpt(pdf_text, fields, budget("bill"))
+            prompt = self.render_text_prompt(excerpt, fields)
+            tokens, saved = record(s, "bill", prompt, excerpt, pdf_text[:8000])
         
         try:
-            log("Sending text prompt to Gemini API...")
-            response = self.model.generate_content(prompt)
-            log("Received response from Gemini API")
-            log(f"Raw response text: {response.text[:500]}...")
-            text = response.text.replace('```json', '').replace('```', '').strip()
-            log(f"Cleaned response: {text}")
-            result = json.loads(text)
+            log(f"Sending text prompt to Gemini API for {', '.join(fields)} ({tokens} tokens, {saved} saved)...")
+            result = self.generate_routed(
+                prompt, output_decoder(tuple(fields)), accept=confident, text_chars=len(pdf_text)
+            )
             log(f"Parsed result: {json.dumps(result)}")
             return result
         except Exception as e:
             log(f"ERROR during text extraction: {str(e)}")
             return {"error": str(e)}
 
-    def extract_from_image(self, pdf_base64: str):
-        """
-        Extracts bill details from image-based PDF using Gemini Vision.
-        """
-        log(f"VISION MODE: Received base64 of length: {len(pdf_base64)} chars")
+    def render_text_prompt(self, excerpt, fields):
+        wanted = "\n        ".join(f"{i}. {FIELD_PROMPTS[f][0]}" for i, f in enumerate(fields, 1))
+        example = ",\n            ".join(f'"{f}": {json.dumps(FIELD_PROMPTS[f][1])}' for f in fields)
+
+        return f"""
+        You are an Electricity Bill Parser Agent. Your task is to extract key billing information from the provided bill text.
         
-        prompt = """
-        You are an Electricity Bill Parser Agent. Analyze this electricity bill image and extract the following information:
+        Bill Text (relevant lines; "..." marks lines left out):
+        {excerpt}
         
-        1. Total Bill Amount (in INR or the currency shown)
-        2. Total Units Consumed (in kWh)
-        3. Billing Period (if available)
-        4. Consumer/Account Number (if available)
+        Extract the following information:
+        {wanted}
         
         Output ONLY valid JSON in this exact format:
-        {
-            "totalAmount": 3450.50,
-            "totalUnits": 420,
-            "billingPeriod": "Oct 2023 - Nov 2023",
-            "consumerNumber": "1234567890",
+        {{
+            {example},
             "confidence": "high"
-        }
+        }}
         
         Notes:
         - If a field is not found, use null for that field.
         - "confidence" should be "high", "medium", or "low" based on how clearly the data was identified.
         - Return ONLY valid JSON, no explanations.
         """
+
+    def extract_from_image(self, pdf_bytes: bytes):
+        """
+        Extracts bill details from image-based PDF using Gemini Vision.
+        Only the summary pages are sent, rasterized and compressed.
+        """
+        log(f"VISION MODE: Received PDF of {len(pdf_bytes)} bytes")
+        if self.model is None:
+            return {"error": "GEMINI_API_KEY not found"}
         
         try:
             log("Preparing image data for Gemini Vision...")
-            # Create the image part for Gemini
-            image_data = {
-                "mime_type": "application/pdf",
-                "data": pdf_base64
-            }
-            
+            with span("bill.vision.prepare") as s:
+                parts, report = prepare(pdf_bytes)
+                s.set(originalBytes=report["originalBytes"], sentBytes=report["sentBytes"])
+
             log("Sending vision prompt to Gemini API...")
-            response = self.model.generate_content([prompt, image_data])
-            log("Received response from Gemini Vision API")
-            log(f"Raw response text: {response.text[:500]}...")
-            text = response.text.replace('```json', '').replace('```', '').strip()
-            log(f"Cleaned response: {text}")
-            result = json.loads(text)
+            result = self.generate_routed([VISION_PROMPT, *parts], output_decoder(FIELDS), accept=confident, vision=True)
             log(f"Parsed result: {json.dumps(result)}")
             return result
         except Exception as e:
             log(f"ERROR during vision extraction: {str(e)}")
             return {"error": str(e)}
 
+    def parse(self, data):
+        """
+        Routes an upload payload to text or vision extraction. A bill parsed
+        before (same PDF bytes, or same text up to whitespace and case) by the
+        current extractor is answered from the store, with "stored" saying
+        which model produced it and when.
+        """
+        error = validate_payload(data)
+        if error:
+            return {"error": error}
+        if data.get("isImageBased", False):
+            mode, document = "vision", load_pdf(data)
+            key, extract = document_key(document), self.extract_from_image
+        else:
+            mode, document = "text", data["pdfText"]
+            key, extract = text_key(document), self.extract_from_text
+
+        current = self.fingerprints[mode]
+        with span("bill.store") as s:
+            stored = self.store.get(key, current)
+            s.set(hit=stored is not None)
+        if stored is not None:
+            log(f"Bill parsed before by {stored['model'] or 'rules'}, answering from the store")
+            return {**stored["result"], "stored": {"model": stored["model"], "storedAt": stored["storedAt"]}}
+
+        result, model = answered_by(extract, document)
+        # A low-confidence answer is worth asking for again on the next upload
+        if "error" not in result and str(result.get("confidence")).lower() != "low":
+            self.store.put(key, current, result, model)
+        return result
+
 if __name__ == "__main__":
     log("========== BILL PARSER AGENT START ==========")
     try:
         log("Reading input from stdin...")
-        input_data = sys.stdin.read()
-        log(f"Received {len(input_data)} bytes from stdin")
+        # A JSON payload, optionally followed by raw PDF bytes (see read_request)
+        data = read_request(sys.stdin.buffer)
         
-        if not input_data:
+        if not data:
             log("ERROR: No input data provided")
             print(json.dumps({"error": "No input data provided"}))
             sys.exit(1)
-            
-        data = json.loads(input_data)
+
         is_image_based = data.get("isImageBased", False)
         log(f"Mode: {'VISION' if is_image_based else 'TEXT'}")
         
+        error = validate_payload(data)
+        if error:
+            log(f"ERROR: {error}")
+            print(json.dumps({"error": error}))
+            sys.exit(1)
+
         agent = BillPdfParserAgent()
-        
-        if is_image_based:
-            pdf_base64 = data.get("pdfBase64", "")
-            log(f"Processing image-based PDF, base64 length: {len(pdf_base64)}")
-            if not pdf_base64:
-                log("ERROR: No base64 data provided for image mode")
-                print(json.dumps({"error": "No PDF base64 data provided"}))
-                sys.exit(1)
-            result = agent.extract_from_image(pdf_base64)
-        else:
-            pdf_text = data.get("pdfText", "")
-            log(f"Processing text-based PDF, text length: {len(pdf_text)}")
-            if not pdf_text:
-                log("ERROR: No PDF text provided for text mode")
-                print(json.dumps({"error": "No PDF text provided"}))
-                sys.exit(1)
-            result = agent.extract_from_text(pdf_text)
+        result = agent.parse(data)
         
         log(f"Final result: {json.dumps(result)}")
         log("========== BILL PARSER AGENT END ==========")
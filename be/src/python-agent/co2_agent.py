@@ -1,59 +1,135 @@
 import sys
 import json
 import os
-import google.generativeai as genai
-from dotenv import load_dotenv
+from wattwise_agents.cache import get_cache
+from wattwise_agents.carbon import CarbonEngine, describe
+from wattwise_agents.metrics import span
+from wattwise_agents.runtime import CallPolicy, GeminiAgent
+from wattwise_agents.streaming import null_emit
 
-# Load environment variables
-load_dotenv()
+# "model" asks Gemini to phrase impact.description, "template" never calls it
+NARRATIVE_MODE = os.getenv("WATTWISE_CO2_NARRATIVE", "model")
+NARRATIVE_TIMEOUT = float(os.getenv("WATTWISE_CO2_NARRATIVE_TIMEOUT", "3"))
 
-class CO2Agent:
-    def __init__(self):
-        self.api_key = os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
-            raise ValueError("GEMINI_API_KEY not found")
-        genai.configure(api_key=self.api_key)
-        # Using gemini-2.0-flash for consistency with bill parser
-        self.model = genai.GenerativeModel('gemini-2.0-flash')
+class CO2Agent(GeminiAgent):
+    name = "co2"
+    # Using gemini-2.0-flash for consistency with bill parser
+    model_name = 'gemini-2.0-flash'
+    # The template is a fine answer, so one quick retry at most
+    policy = CallPolicy(timeout=NARRATIVE_TIMEOUT, retries=1, backoff=0.2)
+
+    def __init__(self, engine=None, cache=None):
+        # The numbers are computed locally; the model is only used for wording
+        super().__init__(use_model=NARRATIVE_MODE == "model", require_model=False)
+        self.engine = engine or CarbonEngine.from_env()
+        self.cache = cache or get_cache()
+
+    def calculate(self, data):
+        return self.engine.calculate(
+            data.get('breakdown', []),
+            region=data.get('region') or data.get('city'),
+        )
+
+    def build_prompt(self, footprint):
+        impact = footprint["impact"]
+        return f"""
+        You are a Carbon Footprint Agent. Write one or two friendly sentences for a household
+        explaining their monthly electricity carbon footprint. Use exactly these numbers:
+        - {footprint['carbonFootprint']} kg of CO2
+        - equivalent to driving an average car for {impact['carKm']} km
+        - {impact['trees']} trees needed to offset it
+
+        Return ONLY the sentences, no JSON or markdown.
+        """
+
+    def _result(self, footprint, description, degraded=None):
+        result = {
+            "carbonFootprint": footprint["carbonFootprint"],
+            "impact": {**footprint["impact"], "description": description or describe(footprint)},
+        }
+        if degraded is not None:
+            # The template stood in for a failed model call; not cached, so the next request retries
+            result["degraded"] = degraded
+        return result
+
+    def cache_key(self, data):
+        return {"breakdown": data.get('breakdown', []), "region": data.get('region') or data.get('city')}
+
+    def narrative_key(self, footprint):
+        # The narrative only quotes these numbers, so an edited breakdown
+        # that leaves them unchanged reuses it
+        impact = footprint["impact"]
+        return {"carbonFootprint": footprint["carbonFootprint"], "trees": impact["trees"], "carKm": impact["carKm"]}
+
+    def narrate(self, footprint, prompt):
+        return self.cache.get_or_compute(
+            "co2.narrative", self.narrative_key(footprint), lambda: {"description": self.generate_text(prompt)}
+        )["description"]
+
+    async def narrate_async(self, footprint, prompt):
+        async def generate():
+            return {"description": await self.generate_text_async(prompt)}
+
+        result = await self.cache.get_or_compute_async("co2.narrative", self.narrative_key(footprint), generate)
+        return result["description"]
 
     def analyze(self, data):
         """
         Calculates carbon footprint and provides environmental context.
         """
-        breakdown = data.get('breakdown', [])
-        
-        prompt = f"""
-        You are a Carbon Footprint Calculator Agent.
-        
-        Input Data (Normalized Bill Breakdown):
-        {json.dumps(breakdown, indent=2)}
-        
-        Task:
-        1. Calculate the estimated Carbon Footprint (in kg CO2) for this monthly usage. 
-           (Assume approx 0.82 kg CO2 per kWh if not specified, but refine based on appliance type if possible).
-        2. Provide "environmental impact" context. Translate this amount of CO2 into tangible terms:
-           - Equivalent number of trees needed to absorb this CO2.
-           - Equivalent km driven by an average car.
-        
-        Output JSON Format:
-        {{
-            "carbonFootprint": 150.5,  // number in kg
-            "impact": {{
-                "trees": 5,           // number of trees
-                "carKm": 300,         // number of km
-                "description": "Your monthly energy usage generates 150.5kg of CO2, which is equivalent to driving a car for 300km. You would need 5 trees to offset this."
-            }}
-        }}
-        
-        Return ONLY valid JSON.
+        return self.cache.get_or_compute("co2", self.cache_key(data), lambda: self._analyze(data))
+
+    async def analyze_async(self, data, emit=null_emit):
+        """
+        Same as analyze, but awaits the model call so several agents can share one event loop.
+        The footprint is also passed to emit("footprint", ...) before the narrative is asked for.
         """
-        
+        return await self.cache.get_or_compute_async(
+            "co2", self.cache_key(data), lambda: self._analyze_async(data, emit)
+        )
+
+    def stream(self, data, emit):
+        """analyze for the worker's streaming requests."""
+        import asyncio
+
+        return asyncio.run(self.analyze_async(data, emit))
+
+    def _analyze(self, data):
+        try:
+            with span("co2.calculate"):
+                footprint = self.calculate(data)
+        except Exception as e:
+            return {"error": str(e)}
+
+        description = degraded = None
+        if self.model is not None:
+            with span("co2.prompt"):
+                prompt = self.build_prompt(footprint)
+            try:
+                description = self.narrate(footprint, prompt)
+            except Exception as e:
+                print(f"CO2 narrative fell back to template: {e}", file=sys.stderr)
+                degraded = str(e)
+        return self._result(footprint, description, degraded)
+
+    async def _analyze_async(self, data, emit=null_emit):
         try:
-            response = self.model.generate_content(prompt)
-            text = response.text.replace('```json', '').replace('```', '').strip()
-            return json.loads(text)
+            with span("co2.calculate"):
+                footprint = self.calculate(data)
         except Exception as e:
             return {"error": str(e)}
+        emit("footprint", carbonFootprint=footprint["carbonFootprint"], impact=footprint["impact"])
+
+        description = degraded = None
+        if self.model is not None:
+            with span("co2.prompt"):
+                prompt = self.build_prompt(footprint)
+            try:
+                description = await self.narrate_async(footprint, prompt)
+            except Exception as e:
+                print(f"CO2 narrative fell back to template: {e}", file=sys.stderr)
+                degraded = str(e)
+        return self._result(footprint, description, degraded)
 
 if __name__ == "__main__":
     try:
@@ -61,11 +137,11 @@ if __name__ == "__main__":
         if not input_data:
             print(json.dumps({"error": "No input data provided"}))
             sys.exit(1)
-            
+
         data = json.loads(input_data)
         agent = CO2Agent()
         result = agent.analyze(data)
-        
+
         print(json.dumps(result))
     except Exception as e:
         print(json.dumps({"error": str(e)}))
@@ -0,0 +1,158 @@
+import sys
+import json
+from wattwise_agents.cache import get_cache
+from wattwise_agents.carbon import CarbonEngine, describe
+from wattwise_agents.metrics import span
+from wattwise_agents.prompts import appliance_table, budget, record
+from wattwise_agents.runtime import GeminiAgent
+from wattwise_agents.schema import SUGGESTIONS, Decoder, object_schema
+from wattwise_agents.streaming import null_emit
+
+OUTPUT = Decoder(object_schema({"description": {"type": "STRING"}, "suggestions": SUGGESTIONS}))
+
+class CombinedAnalysisAgent(GeminiAgent):
+    """
+    The CO2 and recommendation agents in one model call: the footprint is
+    computed locally as in CO2Agent, and a single prompt over the shared
+    appliance table asks for both the impact description and the savings
+    suggestions. Returns the fields of both agents' responses.
+    """
+
+    name = "combined"
+    model_name = 'gemini-2.0-flash'
+
+    def __init__(self, engine=None, cache=None):
+        super().__init__(require_model=False)
+        self.engine = engine or CarbonEngine.from_env()
+        self.cache = cache or get_cache()
+
+    def build_prompt(self, breakdown, footprint):
+        with span("combined.prompt") as s:
+            table = appliance_table(breakdown, budget("combined"))
+            prompt = self.render_prompt(table, footprint)
+            record(s, "combined", prompt, table, json.dumps(breakdown, indent=2))
+        return prompt
+
+    def render_prompt(self, table, footprint):
+        impact = footprint["impact"]
+        return f"""
+        You are an Energy and Carbon Advisor Agent for an Indian household.
+
+        Input Data (Appliance Usage Breakdown, biggest consumers first):
+        {table}
+
+        Their monthly carbon footprint: {footprint['carbonFootprint']} kg of CO2, equivalent to driving
+        an average car for {impact['carKm']} km, with {impact['trees']} trees needed to offset it.
+
+        Task:
+        1. "description": one or two friendly sentences explaining the footprint. Use exactly these numbers.
+        2. "suggestions": for the top 3-4 energy consuming appliances, a REALISTIC reductionPercentage
+           (0.05 to 0.30) and a short, actionable "strategy". "name" must match the input exactly.
+
+        Output JSON Format:
+        {{
+            "description": "Your home emitted ...",
+            "suggestions": [
+                {{
+                    "name": "Appliance Name (exact match from input)",
+                    "reductionPercentage": 0.15,
+                    "strategy": "Turn off AC when leaving the room to save 15%"
+                }}
+            ]
+        }}
+
+        Return ONLY valid JSON.
+        """
+
+    def cache_key(self, data):
+        return {"breakdown": data.get('breakdown', []), "region": data.get('region') or data.get('city')}
+
+    def analyze(self, data):
+        """
+        Footprint, impact and suggestions for a bill breakdown. If the model
+        fails, the result carries "error" and, under "partial", the locally
+        computed footprint with the template description.
+        """
+        return self.cache.get_or_compute("combined", self.cache_key(data), lambda: self._analyze(data))
+
+    async def analyze_async(self, data, emit=null_emit):
+        """
+        Same as analyze, but awaits the model call so several agents can share one event loop.
+        The footprint and then each suggestion, as it streams in, are also passed to emit.
+        """
+        return await self.cache.get_or_compute_async(
+            "combined", self.cache_key(data), lambda: self._analyze_async(data, emit)
+        )
+
+    def stream(self, data, emit):
+        """analyze for the worker's streaming requests."""
+        import asyncio
+
+        return asyncio.run(self.analyze_async(data, emit))
+
+    def calculate(self, data):
+        with span("combined.calculate"):
+            return self.engine.calculate(data.get('breakdown', []), region=data.get('region') or data.get('city'))
+
+    def _result(self, footprint, output=None, error=None):
+        result = {
+            "carbonFootprint": footprint["carbonFootprint"],
+            "impact": {**footprint["impact"], "description": (output or {}).get("description") or describe(footprint)},
+        }
+        if error is not None:
+            return {"error": error, "partial": result}
+        return {**result, "suggestions": output["suggestions"]}
+
+    def _analyze(self, data):
+        try:
+            footprint = self.calculate(data)
+        except Exception as e:
+            return {"error": str(e)}
+        if self.model is None:
+            return self._result(footprint, error="GEMINI_API_KEY not found")
+        breakdown = data.get('breakdown', [])
+        prompt = self.build_prompt(breakdown, footprint)
+        try:
+            return self._result(footprint, self.generate_routed(prompt, OUTPUT, appliances=len(breakdown)))
+        except Exception as e:
+            return self._result(footprint, error=str(e))
+
+    async def _analyze_async(self, data, emit=null_emit):
+        try:
+            footprint = self.calculate(data)
+        except Exception as e:
+            return {"error": str(e)}
+        emit("footprint", carbonFootprint=footprint["carbonFootprint"], impact=footprint["impact"])
+        if self.model is None:
+            return self._result(footprint, error="GEMINI_API_KEY not found")
+        breakdown = data.get('breakdown', [])
+        prompt = self.build_prompt(breakdown, footprint)
+        seen = set()
+
+        def on_item(suggestion):
+            # An escalated call streams its suggestions again
+            if suggestion["name"] not in seen:
+                seen.add(suggestion["name"])
+                emit("suggestion", suggestion=suggestion)
+
+        try:
+            output = await self.generate_routed_async(prompt, OUTPUT, on_item=on_item, appliances=len(breakdown))
+            return self._result(footprint, output)
+        except Exception as e:
+            return self._result(footprint, error=str(e))
+
+if __name__ == "__main__":
+    try:
+        input_data = sys.stdin.read()
+        if not input_data:
+            print(json.dumps({"error": "No input data provided"}))
+            sys.exit(1)
+
+        data = json.loads(input_data)
+        agent = CombinedAnalysisAgent()
+        result = agent.analyze(data)
+
+        print(json.dumps(result))
+    except Exception as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
@@ -1,32 +1,54 @@
 import sys
 import json
 import os
-import google.generativeai as genai
-from dotenv import load_dotenv
+from wattwise_agents.cache import get_cache
+from wattwise_agents.metrics import count, span
+from wattwise_agents.prompts import appliance_table, budget, record
+from wattwise_agents.runtime import GeminiAgent
+from wattwise_agents.savings import SavingsRules, normalize_name
+from wattwise_agents.schema import SUGGESTIONS, Decoder, object_schema
+from wattwise_agents.streaming import null_emit
 
-# Load environment variables
-load_dotenv()
+# Set WATTWISE_RECOMMENDATION_RULES=off to ask the model about every appliance
+RULES_ENABLED = os.getenv("WATTWISE_RECOMMENDATION_RULES", "on") != "off"
 
-class RecommendationAgent:
-    def __init__(self):
-        self.api_key = os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
-            raise ValueError("GEMINI_API_KEY not found")
-        genai.configure(api_key=self.api_key)
-        # Using gemini-2.0-flash
-        self.model = genai.GenerativeModel('gemini-2.0-flash')
+OUTPUT = Decoder(object_schema({"suggestions": SUGGESTIONS}))
 
-    def analyze(self, data):
-        """
-        Generates energy saving recommendations.
-        """
-        breakdown = data.get('breakdown', [])
-        
-        prompt = f"""
+# What a model suggestion for one breakdown line depends on; a line whose
+# fields are unchanged since an earlier request reuses that suggestion
+LINE_FIELDS = ("name", "count", "hours", "watts", "wattageUsed", "monthlyUnits")
+
+def line_key(item):
+    return {field: item.get(field) for field in LINE_FIELDS}
+
+# What the model is asked to cover: the whole breakdown, or only what the rules could not
+TOP_SCOPE = "Only include suggestions for the top 3-4 energy consuming appliances."
+UNKNOWN_SCOPE = "Include exactly one suggestion for every appliance listed."
+
+class RecommendationAgent(GeminiAgent):
+    name = "recommendation"
+    # Using gemini-2.0-flash
+    model_name = 'gemini-2.0-flash'
+
+    def __init__(self, cache=None, rules=None):
+        # With the rules on, the model is only needed for appliances they do not know
+        super().__init__(require_model=not RULES_ENABLED)
+        self.cache = cache or get_cache()
+        self.rules = rules or SavingsRules()
+
+    def build_prompt(self, breakdown, scope=TOP_SCOPE):
+        with span("recommendation.prompt") as s:
+            table = appliance_table(breakdown, budget("recommendation"))
+            prompt = self.render_prompt(table, scope)
+            record(s, "recommendation", prompt, table, json.dumps(breakdown, indent=2))
+        return prompt
+
+    def render_prompt(self, table, scope):
+        return f"""
         You are an Energy Efficiency Expert Agent.
         
-        Input Data (Appliance Usage Breakdown):
-        {json.dumps(breakdown, indent=2)}
+        Input Data (Appliance Usage Breakdown, biggest consumers first):
+        {table}
         
         Task:
         Analyze each appliance. If an appliance consumes significant energy, suggest a REALISTIC percentage reduction strategy.
@@ -37,25 +59,158 @@ class RecommendationAgent:
             "suggestions": [
                 {{
                     "name": "Appliance Name (exact match from input)",
-                    "reductionPercentage": 0.15, // e.g. 15%
+                    "reductionPercentage": 0.15,
                     "strategy": "Turn off AC when leaving the room to save 15%"
                 }}
             ]
         }}
         
         Notes:
-        - Only include suggestions for the top 3-4 energy consuming appliances.
+        - {scope}
         - reductions should be realistic (0.05 to 0.30).
         
         Return ONLY valid JSON.
         """
-        
+
+    def cache_key(self, data):
+        return {"breakdown": data.get('breakdown', [])}
+
+    def analyze(self, data):
+        """
+        Generates energy saving recommendations.
+        """
+        return self.cache.get_or_compute("recommendation", self.cache_key(data), lambda: self._analyze(data))
+
+    async def analyze_async(self, data, emit=null_emit):
+        """
+        Same as analyze, but awaits the model call so several agents can share one event loop.
+        Each suggestion is also passed to emit("suggestion", ...) as soon as it is known.
+        """
+        return await self.cache.get_or_compute_async(
+            "recommendation", self.cache_key(data), lambda: self._analyze_async(data, emit)
+        )
+
+    def stream(self, data, emit):
+        """analyze for the worker's streaming requests."""
+        import asyncio
+
+        return asyncio.run(self.analyze_async(data, emit))
+
+    def emitter(self, emit, expected=None):
+        """
+        on_item for a streamed model answer: emits each suggestion once, and
+        with `expected` (normalized names) only those the model was asked about.
+        """
+        seen = set()
+
+        def on_item(suggestion):
+            key = normalize_name(suggestion["name"])
+            if key not in seen and (expected is None or key in expected):
+                seen.add(key)
+                emit("suggestion", suggestion=suggestion)
+
+        return on_item
+
+    def plan(self, breakdown):
+        """The top appliances paired with their rule suggestion (None where the rules do not know them)."""
+        with span("recommendation.rules") as s:
+            plan = self.rules.recommend(breakdown)
+            s.set(appliances=len(plan), unknown=sum(1 for _, suggestion in plan if suggestion is None))
+        return plan
+
+    def recall(self, unknown):
+        """
+        Splits the unknown lines into suggestions remembered from earlier
+        requests (by normalized name) and the lines the model still has to see.
+        """
+        answered, missing = {}, []
+        for item in unknown:
+            suggestion = self.cache.get("recommendation.line", line_key(item))
+            if suggestion is None:
+                missing.append(item)
+            else:
+                answered[normalize_name(item.get('name'))] = {**suggestion, "name": item.get('name')}
+        count("wattwise_line_memo_total", len(answered), agent=self.name, outcome="hit")
+        count("wattwise_line_memo_total", len(missing), agent=self.name, outcome="miss")
+        return answered, missing
+
+    def remember(self, missing, result):
+        """Stores the model's suggestion for each line it answered; returns them by normalized name."""
+        suggestions = {normalize_name(s["name"]): s for s in result.get("suggestions", [])}
+        answered = {}
+        for item in missing:
+            suggestion = suggestions.get(normalize_name(item.get('name')))
+            if suggestion is not None:
+                self.cache.set("recommendation.line", line_key(item), suggestion)
+                answered[normalize_name(item.get('name'))] = suggestion
+        return answered
+
+    def merge(self, plan, answered=None, error=None):
+        """
+        Rule suggestions with the model's filled in for the unknown appliances,
+        in cost order. A model failure only loses the unknown ones, and marks
+        the result "degraded" so it is not cached.
+        """
+        answered = answered or {}
+        suggestions = [suggestion or answered.get(normalize_name(item.get('name'))) for item, suggestion in plan]
+        suggestions = [s for s in suggestions if s is not None]
+        source = "rules+model" if answered else "rules"
+        if error is not None:
+            if not suggestions:
+                return {"error": error}
+            print(f"Recommendations for unknown appliances skipped: {error}", file=sys.stderr)
+            return {"suggestions": suggestions, "source": source, "degraded": error}
+        return {"suggestions": suggestions, "source": source}
+
+    def _analyze(self, data):
+        breakdown = data.get('breakdown', [])
+        if not RULES_ENABLED:
+            prompt = self.build_prompt(breakdown)
+            try:
+                return self.generate_routed(prompt, OUTPUT, appliances=len(breakdown))
+            except Exception as e:
+                return {"error": str(e)}
+
+        plan = self.plan(breakdown)
+        answered, missing = self.recall([item for item, suggestion in plan if suggestion is None])
+        if not missing:
+            return self.merge(plan, answered)
+        if self.model is None:
+            return self.merge(plan, answered, error="GEMINI_API_KEY not found")
+        prompt = self.build_prompt(missing, UNKNOWN_SCOPE)
+        try:
+            result = self.generate_routed(prompt, OUTPUT, appliances=len(missing))
+        except Exception as e:
+            return self.merge(plan, answered, error=str(e))
+        return self.merge(plan, {**answered, **self.remember(missing, result)})
+
+    async def _analyze_async(self, data, emit=null_emit):
+        breakdown = data.get('breakdown', [])
+        if not RULES_ENABLED:
+            prompt = self.build_prompt(breakdown)
+            try:
+                return await self.generate_routed_async(
+                    prompt, OUTPUT, on_item=self.emitter(emit), appliances=len(breakdown)
+                )
+            except Exception as e:
+                return {"error": str(e)}
+
+        plan = self.plan(breakdown)
+        answered, missing = self.recall([item for item, suggestion in plan if suggestion is None])
+        # Rule and remembered suggestions go out before the model is asked anything
+        for suggestion in [s for _, s in plan if s is not None] + list(answered.values()):
+            emit("suggestion", suggestion=suggestion)
+        if not missing:
+            return self.merge(plan, answered)
+        if self.model is None:
+            return self.merge(plan, answered, error="GEMINI_API_KEY not found")
+        prompt = self.build_prompt(missing, UNKNOWN_SCOPE)
+        on_item = self.emitter(emit, {normalize_name(item.get('name')) for item in missing})
         try:
-            response = self.model.generate_content(prompt)
-            text = response.text.replace('```json', '').replace('```', '').strip()
-            return json.loads(text)
+            result = await self.generate_routed_async(prompt, OUTPUT, on_item=on_item, appliances=len(missing))
         except Exception as e:
-            return {"error": str(e)}
+            return self.merge(plan, answered, error=str(e))
+        return self.merge(plan, {**answered, **self.remember(missing, result)})
 
 if __name__ == "__main__":
     try:
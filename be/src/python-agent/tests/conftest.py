@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Make the agent scripts and the wattwise_agents package importable from tests
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
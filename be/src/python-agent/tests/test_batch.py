@@ -0,0 +1,119 @@
+import io
+import json
+import sys
+import threading
+import time
+
+import pytest
+
+from bill_parser_agent import BillPdfParserAgent
+from test_bill_rules import MSEDCL_BILL
+from test_runtime import ScriptedModel
+from wattwise_agents.batch import BatchRunner, RateLimiter, iter_jobs, load_payload
+from wattwise_agents.bill_store import NullBillStore
+from wattwise_agents.routing import Router
+from wattwise_agents.scheduler import paced
+
+
+class FakeParser:
+    def __init__(self):
+        self.seen = []
+        self._lock = threading.Lock()
+
+    def parse(self, data):
+        with self._lock:
+            self.seen.append(data["pdfText"])
+        if "broken" in data["pdfText"]:
+            return {"error": "model failed"}
+        return {"totalAmount": len(data["pdfText"]), "confidence": "high"}
+
+
+def write_bills(tmp_path, names):
+    for name in names:
+        (tmp_path / f"{name}.txt").write_text(f"bill {name}")
+
+
+def test_directory_batch_streams_every_result(tmp_path):
+    write_bills(tmp_path, ["a", "b", "broken"])
+    output = io.StringIO()
+
+    summary = BatchRunner(FakeParser(), concurrency=2, output=output).run(iter_jobs(str(tmp_path)))
+
+    lines = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert sorted(line["id"] for line in lines) == ["a.txt", "b.txt", "broken.txt"]
+    assert summary["ok"] == 2 and summary["failed"] == 1
+    assert set(summary["stages"]) == {"load", "parse", "total"}
+
+
+def test_checkpoint_resumes_after_finished_bills(tmp_path):
+    bills = tmp_path / "bills"
+    bills.mkdir()
+    write_bills(bills, ["a", "b", "c"])
+    checkpoint = str(tmp_path / "done.txt")
+    (tmp_path / "done.txt").write_text("a.txt\n")
+
+    parser = FakeParser()
+    summary = BatchRunner(parser, checkpoint=checkpoint, output=io.StringIO()).run(iter_jobs(str(bills)))
+
+    assert summary["skipped"] == 1
+    assert sorted(parser.seen) == ["bill b", "bill c"]
+    assert set(open(checkpoint).read().split()) == {"a.txt", "b.txt", "c.txt"}
+
+
+def test_manifest_with_inline_text(tmp_path):
+    manifest = tmp_path / "bills.jsonl"
+    manifest.write_text(json.dumps({"id": "x1", "pdfText": "bill text"}) + "\n")
+    jobs = list(iter_jobs(str(manifest)))
+    assert jobs == [{"id": "x1", "pdfText": "bill text"}]
+
+
+def test_rate_limiter_spaces_out_calls():
+    limiter = RateLimiter(rate=50)
+    started = time.monotonic()
+    for _ in range(5):
+        limiter.wait()
+    assert time.monotonic() - started >= 0.07
+
+
+def test_pdfs_are_not_treated_as_scans_without_pypdf(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "pypdf", None)
+    (tmp_path / "bill.pdf").write_bytes(b"%PDF-1.4 ...")
+
+    with pytest.raises(RuntimeError, match="pypdf"):
+        load_payload({"id": "bill.pdf", "path": str(tmp_path / "bill.pdf")})
+
+
+class CountingPacer:
+    def __init__(self):
+        self.waits = 0
+
+    def wait(self):
+        self.waits += 1
+
+
+def test_only_model_calls_are_rate_limited(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    agent = BillPdfParserAgent(store=NullBillStore())
+    agent.router = Router(enabled=False)
+    answer = '{"billingPeriod": null, "consumerNumber": null, "confidence": "high"}'
+    agent.model = agent.models[agent.model_name] = ScriptedModel([(0, answer)], agent.model_name)
+    pacer = CountingPacer()
+
+    with paced(pacer):
+        agent.parse({"pdfText": MSEDCL_BILL})
+        assert (pacer.waits, agent.model.calls) == (0, 0)
+        agent.parse({"pdfText": "Units Consumed (kWh): 420\nNet Amount Payable: Rs. 3,450.50"})
+        assert (pacer.waits, agent.model.calls) == (1, 1)
+
+
+def test_rules_only_bills_are_not_held_back_by_the_rate(tmp_path, monkeypatch):
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    for i in range(5):
+        (tmp_path / f"{i}.txt").write_text(MSEDCL_BILL.replace("245", str(245 + i)))
+    runner = BatchRunner(BillPdfParserAgent(store=NullBillStore()), concurrency=1, rate=1, output=io.StringIO())
+
+    started = time.monotonic()
+    summary = runner.run(iter_jobs(str(tmp_path)))
+
+    assert summary["ok"] == 5
+    assert time.monotonic() - started < 1
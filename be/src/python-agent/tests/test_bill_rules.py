@@ -0,0 +1,95 @@
+import json
+
+from bill_parser_agent import BillPdfParserAgent
+from test_runtime import ScriptedModel
+from wattwise_agents.bill_rules import extract_fields
+from wattwise_agents.bill_store import NullBillStore
+from wattwise_agents.routing import Router
+
+MSEDCL_BILL = """
+Maharashtra State Electricity Distribution Co. Ltd (MSEDCL)
+Consumer No: 170012345678   Bill Month: OCT-2023
+Consumption (Units): 245
+Current Bill Amount: Rs. 2,130.40
+"""
+
+GENERIC_BILL = """
+Some Power Distribution Ltd
+Account Number : AB-99812
+Billing Period: 01/10/2023 to 31/10/2023
+Units Consumed (kWh): 420
+Net Amount Payable: ₹ 3,450.50
+"""
+
+
+def test_utility_template_is_confident():
+    rules = extract_fields(MSEDCL_BILL)
+    assert rules.layout == "MSEDCL"
+    assert not rules.needs_model()
+    assert rules.result() == {
+        "totalAmount": 2130.4,
+        "totalUnits": 245,
+        "billingPeriod": "OCT-2023",
+        "consumerNumber": "170012345678",
+        "confidence": "high",
+    }
+
+
+def test_generic_patterns():
+    rules = extract_fields(GENERIC_BILL)
+    assert rules.layout is None
+    result = rules.result()
+    assert result["totalAmount"] == 3450.5
+    assert result["totalUnits"] == 420
+    assert result["billingPeriod"] == "01/10/2023 to 31/10/2023"
+    assert result["consumerNumber"] == "AB-99812"
+    assert result["confidence"] == "medium"
+
+
+def test_implausible_tariff_is_sent_to_the_model():
+    rules = extract_fields("Units Consumed: 420\nTotal Amount: Rs. 42,000")
+    assert rules.needs_model()
+    assert "totalAmount" in rules.low_confidence_fields()
+
+
+def test_missing_fields_need_the_model():
+    rules = extract_fields("Thank you for paying on time")
+    assert rules.needs_model()
+    assert rules.result()["confidence"] == "low"
+
+
+def parser(monkeypatch, outcomes):
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    agent = BillPdfParserAgent(store=NullBillStore())
+    agent.router = Router(enabled=False)
+    agent.model = agent.models[agent.model_name] = ScriptedModel(outcomes, agent.model_name)
+    return agent
+
+
+def test_optional_fields_the_rules_missed_are_asked_for(monkeypatch):
+    answer = {"billingPeriod": "OCT-2023", "consumerNumber": "AB-99812", "confidence": "high"}
+    agent = parser(monkeypatch, [(0, json.dumps(answer))])
+
+    result = agent.extract_from_text("Units Consumed (kWh): 420\nNet Amount Payable: Rs. 3,450.50")
+
+    assert "billingPeriod" in agent.model.prompts[0] and "totalAmount" not in agent.model.prompts[0]
+    assert result["totalAmount"] == 3450.5 and result["consumerNumber"] == "AB-99812"
+    assert (result["confidence"], result["source"]) == ("medium", "rules+model")
+
+
+def test_a_failed_call_for_optional_fields_keeps_the_rule_result(monkeypatch):
+    agent = parser(monkeypatch, [ValueError("bad request")])
+
+    result = agent.extract_from_text("Units Consumed (kWh): 420\nNet Amount Payable: Rs. 3,450.50")
+
+    assert result["totalUnits"] == 420 and result["billingPeriod"] is None
+    assert result["source"] == "rules"
+
+
+def test_template_bills_parse_without_an_api_key(monkeypatch):
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    agent = BillPdfParserAgent(store=NullBillStore())
+
+    assert agent.parse({"pdfText": MSEDCL_BILL})["totalAmount"] == 2130.4
+    assert agent.parse({"pdfText": "Thank you for paying on time"}) == {"error": "GEMINI_API_KEY not found"}
+    assert agent.parse({"isImageBased": True, "pdfBase64": "JVBERi0xLjQ="}) == {"error": "GEMINI_API_KEY not found"}
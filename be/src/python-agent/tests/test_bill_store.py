@@ -0,0 +1,96 @@
+import json
+
+import bill_parser_agent
+from bill_parser_agent import BillPdfParserAgent
+from test_runtime import ScriptedModel
+from wattwise_agents.bill_store import BillStore, text_key
+from wattwise_agents.routing import Router
+
+# No layout matches and only the units are labelled, so the model is asked for the rest
+BILL = """
+Some Power Distribution Ltd
+Units Consumed (kWh): 420
+"""
+
+ANSWER = {"totalAmount": 3450.5, "billingPeriod": None, "consumerNumber": "AB-99812", "confidence": "high"}
+
+
+def parser(monkeypatch, store, outcomes=((0, json.dumps(ANSWER)),)):
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    agent = BillPdfParserAgent(store=store)
+    agent.router = Router(enabled=False)
+    agent.model = agent.models[agent.model_name] = ScriptedModel(list(outcomes), agent.model_name)
+    return agent
+
+
+def test_text_keys_ignore_whitespace_and_case():
+    assert text_key("Units  Consumed:\n420") == text_key("units consumed: 420 ")
+    assert text_key("Units Consumed: 420") != text_key("Units Consumed: 421")
+
+
+def test_a_bill_uploaded_again_is_answered_from_the_store(monkeypatch, tmp_path):
+    store = BillStore(str(tmp_path / "bills.sqlite3"))
+    agent = parser(monkeypatch, store)
+
+    first = agent.parse({"pdfText": BILL})
+    again = agent.parse({"pdfText": BILL.replace("\n", "  \n")})
+
+    assert agent.model.calls == 1
+    assert first["totalAmount"] == again["totalAmount"] == 3450.5
+    assert again["confidence"] == first["confidence"]
+    assert again["stored"]["model"] == agent.model_name
+    assert store.stats()["hits"] == 1
+
+
+def test_a_new_extractor_invalidates_stored_bills(monkeypatch, tmp_path):
+    path = str(tmp_path / "bills.sqlite3")
+    agent = parser(monkeypatch, BillStore(path))
+    agent.parse({"pdfText": BILL})
+
+    monkeypatch.setattr("bill_parser_agent.EXTRACTOR_VERSION", bill_parser_agent.EXTRACTOR_VERSION + 1)
+    store = BillStore(path)
+    upgraded = parser(monkeypatch, store)
+
+    assert store.stats()["entries"] == 0
+    assert "stored" not in upgraded.parse({"pdfText": BILL})
+    assert upgraded.model.calls == 1
+
+
+def test_failures_are_not_stored(monkeypatch, tmp_path):
+    store = BillStore(str(tmp_path / "bills.sqlite3"))
+    agent = parser(monkeypatch, store, [ValueError("bad request")])
+
+    assert "error" in agent.parse({"pdfText": BILL})
+    assert store.stats()["entries"] == 0
+
+
+def test_low_confidence_answers_are_asked_for_again(monkeypatch, tmp_path):
+    store = BillStore(str(tmp_path / "bills.sqlite3"))
+    agent = parser(monkeypatch, store, [(0, json.dumps({**ANSWER, "confidence": "low"}))])
+
+    agent.parse({"pdfText": BILL})
+    agent.parse({"pdfText": BILL})
+
+    assert agent.model.calls == 2
+    assert store.stats()["entries"] == 0
+
+
+def test_vision_settings_are_part_of_the_fingerprint(monkeypatch, tmp_path):
+    agent = parser(monkeypatch, BillStore(str(tmp_path / "bills.sqlite3")))
+    before = agent.fingerprint("vision")
+
+    monkeypatch.setattr("wattwise_agents.vision.MAX_PAGES", 3)
+
+    assert agent.fingerprint("vision") != before
+
+
+def test_least_recently_used_bills_are_evicted(tmp_path):
+    store = BillStore(str(tmp_path / "bills.sqlite3"), max_entries=2)
+    for name in "abc":
+        store.put(name, "v1", {"totalUnits": 1, "confidence": "high"})
+        if name == "b":
+            store.get("a", "v1")
+
+    assert store.get("b", "v1") is None
+    assert store.get("a", "v1")["confidence"] == "high"
+    assert store.stats()["evictions"] == 1
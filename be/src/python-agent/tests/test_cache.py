@@ -0,0 +1,59 @@
+import time
+
+from wattwise_agents.cache import ResponseCache, canonical_key
+
+BREAKDOWN = [
+    {"name": "Air Conditioner", "hours": 8, "watts": 1500, "monthlyUnits": 360.001},
+    {"name": "LED Bulb", "hours": 6, "watts": 9, "monthlyUnits": 6.5},
+]
+
+
+def test_equivalent_inputs_share_a_key():
+    reordered = [
+        {"name": "led  bulb", "hours": 6.0, "watts": 9, "monthlyUnits": 6.5},
+        {"name": "AIR CONDITIONER", "hours": 8, "watts": 1500, "monthlyUnits": 360},
+    ]
+    assert canonical_key("co2", {"breakdown": BREAKDOWN}) == canonical_key("co2", {"breakdown": reordered})
+    assert canonical_key("co2", {"breakdown": BREAKDOWN}) != canonical_key("recommendation", {"breakdown": BREAKDOWN})
+
+
+def test_lru_eviction_and_counters():
+    cache = ResponseCache(max_entries=2)
+    for i in range(3):
+        cache.set("co2", {"n": i}, {"value": i})
+    assert cache.get("co2", {"n": 0}) is None
+    assert cache.get("co2", {"n": 2}) == {"value": 2}
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+
+def test_entries_expire():
+    cache = ResponseCache(ttl=0.01)
+    cache.set("co2", {"n": 1}, {"value": 1})
+    time.sleep(0.02)
+    assert cache.get("co2", {"n": 1}) is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_errors_are_not_cached():
+    cache = ResponseCache()
+    calls = []
+    compute = lambda: calls.append(1) or {"error": "quota"}
+    cache.get_or_compute("co2", {}, compute)
+    cache.get_or_compute("co2", {}, compute)
+    assert len(calls) == 2
+
+
+def test_degraded_answers_are_not_cached():
+    cache = ResponseCache()
+    cache.set("recommendation", {}, {"suggestions": [], "degraded": "503 overloaded"})
+    assert cache.get("recommendation", {}) is None
+
+
+def test_entries_survive_a_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    ResponseCache(path=path).set("weather", {"city": "Pune"}, {"weatherFactor": 1.1})
+    restarted = ResponseCache(path=path)
+    assert restarted.get("weather", {"city": "pune"}) == {"weatherFactor": 1.1}
+    assert restarted.stats()["diskHits"] == 1
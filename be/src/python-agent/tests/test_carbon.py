@@ -0,0 +1,61 @@
+from co2_agent import CO2Agent
+from test_runtime import ScriptedModel
+from wattwise_agents.cache import ResponseCache
+from wattwise_agents.carbon import CarbonEngine, appliance_units, describe
+
+
+def test_units_fall_back_to_rating():
+    assert appliance_units({"monthlyUnits": 42}) == 42
+    assert appliance_units({"watts": 1000, "hours": 2, "count": 2}) == 120
+
+
+def test_footprint_uses_national_factor_by_default():
+    engine = CarbonEngine()
+    result = engine.calculate([{"name": "Television", "monthlyUnits": 100}])
+    assert result["carbonFootprint"] == 82.0
+    assert result["impact"] == {"trees": 4, "carKm": 480}
+
+
+def test_regional_factor_and_overrides():
+    engine = CarbonEngine(grid_factors={"southern": 0.5})
+    assert engine.grid_factor("Chennai") == 0.5
+    assert engine.grid_factor("southern") == 0.5
+    assert engine.grid_factor("Atlantis") == 0.82
+
+
+def test_appliance_type_adjustments():
+    engine = CarbonEngine()
+    assert engine.adjustment("Refrigerator (Double Door)") == 0.5
+    assert engine.adjustment("AC (1.5 Ton)") == 0.8
+    assert engine.adjustment("Split Air Conditioner") == 0.8
+    assert engine.adjustment("Vacuum Cleaner") == 1.0
+
+
+def test_template_description_quotes_the_numbers():
+    footprint = CarbonEngine().calculate([{"name": "Fan", "monthlyUnits": 10}])
+    assert "8.2kg" in describe(footprint)
+
+
+def test_narrative_is_reused_while_the_quoted_numbers_are_unchanged(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    agent = CO2Agent(cache=ResponseCache())
+    agent.model = agent.models[agent.model_name] = ScriptedModel([(0, "About 82 kg of CO2.")])
+
+    first = agent.analyze({"breakdown": [{"name": "Television", "monthlyUnits": 100}]})
+    split = agent.analyze({"breakdown": [{"name": "Television", "monthlyUnits": 60}, {"name": "Laptop", "monthlyUnits": 40}]})
+
+    assert agent.model.calls == 1
+    assert first["impact"]["description"] == split["impact"]["description"] == "About 82 kg of CO2."
+
+
+def test_template_answer_after_a_model_failure_is_not_cached(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    agent = CO2Agent(cache=ResponseCache())
+    agent.model = agent.models[agent.model_name] = ScriptedModel([ValueError("400 bad request"), (0, "About 82 kg.")])
+    data = {"breakdown": [{"name": "Television", "monthlyUnits": 100}]}
+
+    fallback = agent.analyze(data)
+    recovered = agent.analyze(data)
+
+    assert fallback["degraded"] == "400 bad request" and "82.0kg" in fallback["impact"]["description"]
+    assert recovered["impact"]["description"] == "About 82 kg." and "degraded" not in recovered
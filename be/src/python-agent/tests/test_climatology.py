@@ -0,0 +1,94 @@
+import json
+
+from wattwise_agents.__main__ import forecast_results
+from wattwise_agents.climatology import Climatology, explain, month_index
+
+APPLIANCES = [
+    {"name": "AC (1.5 Ton)", "count": 1, "hours": 8, "watts": 1500},
+    {"name": "Ceiling Fan", "count": 3, "hours": 10, "watts": 75},
+    {"name": "Refrigerator", "count": 1, "hours": 24, "watts": 200},
+    {"name": "LED Bulb", "count": 6, "hours": 6, "watts": 9},
+]
+
+MONTHS_USED = ["January", "April", "June", "October"]
+
+
+def household(city, month):
+    return {"city": city, "currentMonth": month, "currentBill": 3000, "appliances": APPLIANCES}
+
+
+def test_month_parsing():
+    assert month_index("November") == 10
+    assert month_index("dec") == 11
+    assert month_index(1) == 0
+
+
+def test_summer_onset_raises_the_bill_and_monsoon_lowers_it():
+    climatology = Climatology()
+    spring = climatology.predict(household("Delhi", "April"))
+    assert spring["nextMonth"] == "May"
+    assert spring["weatherFactor"] > 1.2
+    assert spring["predictedBill"] == round(3000 * spring["weatherFactor"], 2)
+    assert climatology.predict(household("Chennai", "October"))["weatherFactor"] < 1
+
+
+def test_predictions_are_reproducible():
+    assert Climatology().predict(household("Pune", "March")) == Climatology().predict(household("Pune", "March"))
+
+
+def test_unlisted_city_uses_nearest_station():
+    climatology = Climatology()
+    assert climatology.station("Noida") == "delhi"
+    assert climatology.station("Atlantis") == "mumbai"
+
+
+def test_appliance_classes():
+    climatology = Climatology()
+    assert climatology.appliance_class("Table Fan") == "fans"
+    assert climatology.appliance_class("AC (1.0 Ton)") == "cooling"
+    assert climatology.appliance_class("Room Heater") == "heating"
+    assert climatology.appliance_class("Microwave") == "other"
+
+
+def test_batch_and_template_reasoning():
+    results = Climatology().predict_many([household("Delhi", "April"), household("Mumbai", "May")])
+    assert [r["nextMonth"] for r in results] == ["May", "June"]
+    assert "May in Delhi" in explain(household("Delhi", "April"), results[0])
+
+
+def test_batch_matches_single_predictions():
+    climatology = Climatology()
+    households = [household(city, month) for city in ("Delhi", "Pune", "Tiruppur", "Srinagar") for month in MONTHS_USED]
+    households += [
+        {"city": "Kolkata", "currentMonth": "June", "currentBill": 1200, "appliances": []},
+        {"city": "Jaipur", "currentMonth": 5, "currentBill": "900", "appliances": [{"name": "Room Heater", "watts": 2000}]},
+    ]
+
+    assert climatology.predict_many(households) == [climatology.predict(h) for h in households]
+    assert climatology.predict_many([]) == []
+
+
+def test_forecast_command_matches_per_line_predictions():
+    climatology = Climatology()
+    households = [{"id": i, **household(city, month)} for i, (city, month) in enumerate(
+        [("Delhi", "April"), ("Pune", "June"), ("Chennai", "May"), ("Srinagar", "December"), ("Patna", "March")]
+    )]
+    lines = [json.dumps(h) + "\n" for h in households]
+    lines[1:1] = ["not json\n", "\n"]
+    lines.insert(5, json.dumps({"id": "bad", **household("Delhi", "Smarch")}) + "\n")
+
+    results = list(forecast_results(lines, climatology, chunk_lines=3))
+
+    expected = []
+    for h in households:
+        prediction = climatology.predict(h)
+        expected.append({
+            "id": h["id"],
+            "nextMonth": prediction["nextMonth"],
+            "weatherFactor": prediction["weatherFactor"],
+            "predictedBill": prediction["predictedBill"],
+            "reasoning": explain(h, prediction),
+        })
+    assert [r for r in results if "error" not in r] == expected
+    assert [r.get("id") for r in results] == [0, None, 1, 2, "bad", 3, 4]
+    assert results[4] == {"id": "bad", "error": "Unknown month: Smarch"}
@@ -0,0 +1,40 @@
+import json
+
+from combined_agent import CombinedAnalysisAgent
+from test_runtime import ScriptedModel
+from wattwise_agents.cache import NullCache
+from wattwise_agents.routing import Router
+
+BREAKDOWN = [{"name": "Air Conditioner", "count": 1, "hours": 8, "watts": 1500, "monthlyUnits": 360}]
+OUTPUT = {
+    "description": "About 236 kg of CO2 this month.",
+    "suggestions": [{"name": "Air Conditioner", "reductionPercentage": 0.15, "strategy": "Use the timer"}],
+}
+
+
+def agent(monkeypatch, outcomes):
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    combined = CombinedAnalysisAgent(cache=NullCache())
+    combined.router = Router(enabled=False)
+    combined.model = combined.models[combined.model_name] = ScriptedModel(outcomes)
+    return combined
+
+
+def test_one_call_returns_footprint_impact_and_suggestions(monkeypatch):
+    combined = agent(monkeypatch, [(0, json.dumps(OUTPUT))])
+
+    result = combined.analyze({"breakdown": BREAKDOWN, "city": "Pune"})
+
+    assert combined.model.calls == 1
+    assert result["carbonFootprint"] > 0
+    assert result["impact"]["description"] == OUTPUT["description"]
+    assert result["suggestions"] == OUTPUT["suggestions"]
+
+
+def test_model_failure_returns_the_local_footprint_as_partial(monkeypatch):
+    combined = agent(monkeypatch, [RuntimeError("400 API key not valid")])
+
+    result = combined.analyze({"breakdown": BREAKDOWN})
+
+    assert result["error"].startswith("400")
+    assert "kg of CO2" in result["partial"]["impact"]["description"]
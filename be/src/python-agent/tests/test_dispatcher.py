@@ -0,0 +1,91 @@
+import asyncio
+
+from wattwise_agents.dispatcher import AnalysisDispatcher, build_weather_input
+
+BILL = {
+    "breakdown": [
+        {"name": "Air Conditioner", "count": 1, "hours": 8, "watts": 1500, "monthlyUnits": 360, "estimatedCost": 3600},
+        {"name": "LED Bulb", "count": 4, "hours": 6, "watts": 9, "monthlyUnits": 6.5, "estimatedCost": 65},
+    ]
+}
+
+
+class AsyncCO2:
+    async def analyze_async(self, data):
+        return {"carbonFootprint": 300.5, "impact": {"trees": 14, "carKm": 1400}}
+
+
+class SyncRecommendation:
+    def analyze(self, data):
+        return {"suggestions": [{"name": "Air Conditioner", "reductionPercentage": 0.2}]}
+
+
+class SlowWeather:
+    async def predict_async(self, data):
+        await asyncio.sleep(5)
+
+
+class FailingWeather:
+    def predict(self, data):
+        return {"error": "quota exceeded"}
+
+
+def dispatcher(weather, **kwargs):
+    agents = {"co2": AsyncCO2(), "recommendation": SyncRecommendation(), "weather": weather}
+    return AnalysisDispatcher(agents.__getitem__, **kwargs)
+
+
+def test_weather_input_is_derived_from_breakdown():
+    weather_input = build_weather_input(BILL, "Delhi", "May")
+    assert weather_input["currentBill"] == 3665
+    assert weather_input["appliances"][0] == {"name": "Air Conditioner", "count": 1, "hours": 8, "watts": 1500}
+
+
+def test_results_are_merged():
+    result = dispatcher(FailingWeather()).run({"billData": BILL})
+    assert result["carbonFootprint"] == 300.5
+    assert result["suggestions"][0]["name"] == "Air Conditioner"
+    assert result["weatherPrediction"] is None
+    assert result["errors"] == {"weather": "quota exceeded"}
+
+
+def test_slow_agent_times_out_without_losing_the_rest():
+    result = dispatcher(SlowWeather(), timeouts={"weather": 0.05}).run({"billData": BILL})
+    assert "timed out" in result["errors"]["weather"]
+    assert result["impact"]["trees"] == 14
+
+
+def test_missing_breakdown_is_rejected():
+    assert "error" in dispatcher(FailingWeather()).run({"billData": {}})
+
+
+class Combined:
+    def __init__(self, error=None):
+        self.error = error
+
+    async def analyze_async(self, data):
+        result = {"carbonFootprint": 300.5, "impact": {"trees": 14, "carKm": 1400, "description": "..."}}
+        if self.error:
+            return {"error": self.error, "partial": result}
+        return {**result, "suggestions": [{"name": "Air Conditioner", "reductionPercentage": 0.2}]}
+
+
+def test_combined_mode_gives_the_split_document_shape():
+    agents = {"combined": Combined(), "weather": FailingWeather()}
+    split = dispatcher(FailingWeather()).run({"billData": BILL})
+
+    combined = AnalysisDispatcher(agents.__getitem__, mode="combined").run({"billData": BILL})
+
+    assert combined.keys() == split.keys()
+    assert combined["carbonFootprint"] == 300.5
+    assert combined["suggestions"][0]["name"] == "Air Conditioner"
+
+
+def test_combined_model_failure_keeps_the_local_footprint():
+    agents = {"combined": Combined(error="503 overloaded"), "weather": FailingWeather()}
+
+    result = AnalysisDispatcher(agents.__getitem__).run({"billData": BILL, "analysisMode": "combined"})
+
+    assert result["impact"]["trees"] == 14
+    assert result["suggestions"] == []
+    assert result["errors"] == {"recommendation": "503 overloaded", "weather": "quota exceeded"}
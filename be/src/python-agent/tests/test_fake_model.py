@@ -0,0 +1,67 @@
+import asyncio
+import random
+
+import pytest
+
+from wattwise_agents.bench import bench_env, latency_stats, read_rss
+from wattwise_agents.fake_model import RSS_MARKER, FakeModel, parse_latency
+
+
+def test_latency_distributions():
+    rng = random.Random(1)
+
+    assert parse_latency("fixed:250")(rng) == 0.25
+    assert all(0.1 <= parse_latency("uniform:100:200")(rng) <= 0.2 for _ in range(50))
+    samples = sorted(parse_latency("lognormal:400:0.3")(rng) for _ in range(501))
+    assert 0.3 < samples[250] < 0.5
+    with pytest.raises(ValueError):
+        parse_latency("gamma:1")
+
+
+def test_answers_are_chosen_from_the_prompt():
+    model = FakeModel("gemini-2.0-flash", {"latency": "fixed:0"})
+
+    recommendation = model.generate_content("You are an Energy Efficiency Expert Agent. ...")
+    bill = model.generate_content(["You are an Electricity Bill Parser Agent.", {"mime_type": "image/jpeg"}])
+
+    assert '"suggestions"' in recommendation.text
+    assert '"totalAmount"' in bill.text
+    assert model.calls == 2
+
+
+def test_malformed_and_failing_calls():
+    malformed = FakeModel(config={"latency": "fixed:0", "malformedRate": 1.0, "seed": 3})
+    failing = FakeModel(config={"latency": "fixed:0", "errorRate": 1.0})
+
+    texts = []
+    for _ in range(20):
+        try:
+            texts.append(malformed.generate_content("Energy Efficiency Agent").text)
+        except ValueError:
+            texts.append(None)
+    assert all(text is None or not text.startswith('{"carbonFootprint"') for text in texts)
+    with pytest.raises(RuntimeError, match="503"):
+        failing.generate_content("anything")
+
+
+def test_request_timeout_is_honoured():
+    model = FakeModel(config={"latency": "fixed:200"})
+
+    with pytest.raises(TimeoutError):
+        model.generate_content("prompt", request_options={"timeout": 0.01})
+    with pytest.raises(TimeoutError):
+        asyncio.run(model.generate_content_async("prompt", request_options={"timeout": 0.01}))
+
+
+def test_report_helpers():
+    stats = latency_stats([0.1, 0.2, 0.3, 0.4], errors=1, elapsed=2.0)
+
+    assert stats["p50Ms"] in (200.0, 300.0)
+    assert stats["p99Ms"] == 400.0
+    assert stats["throughputPerSec"] == 2.0
+    assert read_rss(["noise", f"{RSS_MARKER}51200\n"]) == 51200
+
+
+def test_bench_children_skip_the_cache_and_bill_store():
+    env = bench_env({"latency": "fixed:0"})
+    assert env["WATTWISE_CACHE"] == env["WATTWISE_BILL_STORE"] == "off"
@@ -0,0 +1,110 @@
+import csv
+import io
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from wattwise_agents.carbon import CarbonEngine
+from wattwise_agents.climatology import Climatology
+from wattwise_agents.fleet import FleetAnalyzer, FleetReport, chunks, read_batches
+from wattwise_agents.savings import SavingsRules
+
+USERS = {
+    "a": ("Delhi", "May", [
+        {"name": "AC (1.5 Ton)", "count": 1, "hours": 10, "watts": 1500, "monthlyUnits": 450, "estimatedCost": 4500},
+        {"name": "Ceiling Fan", "count": 4, "hours": 14, "watts": 75, "estimatedCost": 1260},
+        {"name": "Aquarium Pump", "count": 1, "hours": 24, "watts": 40, "estimatedCost": 288},
+        {"name": "Geyser (Storage)", "count": 1, "hours": 1, "watts": 2000, "estimatedCost": 600},
+        {"name": "LED Bulb", "count": 6, "hours": 6, "watts": 9, "estimatedCost": 97},
+    ]),
+    "b": ("Chennai", "December", [
+        {"name": "Refrigerator", "count": 1, "hours": 24, "watts": 200, "monthlyUnits": 144, "estimatedCost": 1440},
+    ]),
+    "c": ("", "", [{"name": "Room Heater", "count": 1, "hours": 3, "watts": 2000, "estimatedCost": 1500}]),
+}
+FIELDS = ("userId", "city", "month", "name", "count", "hours", "watts", "monthlyUnits", "estimatedCost")
+
+
+def write_export(path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+        for user, (city, month, breakdown) in USERS.items():
+            for item in breakdown:
+                writer.writerow([user, city, month] + [item.get(k, "") for k in FIELDS[3:]])
+
+
+def expected(city, month, breakdown):
+    """What the per-household code paths give for one user."""
+    city, month = city or "Mumbai", month or "October"
+    footprint = CarbonEngine().calculate(breakdown, region=city)
+    rules = SavingsRules()
+    savings = sum(
+        item["estimatedCost"] * suggestion["reductionPercentage"]
+        for item, suggestion in rules.recommend(breakdown) if suggestion
+    )
+    bill = sum(item["estimatedCost"] for item in breakdown)
+    forecast = Climatology().predict({"city": city, "currentMonth": month, "currentBill": bill, "appliances": breakdown})
+    return footprint, round(savings, 2), forecast
+
+
+def test_vectorized_results_match_the_agents(tmp_path):
+    path = tmp_path / "export.csv"
+    write_export(path)
+
+    [chunk] = chunks(read_batches(str(path)))
+    result = FleetAnalyzer(month="October").analyze(chunk)
+
+    assert result["userId"].tolist() == ["a", "b", "c"]
+    for i, (city, month, breakdown) in enumerate(USERS.values()):
+        footprint, savings, forecast = expected(city, month, breakdown)
+        assert result["carbonFootprint"][i] == footprint["carbonFootprint"]
+        assert result["trees"][i] == footprint["impact"]["trees"]
+        assert result["carKm"][i] == footprint["impact"]["carKm"]
+        assert result["projectedSavings"][i] == pytest.approx(savings)
+        assert result["weatherFactor"][i] == forecast["weatherFactor"]
+        assert result["predictedBill"][i] == pytest.approx(forecast["predictedBill"])
+        assert result["nextMonth"][i] == forecast["nextMonth"]
+
+
+def test_chunks_never_split_a_user():
+    batches = [{"userId": ["a", "a", "b"], "name": ["x"] * 3}, {"userId": ["b", "b", "c"], "name": ["x"] * 3}]
+
+    sizes = [chunk["userId"] for chunk in chunks(iter(batches), chunk_rows=2)]
+
+    assert sizes == [["a", "a"], ["b", "b", "b"], ["c"]]
+
+
+def test_report_streams_users_and_totals(tmp_path):
+    path = tmp_path / "export.csv"
+    write_export(path)
+    single, pooled = io.StringIO(), io.StringIO()
+
+    summary = FleetReport(processes=1, chunk_rows=2, month="October", output=single).run(str(path))
+    FleetReport(processes=2, chunk_rows=2, month="October", output=pooled).run(str(path))
+
+    assert single.getvalue() == pooled.getvalue()
+    assert len(single.getvalue().splitlines()) == 4
+    assert (summary["rows"], summary["users"], summary["chunks"]) == (7, 3, 2)
+    assert summary["byCity"]["Mumbai"]["users"] == 1
+    assert summary["totals"]["carbonFootprint"] == pytest.approx(sum(
+        c["carbonFootprint"] for c in summary["byCity"].values()
+    ))
+
+
+def test_parquet_export(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    table = pa.table({
+        "userId": ["a", "a", "b"], "city": ["Delhi", "Delhi", None], "name": ["AC", "LED Bulb", "Fan"],
+        "count": [1, 4, None], "hours": [8.0, 6.0, 12.0], "watts": [1500, 9, 75], "estimatedCost": [3600, 65, 270],
+    })
+    pq.write_table(table, tmp_path / "export.parquet")
+
+    [chunk] = chunks(read_batches(str(tmp_path / "export.parquet")))
+    result = FleetAnalyzer(month="May").analyze(chunk)
+
+    assert result["city"].tolist() == ["Delhi", "Mumbai"]
+    assert result["currentBill"].tolist() == [3665, 270]
@@ -0,0 +1,68 @@
+import json
+import random
+import urllib.request
+
+import pytest
+
+from wattwise_agents.loadtest import FakeWeatherServer, Traffic, load_catalogue, saturation, synthetic_pdf
+
+
+def level(users, throughput, p99=500, error_rate=0.0):
+    return {"users": users, "throughputPerSec": throughput, "p99Ms": p99, "errorRate": error_rate}
+
+
+def test_catalogue_breakdowns_look_like_the_app(tmp_path):
+    catalogue = load_catalogue()
+    assert ("AC (1.5 Ton)", "Cooling", 1500) in catalogue
+    assert ('TV (LED 32-43")', "Entertainment", 60) in catalogue
+
+    traffic = Traffic(catalogue, str(tmp_path))
+    breakdown = traffic.breakdown(random.Random(1))
+    assert 4 <= len(breakdown) <= 10
+    for item in breakdown:
+        assert item["monthlyUnits"] == round(item["watts"] * item["hours"] * item["count"] * 30 / 1000, 1)
+
+
+def test_requests_cover_every_kind(tmp_path):
+    traffic = Traffic(load_catalogue(), str(tmp_path))
+    rng = random.Random(2)
+
+    agent, analysis = traffic.request("analysis", rng)
+    _, text = traffic.request("bill-text", rng)
+    _, scan = traffic.request("bill-vision", rng)
+
+    assert agent == "analyze" and analysis["billData"]["breakdown"]
+    assert "Net Amount Payable" in text["pdfText"]
+    with open(scan["pdfPath"], "rb") as f:
+        assert f.read().startswith(b"%PDF-1.4")
+
+
+def test_synthetic_pdf_has_a_readable_text_layer():
+    pypdf = pytest.importorskip("pypdf")
+    import io
+
+    reader = pypdf.PdfReader(io.BytesIO(synthetic_pdf(["Units Consumed (kWh): 420", "Net Amount Payable: Rs. 3,360.00"])))
+    assert "Units Consumed (kWh): 420" in reader.pages[0].extract_text()
+
+
+def test_fake_weather_server_answers_like_openweathermap():
+    with FakeWeatherServer(latency="fixed:0", error_rate=0.0) as server:
+        with urllib.request.urlopen(f"{server.url}/data/2.5/weather?lat=19.07&lon=72.87") as response:
+            body = json.loads(response.read())
+        with urllib.request.urlopen(f"{server.url}/data/2.5/forecast?lat=19.07&lon=72.87&cnt=8") as response:
+            forecast = json.loads(response.read())
+    assert body["main"]["humidity"] == 60 and body["weather"][0]["description"]
+    assert len(forecast["list"]) == 8
+    assert server.requests == 2
+
+
+def test_saturation_is_where_throughput_stops_growing_or_limits_are_passed():
+    growing = [level(50, 10), level(100, 20), level(200, 38)]
+    assert saturation(growing, slo_ms=5000, error_budget=0.01) is None
+
+    flat = growing + [level(500, 39)]
+    assert saturation(flat, 5000, 0.01) == {
+        "users": 500, "reason": "throughput", "lastGoodUsers": 200, "maxThroughputPerSec": 39,
+    }
+    assert saturation([level(50, 10), level(100, 20, p99=8000)], 5000, 0.01)["reason"] == "p99"
+    assert saturation([level(50, 10, error_rate=0.2)], 5000, 0.01)["lastGoodUsers"] is None
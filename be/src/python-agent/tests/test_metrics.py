@@ -0,0 +1,71 @@
+import io
+import json
+
+from wattwise_agents.fake_model import FakeResponse
+from wattwise_agents.metrics import NULL_SPAN, Metrics
+
+
+def test_disabled_metrics_hand_out_the_shared_no_op_span():
+    metrics = Metrics(mode="off")
+
+    with metrics.span("co2.model") as s:
+        s.set(promptChars=10)
+    metrics.model_call("co2", "prompt", FakeResponse("text"))
+
+    assert metrics.span("co2.model") is NULL_SPAN
+    assert metrics.spans == {} and metrics.counters == {}
+
+
+def test_spans_are_emitted_as_json_with_their_parent():
+    stream = io.StringIO()
+    metrics = Metrics(mode="stderr", stream=stream)
+
+    with metrics.span("worker.request", agent="co2"):
+        with metrics.span("co2.model") as s:
+            s.set(attempt=1)
+
+    events = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [e["span"] for e in events] == ["co2.model", "worker.request"]
+    assert events[0]["parent"] == "worker.request" and events[0]["attempt"] == 1
+    assert events[1]["agent"] == "co2" and "parent" not in events[1]
+
+
+def test_failed_spans_are_marked():
+    metrics = Metrics(mode="stderr", stream=io.StringIO())
+
+    try:
+        with metrics.span("recommendation.parse"):
+            raise ValueError("bad json")
+    except ValueError:
+        pass
+
+    assert metrics.spans["recommendation.parse"][2] == 1
+
+
+def test_model_calls_record_sizes_tokens_and_retries():
+    stream = io.StringIO()
+    metrics = Metrics(mode="stderr", stream=stream)
+
+    metrics.model_call("bill", ["Parse this bill", {"mime_type": "image/jpeg", "data": b"x" * 300}],
+                       FakeResponse('{"totalAmount": 1}', "Parse this bill"), retries=2)
+
+    event = json.loads(stream.getvalue())
+    assert event["promptChars"] == len("Parse this bill")
+    assert event["dataBytes"] == 300
+    assert event["responseChars"] == len('{"totalAmount": 1}')
+    assert event["promptTokens"] == 3 and event["retries"] == 2
+
+
+def test_prometheus_textfile(tmp_path):
+    path = tmp_path / "agents.prom"
+    metrics = Metrics(mode="file", path=str(path))
+
+    with metrics.span("weather.model"):
+        pass
+    metrics.model_call("weather", "prompt", None)
+    metrics.write()
+
+    text = path.read_text()
+    assert 'wattwise_span_seconds_count{span="weather.model"} 1' in text
+    assert 'wattwise_span_seconds_bucket{span="weather.model",le="+Inf"} 1' in text
+    assert 'wattwise_model_calls_total{agent="weather",outcome="failed"} 1' in text
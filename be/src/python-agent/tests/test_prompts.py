@@ -0,0 +1,51 @@
+import json
+
+from wattwise_agents.metrics import NULL_SPAN
+from wattwise_agents.prompts import appliance_table, bill_excerpt, count_tokens, record
+
+BREAKDOWN = [
+    {"name": f"Appliance {i}", "count": 1, "hours": 2, "watts": 100, "wattageUsed": 100,
+     "monthlyUnits": float(i), "estimatedCost": i * 10.0}
+    for i in range(1, 41)
+]
+
+BILL = "\n".join(
+    ["MAHARASHTRA STATE ELECTRICITY DISTRIBUTION CO. LTD", "Consumer No: 170012345678"]
+    + [f"Tariff slab note {i}: charges apply as per the order of the commission" for i in range(300)]
+    + ["Bill Month: OCT-2023", "Units Consumed: 420", "Net Amount Payable: Rs. 3,450.50"]
+)
+
+
+def test_table_is_smaller_than_json_and_keeps_the_biggest_consumers():
+    table = appliance_table(BREAKDOWN[:5], 600)
+
+    assert table.splitlines()[:2] == ["name|count|hours/day|watts|kWh/month", "Appliance 5|1|2|100|5"]
+    assert count_tokens(table) * 3 < count_tokens(json.dumps(BREAKDOWN[:5], indent=2))
+
+
+def test_table_folds_rows_past_the_budget_into_other():
+    table = appliance_table(BREAKDOWN, 60)
+    other = table.splitlines()[-1]
+
+    assert count_tokens(table) <= 70
+    assert other.startswith("Other (") and "appliances)" in other
+    folded = int(other.split("(")[1].split()[0])
+    assert float(other.split("|")[-1]) == sum(range(1, folded + 1))
+
+
+def test_bill_excerpt_keeps_totals_that_truncation_drops():
+    assert "Net Amount Payable" not in BILL[:8000]
+
+    excerpt = bill_excerpt(BILL, ["totalAmount", "totalUnits"], 200)
+
+    assert "Net Amount Payable: Rs. 3,450.50" in excerpt
+    assert "Units Consumed: 420" in excerpt
+    assert "..." in excerpt
+    assert count_tokens(excerpt) <= 200
+
+
+def test_record_reports_savings():
+    tokens, saved = record(NULL_SPAN, "recommendation", "prompt " * 10, "a|b", json.dumps(BREAKDOWN, indent=2))
+
+    assert tokens == count_tokens("prompt " * 10)
+    assert saved > 0
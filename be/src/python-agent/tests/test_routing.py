@@ -0,0 +1,69 @@
+import asyncio
+import json
+
+import pytest
+
+from test_runtime import ScriptedModel, make_agent
+from wattwise_agents.routing import Router
+from wattwise_agents.schema import Decoder, SchemaError, object_schema
+
+TIERS = ("lite", "flash", "pro")
+DECODER = Decoder(object_schema({"total": {"type": "NUMBER"}, "confidence": {"type": "STRING"}}))
+
+
+def answer(confidence):
+    return (0, json.dumps({"total": 10, "confidence": confidence}))
+
+
+def routed_agent(monkeypatch, **tiers):
+    agent = make_agent(monkeypatch, [])
+    agent.router = Router(tiers=TIERS, appliance_limit=10, text_limit=1000)
+    for name, outcomes in tiers.items():
+        agent.models[name] = ScriptedModel(outcomes, name)
+    return agent
+
+
+def test_start_tier_follows_input_size_and_kind():
+    router = Router(tiers=TIERS, appliance_limit=10, text_limit=1000)
+
+    assert router.cascade("fixed", appliances=3) == ["lite", "flash", "pro"]
+    assert router.cascade("fixed", appliances=30) == ["flash", "pro"]
+    assert router.cascade("fixed", text_chars=5000) == ["flash", "pro"]
+    assert router.cascade("fixed", vision=True) == ["flash", "pro"]
+    assert Router(tiers=TIERS, enabled=False).cascade("fixed", appliances=3) == ["fixed"]
+
+
+def test_confident_answer_stays_on_the_cheap_tier(monkeypatch):
+    agent = routed_agent(monkeypatch, lite=[answer("high")], flash=[answer("high")])
+
+    assert agent.generate_routed("prompt", DECODER, accept=lambda r: r["confidence"] != "low") == {
+        "total": 10, "confidence": "high",
+    }
+    assert agent.models["lite"].calls == 1 and agent.models["flash"].calls == 0
+
+
+def test_low_confidence_and_invalid_output_escalate(monkeypatch):
+    agent = routed_agent(monkeypatch, lite=[answer("low")], flash=[(0, "no json")], pro=[answer("medium")])
+
+    value = agent.generate_routed("prompt", DECODER, accept=lambda r: r["confidence"] != "low")
+
+    assert value["confidence"] == "medium"
+    # flash got its one repair call before the request moved on
+    assert [agent.models[t].calls for t in TIERS] == [1, 2, 1]
+
+
+def test_last_tier_answer_is_returned_or_raised(monkeypatch):
+    low = routed_agent(monkeypatch, flash=[answer("low")], pro=[answer("low")])
+    invalid = routed_agent(monkeypatch, flash=[(0, "no json")], pro=[(0, "still no json")])
+
+    assert low.generate_routed("prompt", DECODER, accept=lambda r: False, vision=True)["confidence"] == "low"
+    with pytest.raises(SchemaError):
+        invalid.generate_routed("prompt", DECODER, vision=True)
+
+
+def test_async_cascade(monkeypatch):
+    agent = routed_agent(monkeypatch, lite=[answer("low")], flash=[answer("high")])
+
+    value = asyncio.run(agent.generate_routed_async("prompt", DECODER, accept=lambda r: r["confidence"] != "low"))
+
+    assert value["confidence"] == "high"
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from wattwise_agents.fake_model import FakeResponse, FakeStream
+from wattwise_agents.runtime import CallPolicy, DeadlineExceeded, GeminiAgent, is_transient
+
+
+class ScriptedModel:
+    """Plays back a list of outcomes: an exception to raise, or (delay, text)."""
+
+    def __init__(self, outcomes, name="scripted"):
+        self.name = name
+        self.outcomes = list(outcomes)
+        self.calls = 0
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def _next(self, contents):
+        with self._lock:
+            self.calls += 1
+            self.prompts.append(contents)
+            return self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+
+    def generate_content(self, contents, **kwargs):
+        outcome = self._next(contents)
+        if isinstance(outcome, Exception):
+            raise outcome
+        delay, text = outcome
+        time.sleep(delay)
+        return FakeResponse(text)
+
+    async def generate_content_async(self, contents, **kwargs):
+        outcome = self._next(contents)
+        if isinstance(outcome, Exception):
+            raise outcome
+        delay, text = outcome
+        await asyncio.sleep(delay)
+        return FakeStream(FakeResponse(text), 0) if kwargs.get("stream") else FakeResponse(text)
+
+
+def make_agent(monkeypatch, outcomes, **policy):
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+
+    class Agent(GeminiAgent):
+        name = "test"
+        model_name = f"test-model-{id(outcomes)}"
+
+    Agent.policy = CallPolicy(**{"backoff": 0.001, **policy})
+    agent = Agent()
+    agent.model = agent.models[agent.model_name] = ScriptedModel(outcomes, agent.model_name)
+    return agent
+
+
+def test_missing_key_is_an_error_only_when_the_model_is_required(monkeypatch):
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+
+    with pytest.raises(ValueError):
+        GeminiAgent()
+    assert GeminiAgent(require_model=False).model is None
+
+
+def test_transient_errors_are_retried(monkeypatch):
+    agent = make_agent(monkeypatch, [RuntimeError("503 overloaded"), RuntimeError("429 quota"), (0, '{"ok": true}')])
+
+    assert agent.generate_text("prompt") == '{"ok": true}'
+    assert agent.model.calls == 3
+
+
+def test_permanent_errors_and_exhausted_retries_raise(monkeypatch):
+    invalid = make_agent(monkeypatch, [RuntimeError("400 API key not valid")])
+    overloaded = make_agent(monkeypatch, [RuntimeError("503 overloaded")], retries=2)
+
+    with pytest.raises(RuntimeError, match="400"):
+        invalid.generate("prompt")
+    with pytest.raises(RuntimeError, match="503"):
+        overloaded.generate("prompt")
+    assert invalid.model.calls == 1 and overloaded.model.calls == 3
+
+
+def test_async_calls_respect_the_deadline(monkeypatch):
+    agent = make_agent(monkeypatch, [(1.0, "late")], timeout=0.05)
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(agent.generate_text_async("prompt"))
+    assert time.monotonic() - started < 0.5
+
+
+def test_hedged_request_returns_the_faster_copy(monkeypatch):
+    agent = make_agent(monkeypatch, [(1.0, "slow"), (0.01, "fast")], hedge=True, hedge_after=0.05)
+
+    started = time.monotonic()
+    assert agent.generate_text("prompt") == "fast"
+    assert asyncio.run(make_agent(monkeypatch, [(1.0, "slow"), (0.01, "fast")], hedge=True,
+                                  hedge_after=0.05).generate_text_async("prompt")) == "fast"
+    assert time.monotonic() - started < 0.9
+
+
+def test_error_classification():
+    assert is_transient(TimeoutError("504 Deadline Exceeded"))
+    assert is_transient(RuntimeError("503 The model is overloaded."))
+    assert not is_transient(ValueError("Expecting value: line 1 column 1"))
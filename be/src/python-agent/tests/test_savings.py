@@ -0,0 +1,109 @@
+import json
+
+from recommendation_agent import RecommendationAgent
+from test_runtime import ScriptedModel
+from wattwise_agents.cache import NullCache, ResponseCache
+from wattwise_agents.routing import Router
+from wattwise_agents.savings import SavingsRules
+
+BREAKDOWN = [
+    {"name": "AC (1.5 Ton)", "count": 1, "hours": 10, "watts": 1500, "estimatedCost": 4500},
+    {"name": "Ceiling Fan", "count": 4, "hours": 14, "watts": 75, "estimatedCost": 1260},
+    {"name": "Aquarium Pump", "count": 1, "hours": 24, "watts": 40, "estimatedCost": 288},
+    {"name": "Geyser (Storage)", "count": 1, "hours": 1, "watts": 2000, "estimatedCost": 600},
+    {"name": "LED Bulb", "count": 6, "hours": 6, "watts": 9, "estimatedCost": 97},
+]
+
+
+def test_names_are_matched_whole_then_by_phrase():
+    rules = SavingsRules()
+
+    assert rules.kind("AC (1.5 Ton)") == "ac"
+    assert rules.kind("  refrigerator  (double door)") == "fridge"
+    assert rules.kind("Bedroom Split AC") == "ac"
+    assert rules.kind("Old Tube Light (Old)") == "tube"
+    assert rules.kind("Aquarium Pump") is None
+
+
+def test_rules_depend_on_hours_and_watts():
+    rules = SavingsRules()
+
+    long_ac = rules.suggest({"name": "AC", "hours": 10, "watts": 1500})
+    short_ac = rules.suggest({"name": "AC", "hours": 2, "watts": 1500})
+    old_bulb = rules.suggest({"name": "Bulb", "hours": 4, "watts": 60})
+
+    assert (long_ac["reductionPercentage"], short_ac["reductionPercentage"]) == (0.25, 0.15)
+    assert "25%" in long_ac["strategy"]
+    assert "LED" in old_bulb["strategy"]
+
+
+def test_top_appliances_are_ranked_by_cost():
+    plan = SavingsRules().recommend(BREAKDOWN)
+
+    assert [item["name"] for item, _ in plan] == ["AC (1.5 Ton)", "Ceiling Fan", "Geyser (Storage)", "Aquarium Pump"]
+    assert [suggestion is None for _, suggestion in plan] == [False, False, False, True]
+
+
+def agent(monkeypatch, outcomes, cache=None):
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    recommendation = RecommendationAgent(cache=cache or NullCache())
+    recommendation.router = Router(enabled=False)
+    recommendation.model = recommendation.models[recommendation.model_name] = ScriptedModel(outcomes)
+    return recommendation
+
+
+def test_known_appliances_need_no_model_call(monkeypatch):
+    recommendation = agent(monkeypatch, [RuntimeError("should not be called")])
+
+    result = recommendation.analyze({"breakdown": BREAKDOWN[:2]})
+
+    assert recommendation.model.calls == 0
+    assert result["source"] == "rules"
+    assert [s["name"] for s in result["suggestions"]] == ["AC (1.5 Ton)", "Ceiling Fan"]
+
+
+def test_unknown_appliances_go_to_the_model_in_one_call(monkeypatch):
+    answer = {"suggestions": [{"name": "Aquarium Pump", "reductionPercentage": 0.1, "strategy": "Use a timer"}]}
+    recommendation = agent(monkeypatch, [(0, json.dumps(answer))])
+
+    result = recommendation.analyze({"breakdown": BREAKDOWN})
+
+    assert recommendation.model.calls == 1
+    assert result["source"] == "rules+model"
+    assert result["suggestions"][3] == answer["suggestions"][0]
+
+
+def test_model_failure_keeps_the_rule_suggestions(monkeypatch):
+    recommendation = agent(monkeypatch, [RuntimeError("400 API key not valid")], cache=ResponseCache())
+
+    result = recommendation.analyze({"breakdown": BREAKDOWN})
+    recommendation.analyze({"breakdown": BREAKDOWN})
+
+    assert len(result["suggestions"]) == 3 and result["source"] == "rules"
+    assert result["degraded"] == "400 API key not valid"
+    # Not cached, so the next request asks about the unknown appliance again
+    assert recommendation.model.calls == 2
+
+
+def test_changed_lines_are_the_only_ones_re_prompted(monkeypatch):
+    unknown = [
+        {"name": "Aquarium Pump", "count": 1, "hours": 24, "watts": 40, "estimatedCost": 288},
+        {"name": "EV Charger", "count": 1, "hours": 3, "watts": 3300, "estimatedCost": 2970},
+    ]
+    answers = [
+        {"suggestions": [
+            {"name": "EV Charger", "reductionPercentage": 0.1, "strategy": "Charge off-peak"},
+            {"name": "Aquarium Pump", "reductionPercentage": 0.1, "strategy": "Use a timer"},
+        ]},
+        {"suggestions": [{"name": "EV Charger", "reductionPercentage": 0.15, "strategy": "Charge to 80%"}]},
+    ]
+    recommendation = agent(monkeypatch, [(0, json.dumps(a)) for a in answers], cache=ResponseCache())
+
+    recommendation.analyze({"breakdown": BREAKDOWN[:2] + unknown})
+    changed = [unknown[0], {**unknown[1], "hours": 4, "estimatedCost": 3960}]
+    result = recommendation.analyze({"breakdown": BREAKDOWN[:2] + changed})
+
+    assert recommendation.model.calls == 2
+    assert "EV Charger" in recommendation.model.prompts[1] and "Aquarium Pump" not in recommendation.model.prompts[1]
+    strategies = {s["name"]: s["strategy"] for s in result["suggestions"]}
+    assert strategies["EV Charger"] == "Charge to 80%" and strategies["Aquarium Pump"] == "Use a timer"
@@ -0,0 +1,120 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from test_runtime import make_agent
+from wattwise_agents.scheduler import Overloaded, Scheduler, estimate_tokens, priority
+
+
+def drained(**kwargs):
+    scheduler = Scheduler(enabled=True, **kwargs)
+    scheduler.queue("m").requests.level = 0
+    return scheduler
+
+
+def test_calls_wait_for_the_request_bucket():
+    scheduler = drained(rpm=600)  # one request every 0.1s
+
+    started = time.monotonic()
+    scheduler.acquire("m", "prompt")
+
+    assert 0.05 < time.monotonic() - started < 0.5
+    assert scheduler.stats()["models"]["m"]["admitted"] == 1
+
+
+def test_token_bucket_is_charged_and_settled():
+    scheduler = Scheduler(enabled=True, tpm=10000)
+
+    charged = scheduler.acquire("m", "x" * 400)
+
+    class Response:
+        class usage_metadata:
+            prompt_token_count, candidates_token_count = 100, 20
+
+    assert charged == estimate_tokens("x" * 400)
+    assert scheduler.queue("m").tokens.level == pytest.approx(10000 - charged, abs=1)
+    scheduler.settle("m", charged, Response)
+    assert scheduler.queue("m").tokens.level == pytest.approx(10000 - 120, abs=1)
+
+
+def test_higher_priority_calls_go_first():
+    scheduler = drained(rpm=600)
+    order = []
+
+    def call(name, level):
+        scheduler.acquire("m", "prompt", level)
+        order.append(name)
+
+    threads = [threading.Thread(target=call, args=("background", "background"))]
+    threads[0].start()
+    time.sleep(0.02)
+    threads.append(threading.Thread(target=call, args=("upload", "interactive")))
+    threads[1].start()
+    for thread in threads:
+        thread.join()
+
+    assert order == ["upload", "background"]
+
+
+def test_full_queue_sheds_the_lowest_priority():
+    scheduler = drained(rpm=60, queue_limit=1)
+    outcome = {}
+
+    def background():
+        try:
+            scheduler.acquire("m", "prompt", "background", timeout=5)
+        except Overloaded as e:
+            outcome["background"] = e
+
+    thread = threading.Thread(target=background)
+    thread.start()
+    time.sleep(0.02)
+    upload = threading.Thread(target=scheduler.acquire, args=("m", "prompt", "interactive", 5))
+    upload.start()
+    thread.join()
+
+    assert isinstance(outcome["background"], Overloaded)
+    with pytest.raises(Overloaded, match="full"):
+        scheduler.acquire("m", "prompt", "default")
+    scheduler.queue("m").requests.level = 1
+    upload.join()
+    assert scheduler.stats()["models"]["m"]["shed"] == 2
+
+
+def test_queued_calls_give_up_at_their_deadline():
+    scheduler = drained(rpm=6)
+
+    with pytest.raises(Overloaded, match="within"):
+        asyncio.run(scheduler.acquire_async("m", "prompt", timeout=0.1))
+    assert scheduler.queue("m").waiting == []
+
+
+def test_identical_prompts_in_flight_share_one_call(monkeypatch):
+    agent = make_agent(monkeypatch, [(0.1, "answer")])
+    agent.scheduler = Scheduler(enabled=True)
+    results = []
+
+    threads = [threading.Thread(target=lambda: results.append(agent.generate_text("same"))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["answer"] * 3
+    assert agent.model.calls == 1
+
+
+def test_priority_context_overrides_the_agent_default(monkeypatch):
+    agent = make_agent(monkeypatch, [(0, "answer")])
+    agent.scheduler = Scheduler(enabled=True)
+    seen = []
+    acquire = agent.scheduler.acquire
+    agent.scheduler.acquire = lambda model, contents, level, timeout: seen.append(level) or acquire(model, contents)
+
+    agent.generate_text("one")
+    with priority("background"):
+        agent.generate_text("two")
+
+    assert seen == ["default", "background"]
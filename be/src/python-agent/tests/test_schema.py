@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from test_runtime import make_agent
+from wattwise_agents.fake_model import FakeModel
+from wattwise_agents.schema import SUGGESTIONS, Decoder, SchemaError, coerce, compile_schema, object_schema, repair_text
+
+RECOMMENDATION = Decoder(object_schema({"suggestions": SUGGESTIONS}))
+BILL = Decoder(object_schema({
+    "totalAmount": {"type": "NUMBER", "nullable": True},
+    "billingPeriod": {"type": "STRING", "nullable": True},
+    "confidence": {"type": "STRING", "enum": ["low", "medium", "high"]},
+}))
+
+
+def test_validator_reports_paths():
+    validate = compile_schema(RECOMMENDATION.schema)
+
+    assert validate({"suggestions": [{"name": "AC", "reductionPercentage": 0.1, "strategy": "Timer"}]}) == []
+    assert validate({"suggestions": [{"name": "AC", "reductionPercentage": "lots"}]}) == [
+        "$.suggestions[0].strategy: missing",
+        "$.suggestions[0].reductionPercentage: expected number",
+    ]
+    assert validate({"suggestions": None}) == ["$.suggestions: must not be null"]
+
+
+def test_coerce_fixes_common_type_slips():
+    value = coerce({"totalAmount": "₹3,450.50", "confidence": "High"}, BILL.schema)
+
+    assert value == {"totalAmount": 3450.5, "confidence": "high", "billingPeriod": None}
+    assert coerce("15%", {"type": "NUMBER"}) == 0.15
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('```json\n{"a": 1}\n```', {"a": 1}),
+    ('Here you go: {"a": 1, // the total\n "b": [1, 2,],} Thanks!', {"a": 1, "b": [1, 2]}),
+    ("{'a': None, 'b': True}", {"a": None, "b": True}),
+    ('{"a": [{"x": 1}, {"x": 2, "y": "tru', {"a": [{"x": 1}, {"x": 2, "y": "tru"}]}),
+    ('{"a": [{"x": 1}, {"x": 2, "yy', {"a": [{"x": 1}, {"x": 2}]}),
+    ("Sure! Use less AC.", None),
+])
+def test_repair_text(text, expected):
+    assert repair_text(text) == expected
+
+
+def test_decoder_flags_repaired_output_and_rejects_unfixable():
+    value, repaired = BILL.decode("```json\n{'totalAmount': '3450.5', 'confidence': 'HIGH',}\n```")
+
+    assert repaired and value == {"totalAmount": 3450.5, "confidence": "high", "billingPeriod": None}
+    assert BILL.decode('{"totalAmount": 1, "billingPeriod": null, "confidence": "low"}')[1] is False
+    with pytest.raises(SchemaError) as error:
+        RECOMMENDATION.decode('{"suggestions": [{"name": "AC"}]}')
+    assert "$.suggestions[0].strategy: missing" in error.value.errors
+
+
+def test_invalid_output_gets_one_repair_call(monkeypatch):
+    fixed = '{"suggestions": [{"name": "AC", "reductionPercentage": 0.1, "strategy": "Timer"}]}'
+    agent = make_agent(monkeypatch, [(0, '{"suggestions": [{"name": "AC"}]}'), (0, fixed)])
+
+    assert agent.generate_structured("prompt", RECOMMENDATION)["suggestions"][0]["strategy"] == "Timer"
+    assert agent.model.calls == 2
+
+    broken = make_agent(monkeypatch, [(0, "no json here")])
+    with pytest.raises(SchemaError):
+        asyncio.run(broken.generate_structured_async("prompt", RECOMMENDATION))
+    assert broken.model.calls == 2
+
+
+def test_fake_model_answers_repair_prompts_from_the_schema(monkeypatch):
+    agent = make_agent(monkeypatch, [])
+    agent.model = FakeModel("gemini-2.0-flash", {"latency": "fixed:0"})
+
+    assert agent.generate_structured("unknown prompt", BILL) == {
+        "totalAmount": 0, "billingPeriod": "n/a", "confidence": "low",
+    }
+    assert agent.model.calls == 2
@@ -0,0 +1,85 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from wattwise_agents import AGENT_DIR
+from wattwise_agents.bench import AGENT_MODULES, STARTUP_MULTIPLE, import_profile, interpreter_startup_ms
+from wattwise_agents.env import load_env
+
+
+@pytest.mark.parametrize("agent", sorted(AGENT_MODULES))
+def test_agent_import_loads_no_heavy_modules(agent):
+    profile = import_profile(agent)
+
+    assert profile["ok"]
+    assert profile["eagerImports"] == []
+
+
+@pytest.fixture(scope="module")
+def startup_ms():
+    return interpreter_startup_ms()
+
+
+@pytest.mark.parametrize("agent", sorted(AGENT_MODULES))
+def test_agent_import_is_cheap_next_to_interpreter_startup(agent, startup_ms):
+    import_ms = min(import_profile(agent)["importMs"] for _ in range(3))
+
+    assert import_ms <= STARTUP_MULTIPLE * startup_ms, (
+        f"{agent} took {import_ms}ms, over {STARTUP_MULTIPLE}x interpreter startup ({startup_ms}ms)"
+    )
+
+
+# The absolute budgets depend on the machine; run them with WATTWISE_IMPORT_BUDGETS=on
+@pytest.mark.skipif(os.getenv("WATTWISE_IMPORT_BUDGETS") != "on", reason="absolute import budgets are opt-in")
+@pytest.mark.parametrize("agent", sorted(AGENT_MODULES))
+def test_agent_import_stays_within_budget(agent):
+    profile = import_profile(agent)
+
+    assert profile["withinBudget"], f"{agent} took {profile['importMs']}ms (budget {profile['budgetMs']}ms)"
+
+
+def run_script(script, stdin, **env):
+    process = subprocess.run(
+        [sys.executable, script],
+        input=stdin,
+        capture_output=True,
+        text=True,
+        cwd=AGENT_DIR,
+        env={**os.environ, "WATTWISE_CACHE": "off", **env},
+    )
+    return json.loads(process.stdout)
+
+
+def test_empty_request_is_rejected_without_the_sdk():
+    assert run_script("recommendation_agent.py", "") == {"error": "No input data provided"}
+
+
+def test_local_footprint_needs_no_sdk():
+    payload = json.dumps({"breakdown": [{"name": "Fan", "count": 2, "hours": 10, "watts": 75, "monthlyUnits": 45}]})
+
+    result = run_script("co2_agent.py", payload, GEMINI_API_KEY="", WATTWISE_CO2_NARRATIVE="template")
+
+    assert result["carbonFootprint"] > 0
+    assert result["impact"]["description"]
+
+
+def test_env_file_is_read_without_dotenv(tmp_path, monkeypatch):
+    (tmp_path / ".env").write_text(
+        "# keys\nexport GEMINI_API_KEY='abc # def'\nWATTWISE_CACHE=off  # no cache\n"
+        'WATTWISE_NOTE="two\\nlines"\nOPENWEATHER_API_KEY=\nEXISTING=from-file\n'
+    )
+    monkeypatch.setenv("EXISTING", "from-shell")
+    for key in ("GEMINI_API_KEY", "WATTWISE_CACHE", "WATTWISE_NOTE", "OPENWEATHER_API_KEY"):
+        monkeypatch.delenv(key, raising=False)
+    monkeypatch.delitem(sys.modules, "dotenv", raising=False)
+
+    assert load_env(str(tmp_path / "nested")) == str(tmp_path / ".env")
+    assert os.environ["GEMINI_API_KEY"] == "abc # def"
+    assert os.environ["WATTWISE_CACHE"] == "off"
+    assert os.environ["WATTWISE_NOTE"] == "two\nlines"
+    assert os.environ["OPENWEATHER_API_KEY"] == ""
+    assert os.environ["EXISTING"] == "from-shell"
+    assert "dotenv" not in sys.modules
@@ -0,0 +1,123 @@
+import asyncio
+import io
+import json
+import time
+
+from test_runtime import make_agent
+from test_savings import BREAKDOWN, agent
+from wattwise_agents.dispatcher import AnalysisDispatcher
+from wattwise_agents.fake_model import FakeModel
+from wattwise_agents.schema import SUGGESTIONS, Decoder, object_schema
+from wattwise_agents.streaming import Emitter, ItemStream
+from wattwise_agents.worker import AgentWorker
+
+OUTPUT = Decoder(object_schema({"suggestions": SUGGESTIONS}))
+
+TEXT = json.dumps({
+    "note": "a [tricky] {string}",
+    "suggestions": [
+        {"name": "AC", "reductionPercentage": 0.2, "strategy": "Set it to 24 \"degrees\" {not a brace}"},
+        {"name": "Fan", "reductionPercentage": 0.1, "strategy": "Use a BLDC fan"},
+    ],
+    "other": [{"name": "ignored"}],
+})
+
+
+def test_items_are_returned_as_soon_as_they_close():
+    for size in (1, 7, len(TEXT)):
+        stream = ItemStream("suggestions")
+        seen = []
+        for i in range(0, len(TEXT), size):
+            seen += stream.feed(TEXT[i:i + size])
+        assert seen == json.loads(TEXT)["suggestions"]
+
+    stream = ItemStream("suggestions")
+    cut = TEXT.index('{"name": "Fan"')
+    assert [item["name"] for item in stream.feed(TEXT[:cut])] == ["AC"]
+    assert [item["name"] for item in stream.feed(TEXT[cut:])] == ["Fan"]
+
+
+def test_streamed_items_arrive_before_the_response_ends(monkeypatch):
+    streaming = make_agent(monkeypatch, [(0, "")])
+    streaming.model = FakeModel("fake", {"latency": "fixed:200", "seed": 1})
+    arrivals = []
+    started = time.perf_counter()
+
+    def on_item(item):
+        arrivals.append((item["name"], time.perf_counter() - started))
+
+    value = asyncio.run(streaming.generate_structured_async("Energy Efficiency Expert Agent", OUTPUT, on_item=on_item))
+
+    assert [name for name, _ in arrivals] == [s["name"] for s in value["suggestions"]]
+    assert arrivals[0][1] < time.perf_counter() - started - 0.05
+
+
+def test_rule_suggestions_are_emitted_before_the_model_answers(monkeypatch):
+    answer = {"suggestions": [{"name": "Aquarium Pump", "reductionPercentage": 0.1, "strategy": "Use a timer"}]}
+    recommendation = agent(monkeypatch, [(0.05, json.dumps(answer))])
+    events = []
+
+    result = recommendation.stream({"breakdown": BREAKDOWN}, lambda type, **data: events.append((type, data)))
+
+    names = [data["suggestion"]["name"] for _, data in events]
+    assert names == ["AC (1.5 Ton)", "Ceiling Fan", "Geyser (Storage)", "Aquarium Pump"]
+    assert sorted(names) == sorted(s["name"] for s in result["suggestions"])
+
+
+class StreamingCO2:
+    async def analyze_async(self, data, emit=None):
+        emit("footprint", carbonFootprint=300.5)
+        await asyncio.sleep(0.05)
+        return {"carbonFootprint": 300.5, "impact": {"trees": 14}}
+
+
+class SyncAgent:
+    def analyze(self, data):
+        return {"suggestions": []}
+
+    predict = analyze
+
+
+def test_dispatcher_emits_progress_then_sections():
+    agents = {"co2": StreamingCO2(), "recommendation": SyncAgent(), "weather": SyncAgent()}
+    events = []
+
+    result = AnalysisDispatcher(agents.__getitem__).stream(
+        {"billData": {"breakdown": BREAKDOWN}}, lambda type, **data: events.append((type, data))
+    )
+
+    assert events[0] == ("footprint", {"carbonFootprint": 300.5})
+    assert {data["name"] for type, data in events if type == "section"} == {"co2", "recommendation", "weather"}
+    assert result["carbonFootprint"] == 300.5
+
+
+class StreamingEcho:
+    def analyze(self, data):
+        return {"echo": data}
+
+    def stream(self, data, emit):
+        emit("partial", value=1)
+        return self.analyze(data)
+
+
+def test_worker_writes_events_before_the_response():
+    worker = AgentWorker(agents={"echo": (StreamingEcho, "analyze")})
+    requests = [{"id": 1, "agent": "echo", "payload": {}, "stream": True}, {"id": 2, "agent": "echo", "payload": {}}]
+    outfile = io.StringIO()
+
+    worker.serve_stream(io.StringIO("\n".join(json.dumps(r) for r in requests) + "\n"), outfile)
+
+    lines = [json.loads(line) for line in outfile.getvalue().splitlines()]
+    first = [line for line in lines if line["id"] == 1]
+    assert first[0]["event"]["type"] == "partial" and "ms" in first[0]["event"]
+    assert first[1] == {"id": 1, "result": {"echo": {}}}
+    assert [line for line in lines if line["id"] == 2] == [{"id": 2, "result": {"echo": {}}}]
+
+
+def test_emitter_stamps_elapsed_time():
+    written = []
+    emit = Emitter(written.append)
+
+    emit("done", result={})
+
+    assert written[0]["type"] == "done" and written[0]["ms"] >= 0
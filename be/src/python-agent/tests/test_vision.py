@@ -0,0 +1,75 @@
+import base64
+import io
+
+from wattwise_agents import vision
+from wattwise_agents.vision import load_pdf, prepare, read_request, select_pages
+
+
+def test_select_pages_prefers_summary_pages_in_document_order():
+    pages = [
+        "Terms and conditions",
+        "Units consumed 240 Billing period Oct-2024",
+        "Slab details",
+        "Net amount payable Rs 1,920 Due date 12/11/2024 Consumer No 123456",
+    ]
+
+    assert select_pages(pages, max_pages=2) == [1, 3]
+    assert select_pages(pages, max_pages=1) == [3]
+
+
+def test_select_pages_falls_back_to_first_page_for_scans():
+    assert select_pages(["", "", ""]) == [0]
+
+
+def test_read_request_takes_raw_pdf_after_header():
+    pdf = b"%PDF-1.4\n\x00\xff binary"
+    stream = io.BytesIO(b'{"isImageBased": true, "pdfBytes": %d}\n' % len(pdf) + pdf)
+
+    payload = read_request(stream)
+
+    assert payload == {"isImageBased": True, "pdfData": pdf}
+
+
+def test_read_request_accepts_pretty_printed_json():
+    stream = io.BytesIO(b'{\n  "pdfText": "bill",\n  "isImageBased": false\n}\n')
+
+    assert read_request(stream) == {"pdfText": "bill", "isImageBased": False}
+
+
+def test_load_pdf_reads_path_and_legacy_base64(tmp_path):
+    pdf = b"%PDF-1.4 bill"
+    path = tmp_path / "bill.pdf"
+    path.write_bytes(pdf)
+
+    assert load_pdf({"pdfData": pdf}) == pdf
+    assert load_pdf({"pdfPath": str(path)}) == pdf
+    assert load_pdf({"pdfBase64": base64.b64encode(pdf).decode()}) == pdf
+
+
+def test_small_documents_are_sent_untouched():
+    pdf = b"%PDF-1.4 tiny"
+
+    parts, report = prepare(pdf)
+
+    assert parts == [{"mime_type": "application/pdf", "data": pdf}]
+    assert report["mode"] == "original"
+    assert report["savedBytes"] == 0
+
+
+def test_missing_pymupdf_falls_back_to_original(monkeypatch):
+    import builtins
+
+    real_import = builtins.__import__
+
+    def no_fitz(name, *args, **kwargs):
+        if name == "fitz":
+            raise ImportError(name)
+        return real_import(name, *args, **kwargs)
+
+    monkeypatch.setattr(vision, "MIN_BYTES", 0)
+    monkeypatch.setattr(builtins, "__import__", no_fitz)
+
+    parts, report = prepare(b"%PDF-1.4 scanned")
+
+    assert parts[0]["mime_type"] == "application/pdf"
+    assert report["reason"] == "PyMuPDF not installed"
@@ -0,0 +1,123 @@
+import threading
+import time
+
+from test_runtime import ScriptedModel
+from weather_prediction_agent import WeatherPredictionAgent
+from wattwise_agents.cache import ResponseCache
+from wattwise_agents.snapshot import SnapshotRefresher, WeatherSnapshot, write_snapshot
+from wattwise_agents.weather import WeatherService
+
+
+class StubFetcher:
+    def __init__(self):
+        self.geocodes = []
+        self.fetches = 0
+        self._lock = threading.Lock()
+
+    def geocode(self, city):
+        self.geocodes.append(city)
+        return (10.0, 20.0)
+
+    def current(self, lat, lon):
+        time.sleep(0.02)
+        with self._lock:
+            self.fetches += 1
+        return {"currentTemp": 31.0, "humidity": 70, "description": "haze"}
+
+    def forecast(self, lat, lon):
+        return {"forecastTemp": 29.5, "forecastHumidity": 75.0}
+
+
+def test_known_cities_skip_geocoding():
+    fetcher = StubFetcher()
+    service = WeatherService(fetcher, cache=ResponseCache())
+    assert service.current("Mumbai")["currentTemp"] == 31.0
+    assert fetcher.geocodes == []
+
+
+def test_unknown_city_is_geocoded_once():
+    fetcher = StubFetcher()
+    cache = ResponseCache()
+    WeatherService(fetcher, cache=cache).locate("Tiruppur")
+    WeatherService(fetcher, cache=cache).locate("tiruppur ")
+    assert fetcher.geocodes == ["Tiruppur"]
+
+
+def test_concurrent_requests_share_one_fetch():
+    fetcher = StubFetcher()
+    service = WeatherService(fetcher, cache=ResponseCache())
+    threads = [threading.Thread(target=service.current, args=("mumbai",)) for _ in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert fetcher.fetches == 1
+
+
+def test_conditions_expire_after_ttl():
+    fetcher = StubFetcher()
+    service = WeatherService(fetcher, ttl=0, cache=ResponseCache())
+    service.current("Pune")
+    service.current("Pune")
+    assert fetcher.fetches == 2
+
+
+def test_no_fetcher_means_no_live_data():
+    assert WeatherService(None, cache=ResponseCache()).current("Pune") is None
+
+
+def test_refresher_writes_every_city_once_per_location(tmp_path):
+    fetcher = StubFetcher()
+    path = str(tmp_path / "weather.snapshot")
+    summary = SnapshotRefresher(fetcher, path, cities=["Tiruppur"], concurrency=4,
+                                service=WeatherService(fetcher, cache=ResponseCache())).refresh()
+
+    # gurgaon/gurugram, bangalore/bengaluru and panaji/goa share coordinates; tiruppur is geocoded
+    assert fetcher.fetches == summary["locations"] == summary["cities"] - 3
+    conditions = WeatherSnapshot(path).current("  GURGAON")
+    assert conditions["currentTemp"] == 31.0 and conditions["forecastTemp"] == 29.5
+    assert WeatherSnapshot(path).current("tiruppur")["description"] == "haze"
+
+
+def test_predictions_read_the_snapshot_and_ignore_stale_cities(tmp_path):
+    path = str(tmp_path / "weather.snapshot")
+    now = time.time()
+    write_snapshot(path, {
+        "Pune": (now - 60, {"currentTemp": 33.0, "humidity": 40, "description": "clear sky"}),
+        "Nagpur": (now - 7200, {"currentTemp": 41.0, "humidity": 20, "description": "clear sky"}),
+    })
+    fetcher = StubFetcher()
+    service = WeatherService(fetcher, cache=ResponseCache(), snapshot=WeatherSnapshot(path, max_age=3600))
+
+    assert service.current("pune")["currentTemp"] == 33.0
+    assert service.current("Nagpur") is None
+    assert service.current("Kolkata") is None
+    assert fetcher.fetches == 0
+
+
+def test_failed_fetches_keep_the_previous_record(tmp_path):
+    path = str(tmp_path / "weather.snapshot")
+    write_snapshot(path, {"pune": (time.time() - 30, {"currentTemp": 30.0, "humidity": 50, "description": "mist"})})
+
+    class DownFetcher(StubFetcher):
+        def current(self, lat, lon):
+            raise ConnectionError("upstream down")
+
+    fetcher = DownFetcher()
+    summary = SnapshotRefresher(fetcher, path, service=WeatherService(fetcher, cache=ResponseCache())).refresh()
+
+    assert summary["carriedForward"] == 1
+    assert WeatherSnapshot(path).current("Pune")["description"] == "mist"
+
+
+def test_template_reasoning_after_a_model_failure_is_not_cached(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    agent = WeatherPredictionAgent(cache=ResponseCache(), weather=WeatherService(None, cache=ResponseCache()))
+    agent.model = agent.models[agent.model_name] = ScriptedModel([ValueError("400 bad request"), (0, "A hotter month.")])
+    data = {"city": "Pune", "currentMonth": "April", "currentBill": 3000, "appliances": []}
+
+    fallback = agent.predict(data)
+    recovered = agent.predict(data)
+
+    assert fallback["degraded"] == "400 bad request" and fallback["reasoning"]
+    assert recovered["reasoning"] == "A hotter month." and "degraded" not in recovered
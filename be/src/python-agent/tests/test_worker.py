@@ -0,0 +1,57 @@
+import io
+import json
+
+from wattwise_agents.worker import AgentWorker
+
+
+class EchoAgent:
+    instances = 0
+
+    def __init__(self):
+        EchoAgent.instances += 1
+
+    def analyze(self, data):
+        if data.get("fail"):
+            return {"error": "model failed"}
+        return {"echo": data}
+
+
+def make_worker():
+    return AgentWorker(agents={"echo": (EchoAgent, "analyze")}, max_workers=2)
+
+
+def test_agent_is_constructed_once():
+    EchoAgent.instances = 0
+    worker = make_worker()
+    worker.warm()
+    worker.handle({"id": 1, "agent": "echo", "payload": {}})
+    worker.handle({"id": 2, "agent": "echo", "payload": {}})
+    assert EchoAgent.instances == 1
+
+
+def test_responses_are_tagged_with_request_id():
+    worker = make_worker()
+    assert worker.handle({"id": "a", "agent": "echo", "payload": {"x": 1}}) == {
+        "id": "a",
+        "result": {"echo": {"x": 1}},
+    }
+    assert worker.handle({"id": "b", "agent": "echo", "payload": {"fail": True}}) == {
+        "id": "b",
+        "error": "model failed",
+    }
+    assert "error" in worker.handle({"id": "c", "agent": "nope"})
+
+
+def test_serve_stream_answers_every_line():
+    worker = make_worker()
+    requests = [{"id": i, "agent": "echo", "payload": {"n": i}} for i in range(5)]
+    infile = io.StringIO("\n".join(json.dumps(r) for r in requests) + "\nnot json\n")
+    outfile = io.StringIO()
+
+    worker.serve_stream(infile, outfile)
+
+    responses = [json.loads(line) for line in outfile.getvalue().splitlines()]
+    by_id = {r["id"]: r for r in responses}
+    assert len(responses) == 6
+    assert by_id[3]["result"] == {"echo": {"n": 3}}
+    assert by_id[None]["error"] == "Invalid JSON request"
@@ -0,0 +1,14 @@
+"""Shared runtime for the WattWise Python agents."""
+import os
+import sys
+
+from wattwise_agents.env import load_env
+
+# The agent scripts live next to this package; make them importable no matter
+# where the package was imported from.
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if AGENT_DIR not in sys.path:
+    sys.path.append(AGENT_DIR)
+
+# Load environment variables before any module reads its settings
+load_env(AGENT_DIR)
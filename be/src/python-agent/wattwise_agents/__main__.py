@@ -0,0 +1,284 @@
+import os
+import sys
+import json
+import argparse
+
+def serve(args):
+    from wattwise_agents.worker import AgentWorker, log
+
+    worker = AgentWorker(max_workers=args.workers)
+    worker.warm()
+    if args.socket:
+        worker.serve_unix(args.socket)
+    else:
+        log("Serving NDJSON requests on stdin/stdout")
+        worker.serve_stream()
+
+def analyze(args):
+    from wattwise_agents.dispatcher import AnalysisDispatcher
+
+    try:
+        input_data = sys.stdin.read()
+        if not input_data:
+            print(json.dumps({"error": "No input data provided"}))
+            sys.exit(1)
+
+        if args.stream:
+            from wattwise_agents.streaming import stdout_emitter
+
+            emit = stdout_emitter()
+            result = AnalysisDispatcher().stream(json.loads(input_data), emit)
+            emit("done", result=result)
+        else:
+            result = AnalysisDispatcher().run(json.loads(input_data))
+            print(json.dumps(result))
+        if "error" in result:
+            sys.exit(1)
+    except Exception as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
+
+def forecast_results(lines, climatology, chunk_lines=10000):
+    """
+    One result per non-blank JSONL line, in order. Each chunk of lines is
+    predicted with one predict_many call; a chunk with a bad household falls
+    back to predict() per line so only that line reports the error.
+    """
+    from itertools import islice
+    from wattwise_agents.climatology import explain
+
+    lines = (line for line in lines if line.strip())
+    while True:
+        chunk = list(islice(lines, chunk_lines))
+        if not chunk:
+            return
+        parsed = []
+        for line in chunk:
+            try:
+                parsed.append((json.loads(line), None))
+            except Exception as e:
+                parsed.append(({}, str(e)))
+        households = [data for data, error in parsed if error is None]
+        try:
+            predictions = iter(climatology.predict_many(households))
+        except Exception:
+            predictions = None
+
+        for data, error in parsed:
+            if error is None:
+                try:
+                    prediction = next(predictions) if predictions is not None else climatology.predict(data)
+                    result = {
+                        "nextMonth": prediction["nextMonth"],
+                        "weatherFactor": prediction["weatherFactor"],
+                        "predictedBill": prediction["predictedBill"],
+                        "reasoning": explain(data, prediction),
+                    }
+                except Exception as e:
+                    result = {"error": str(e)}
+            else:
+                result = {"error": error}
+            if isinstance(data, dict) and "id" in data:
+                result = {"id": data["id"], **result}
+            yield result
+
+def forecast(args):
+    """Batch next-month forecasts: one weather input per stdin line, one prediction per stdout line."""
+    from wattwise_agents.climatology import Climatology
+
+    for result in forecast_results(sys.stdin, Climatology(), args.chunk_lines):
+        print(json.dumps(result))
+
+def batch(args):
+    from wattwise_agents.batch import BatchRunner, iter_jobs, log
+    from bill_parser_agent import BillPdfParserAgent
+
+    output = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    try:
+        runner = BatchRunner(
+            BillPdfParserAgent(),
+            concurrency=args.concurrency,
+            rate=args.rate,
+            checkpoint=args.checkpoint,
+            output=output,
+        )
+        summary = runner.run(iter_jobs(args.source))
+    finally:
+        if args.output:
+            output.close()
+    log(f"Summary: {json.dumps(summary)}")
+
+def fleet(args):
+    from wattwise_agents.fleet import FleetReport, log
+
+    output = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    try:
+        report = FleetReport(processes=args.processes, chunk_rows=args.chunk_rows, month=args.month, output=output)
+        summary = report.run(args.source)
+    finally:
+        if args.output:
+            output.close()
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            f.write(json.dumps(summary, indent=2) + "\n")
+    log(f"Summary: {json.dumps({k: summary[k] for k in ('rows', 'users', 'chunks', 'elapsedSeconds', 'rowsPerSecond')})}")
+
+def weather_refresh(args):
+    from wattwise_agents.snapshot import DEFAULT_PATH, SnapshotRefresher, log, read_cities
+    from wattwise_agents.weather import OpenWeatherFetcher
+
+    api_key = os.getenv("OPENWEATHER_API_KEY")
+    if not api_key:
+        log("OPENWEATHER_API_KEY not found")
+        sys.exit(1)
+    refresher = SnapshotRefresher(
+        OpenWeatherFetcher(api_key, pool_size=args.concurrency),
+        path=args.snapshot or DEFAULT_PATH,
+        cities=read_cities(args.cities) if args.cities else None,
+        concurrency=args.concurrency,
+    )
+    refresher.run(args.interval, once=args.once)
+
+def bench(args):
+    from wattwise_agents.bench import run_benchmark
+
+    model = {
+        "latency": args.latency,
+        "malformedRate": args.malformed_rate,
+        "errorRate": args.error_rate,
+        "seed": args.seed,
+    }
+    report = run_benchmark(
+        agents=args.agents.split(",") if args.agents else None,
+        modes=args.modes.split(","),
+        calls=args.calls,
+        concurrency=args.concurrency,
+        model=model,
+        cache=args.cache,
+    )
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+def loadtest(args):
+    from wattwise_agents.loadtest import run_loadtest
+
+    report = run_loadtest(
+        users=[int(n) for n in args.users.split(",")],
+        duration=args.duration,
+        modes=args.modes.split(","),
+        think_ms=args.think_ms,
+        workers=args.workers,
+        model={"latency": args.latency, "malformedRate": args.malformed_rate, "errorRate": args.error_rate,
+               "seed": args.seed},
+        weather={"latency": args.weather_latency, "errorRate": args.weather_error_rate},
+        slo_ms=args.slo_ms,
+        error_budget=args.error_budget,
+        seed=args.seed,
+    )
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m wattwise_agents")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="Run the resident agent worker")
+    serve_parser.add_argument("--socket", help="Listen on this Unix socket instead of stdin/stdout")
+    serve_parser.add_argument("--workers", type=int, help="Maximum concurrent requests")
+    serve_parser.set_defaults(func=serve)
+
+    analyze_parser = commands.add_parser(
+        "analyze", help="Run CO2, recommendation and weather analysis for one bill read from stdin"
+    )
+    analyze_parser.add_argument(
+        "--stream", action="store_true", help="Write NDJSON events as results become ready, then a done event"
+    )
+    analyze_parser.set_defaults(func=analyze)
+
+    forecast_parser = commands.add_parser(
+        "forecast", help="Predict next month's bill for many households (JSONL in, JSONL out), without the model"
+    )
+    forecast_parser.add_argument("--chunk-lines", type=int, default=10000, help="Households predicted together")
+    forecast_parser.set_defaults(func=forecast)
+
+    batch_parser = commands.add_parser(
+        "batch", help="Parse a directory of bills or a JSONL manifest, streaming one result line per bill"
+    )
+    batch_parser.add_argument("source", help="Directory of .pdf/.txt bills or a JSONL manifest")
+    batch_parser.add_argument("--concurrency", type=int, default=4, help="Bills parsed at once")
+    batch_parser.add_argument("--rate", type=float, help="Maximum model calls started per second")
+    batch_parser.add_argument("--checkpoint", help="File of finished ids; reruns skip them")
+    batch_parser.add_argument("--output", help="Append results here instead of stdout")
+    batch_parser.set_defaults(func=batch)
+
+    fleet_parser = commands.add_parser(
+        "fleet", help="Footprint, savings and forecast for every user in a CSV/Parquet export, without the model"
+    )
+    fleet_parser.add_argument("source", help="CSV or Parquet export, one row per breakdown line, grouped by userId")
+    fleet_parser.add_argument("--processes", type=int, help="Worker processes (default: one per CPU)")
+    fleet_parser.add_argument("--chunk-rows", type=int, default=100000, help="Rows per chunk handed to a worker")
+    fleet_parser.add_argument("--month", help="Current month for rows without one (default: this month)")
+    fleet_parser.add_argument("--output", help="Write one CSV line per user here instead of stdout")
+    fleet_parser.add_argument("--summary", help="Write the per-city and overall totals here as JSON")
+    fleet_parser.set_defaults(func=fleet)
+
+    refresh_parser = commands.add_parser(
+        "weather-refresh", help="Keep a weather snapshot of every city fresh for predictions to read"
+    )
+    refresh_parser.add_argument("--snapshot", default=os.getenv("WATTWISE_WEATHER_SNAPSHOT"),
+                                help="Snapshot file (default: WATTWISE_WEATHER_SNAPSHOT or .cache/weather.snapshot)")
+    refresh_parser.add_argument("--cities", help="File of extra city names, one per line (e.g. users' cities)")
+    refresh_parser.add_argument("--concurrency", type=int, default=8, help="Upstream requests in flight at once")
+    refresh_parser.add_argument("--interval", type=float, default=600, help="Seconds between refreshes")
+    refresh_parser.add_argument("--once", action="store_true", help="Refresh once and exit")
+    refresh_parser.set_defaults(func=weather_refresh)
+
+    bench_parser = commands.add_parser(
+        "bench", help="Benchmark the agents offline against a fake model and print a JSON report"
+    )
+    bench_parser.add_argument("--agents", help="Comma-separated agents (default: all)")
+    bench_parser.add_argument("--modes", default="subprocess,resident", help="Comma-separated: subprocess, resident")
+    bench_parser.add_argument("--calls", type=int, default=20, help="Timed calls per agent and mode")
+    bench_parser.add_argument("--concurrency", type=int, default=4, help="Calls in flight at once")
+    bench_parser.add_argument("--latency", default="lognormal:400:0.35",
+                              help="Fake model latency: fixed:MS, uniform:LOW:HIGH or lognormal:MEDIAN:SIGMA")
+    bench_parser.add_argument("--malformed-rate", type=float, default=0.0, help="Share of broken model responses")
+    bench_parser.add_argument("--error-rate", type=float, default=0.0, help="Share of model calls that fail")
+    bench_parser.add_argument("--seed", type=int, help="Seed for a repeatable run")
+    bench_parser.add_argument("--cache", action="store_true", help="Keep the response cache enabled")
+    bench_parser.add_argument("--output", help="Write the report here instead of stdout")
+    bench_parser.set_defaults(func=bench)
+
+    load_parser = commands.add_parser(
+        "loadtest", help="Drive a resident worker with concurrent simulated users and report where it saturates"
+    )
+    load_parser.add_argument("--users", default="50,100,200,500", help="Comma-separated concurrent user levels")
+    load_parser.add_argument("--duration", type=float, default=30, help="Seconds per user level")
+    load_parser.add_argument("--modes", default="mixed,analysis,bill-text,bill-vision",
+                             help="Comma-separated traffic modes: mixed, analysis, bill-text, bill-vision")
+    load_parser.add_argument("--think-ms", type=float, default=1000, help="Mean pause between a user's requests")
+    load_parser.add_argument("--workers", type=int, default=8, help="Worker threads, as in production")
+    load_parser.add_argument("--latency", default="lognormal:400:0.35", help="Fake model latency, as for bench")
+    load_parser.add_argument("--malformed-rate", type=float, default=0.0, help="Share of broken model responses")
+    load_parser.add_argument("--error-rate", type=float, default=0.0, help="Share of model calls that fail")
+    load_parser.add_argument("--weather-latency", default="lognormal:120:0.4", help="Fake weather API latency")
+    load_parser.add_argument("--weather-error-rate", type=float, default=0.02, help="Share of weather calls that fail")
+    load_parser.add_argument("--slo-ms", type=float, default=5000, help="p99 above this counts as saturated")
+    load_parser.add_argument("--error-budget", type=float, default=0.01, help="Error rate above this counts as saturated")
+    load_parser.add_argument("--seed", type=int, help="Seed for repeatable traffic and fakes")
+    load_parser.add_argument("--output", help="Write the report here instead of stdout")
+    load_parser.set_defaults(func=loadtest)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
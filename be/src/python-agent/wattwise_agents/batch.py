@@ -0,0 +1,181 @@
+import os
+import sys
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from wattwise_agents.scheduler import paced, priority
+
+# Text layers shorter than this are treated as scans, like BillUploadController does
+MIN_TEXT_CHARS = 50
+
+def log(message):
+    print(f"[BillBatch] {message}", file=sys.stderr)
+
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def iter_jobs(source):
+    """
+    Yields bill jobs from a directory of PDFs / .txt files or from a JSONL
+    manifest whose lines hold {"id", "path"} or an inline upload payload.
+    """
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if name.lower().endswith((".pdf", ".txt")):
+                yield {"id": name, "path": os.path.join(source, name)}
+        return
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, encoding="utf-8") as manifest:
+        for number, line in enumerate(manifest, 1):
+            if not line.strip():
+                continue
+            job = json.loads(line)
+            job.setdefault("id", job.get("path") or f"line-{number}")
+            if "path" in job and not os.path.isabs(job["path"]):
+                job["path"] = os.path.join(base, job["path"])
+            yield job
+
+def pdf_text(pdf_bytes):
+    """
+    Text layer of a PDF, or "" for a scan. Raises without pypdf rather than
+    sending every PDF to the vision model as if it were a scan.
+    """
+    import io
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise RuntimeError("Reading PDF bills needs pypdf (pip install -r requirements.txt)") from None
+    try:
+        reader = PdfReader(io.BytesIO(pdf_bytes))
+        return "\n".join(page.extract_text() or "" for page in reader.pages).strip()
+    except Exception:
+        return ""
+
+def load_payload(job):
+    """Turns a job into the payload BillPdfParserAgent.parse expects."""
+    if "pdfText" in job or "pdfBase64" in job:
+        return {k: job[k] for k in ("pdfText", "pdfBase64", "isImageBased") if k in job}
+
+    path = job["path"]
+    if path.lower().endswith(".txt"):
+        with open(path, encoding="utf-8") as f:
+            return {"pdfText": f.read(), "isImageBased": False}
+
+    with open(path, "rb") as f:
+        pdf_bytes = f.read()
+    text = pdf_text(pdf_bytes)
+    if len(text) >= MIN_TEXT_CHARS:
+        return {"pdfText": text, "isImageBased": False}
+    return {"pdfData": pdf_bytes, "isImageBased": True}
+
+class RateLimiter:
+    """Spaces out call starts to at most `rate` per second across threads."""
+
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+class BatchRunner:
+    """
+    Parses many bills through one agent with bounded concurrency and a rate
+    limit on the model calls they make. Each result is written as one JSON line as soon as it is ready, and
+    finished ids are appended to the checkpoint file so a rerun skips them.
+    """
+
+    def __init__(self, agent, concurrency=4, rate=None, checkpoint=None, output=None):
+        self.agent = agent
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(rate)
+        self.checkpoint = checkpoint
+        self.output = output or sys.stdout
+        self.timings = {"load": [], "parse": [], "total": []}
+        self.counts = {"ok": 0, "failed": 0, "skipped": 0}
+        self._lock = threading.Lock()
+
+    def completed_ids(self):
+        if not self.checkpoint or not os.path.exists(self.checkpoint):
+            return set()
+        with open(self.checkpoint, encoding="utf-8") as f:
+            return {line.rstrip("\n") for line in f if line.strip()}
+
+    def process(self, job):
+        started = time.perf_counter()
+        try:
+            payload = load_payload(job)
+            loaded = time.perf_counter()
+            parse_started = time.perf_counter()
+            # Bulk parsing yields quota to interactive uploads; only model calls are rate limited
+            with priority("background"), paced(self.limiter):
+                result = self.agent.parse(payload)
+            finished = time.perf_counter()
+        except Exception as e:
+            result, loaded, parse_started, finished = {"error": str(e)}, None, None, time.perf_counter()
+
+        with self._lock:
+            if loaded is not None:
+                self.timings["load"].append(loaded - started)
+                self.timings["parse"].append(finished - parse_started)
+            self.timings["total"].append(finished - started)
+            self.counts["failed" if "error" in result else "ok"] += 1
+            self.output.write(json.dumps({"id": job["id"], **result}) + "\n")
+            self.output.flush()
+            if self.checkpoint and "error" not in result:
+                with open(self.checkpoint, "a", encoding="utf-8") as f:
+                    f.write(f"{job['id']}\n")
+
+    def run(self, jobs):
+        done = self.completed_ids()
+        started = time.perf_counter()
+        # Bound the number of queued jobs so huge manifests are never held in memory
+        slots = threading.BoundedSemaphore(self.concurrency * 2)
+
+        def run_job(job):
+            try:
+                self.process(job)
+            finally:
+                slots.release()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for job in jobs:
+                if job["id"] in done:
+                    self.counts["skipped"] += 1
+                    continue
+                slots.acquire()
+                pool.submit(run_job, job)
+
+        return self.summary(time.perf_counter() - started)
+
+    def summary(self, elapsed):
+        processed = self.counts["ok"] + self.counts["failed"]
+        return {
+            **self.counts,
+            "elapsedSeconds": round(elapsed, 3),
+            "billsPerSecond": round(processed / elapsed, 3) if elapsed else None,
+            "stages": {
+                stage: {
+                    "p50Ms": round(percentile(values, 50) * 1000, 1),
+                    "p95Ms": round(percentile(values, 95) * 1000, 1),
+                    "maxMs": round(max(values) * 1000, 1),
+                }
+                for stage, values in self.timings.items()
+                if values
+            },
+        }
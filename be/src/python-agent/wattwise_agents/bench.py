@@ -0,0 +1,373 @@
+import os
+import sys
+import json
+import time
+import platform
+import threading
+import subprocess
+from datetime import datetime, timezone
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from wattwise_agents import AGENT_DIR
+from wattwise_agents.batch import percentile
+from wattwise_agents.dispatcher import ANALYSIS_MODES
+from wattwise_agents.fake_model import DEFAULT_CONFIG, RSS_MARKER, USAGE_MARKER
+
+# Bump when the shape of the report changes
+REPORT_VERSION = 2
+
+BREAKDOWN = [
+    {"name": "Air Conditioner", "count": 2, "hours": 8, "watts": 1500, "monthlyUnits": 720, "estimatedCost": 7200},
+    {"name": "LED Bulb", "count": 10, "hours": 6, "watts": 10, "monthlyUnits": 18, "estimatedCost": 180},
+    {"name": "Refrigerator", "count": 1, "hours": 24, "watts": 200, "monthlyUnits": 144, "estimatedCost": 1440},
+]
+
+# Bill text without a units line, so the parser asks the model for one field
+BILL_TEXT = (
+    "Maharashtra State Electricity Distribution Co. Ltd.\n"
+    "Consumer No: 170012345678  Bill Month: OCT-2024\n"
+    "Bill Amount: Rs 8,820.00  Due Date: 12/11/2024\n"
+)
+
+SAMPLES = {
+    "carbon": {"breakdown": BREAKDOWN},
+    "co2": {"breakdown": BREAKDOWN, "city": "Pune"},
+    "recommendation": {"breakdown": BREAKDOWN},
+    "combined": {"breakdown": BREAKDOWN, "city": "Pune"},
+    "weather": {
+        "city": "Pune", "currentMonth": "October", "currentBill": 8820,
+        "appliances": [{k: item[k] for k in ("name", "count", "hours", "watts")} for item in BREAKDOWN],
+    },
+    "bill": {"pdfText": BILL_TEXT, "isImageBased": False},
+    "analyze": {"billData": {"breakdown": BREAKDOWN}, "city": "Pune", "currentMonth": "October"},
+}
+
+# How a one-shot process is started for each agent, relative to AGENT_DIR
+COMMANDS = {
+    "carbon": ["agent.py"],
+    "co2": ["co2_agent.py"],
+    "recommendation": ["recommendation_agent.py"],
+    "combined": ["combined_agent.py"],
+    "weather": ["weather_prediction_agent.py"],
+    "bill": ["bill_parser_agent.py"],
+    "analyze": ["-m", "wattwise_agents", "analyze"],
+}
+
+MODES = ("subprocess", "resident")
+
+# Module each agent is imported from, and how long that import may take.
+# The budgets leave room for slow CI machines but not for an eager SDK
+# import, which alone costs several hundred milliseconds. Tests check them
+# only with WATTWISE_IMPORT_BUDGETS=on; by default they hold each import to
+# STARTUP_MULTIPLE bare interpreter starts timed in the same run.
+AGENT_MODULES = {
+    "carbon": "agent",
+    "co2": "co2_agent",
+    "recommendation": "recommendation_agent",
+    "combined": "combined_agent",
+    "weather": "weather_prediction_agent",
+    "bill": "bill_parser_agent",
+    "analyze": "wattwise_agents.dispatcher",
+}
+IMPORT_BUDGETS_MS = {
+    "carbon": 150,
+    "co2": 150,
+    "recommendation": 150,
+    "combined": 150,
+    "weather": 150,
+    "bill": 150,
+    "analyze": 250,
+}
+# Agents import in 3-5 interpreter starts; an eager SDK import takes dozens
+STARTUP_MULTIPLE = 12
+
+# Must only be imported once a model, network or event-loop call needs them
+LAZY_MODULES = ("google.generativeai", "grpc", "dotenv", "requests", "fitz", "pypdf", "numpy")
+
+def log(message):
+    print(f"[Bench] {message}", file=sys.stderr)
+
+def bench_env(model_config, cache=False):
+    """Environment for benchmark children: fake model, no live weather, optional cache and bill store."""
+    env = dict(os.environ)
+    env["WATTWISE_FAKE_MODEL"] = json.dumps(model_config)
+    env["GEMINI_API_KEY"] = "offline"
+    env["OPENWEATHER_API_KEY"] = ""
+    if not cache:
+        env["WATTWISE_CACHE"] = "off"
+        # The sample bill is the same on every call and would be answered from the store
+        env["WATTWISE_BILL_STORE"] = "off"
+    return env
+
+def fake_command(*args):
+    return [sys.executable, "-m", "wattwise_agents.fake_model", *args]
+
+def read_rss(stderr_lines):
+    for line in stderr_lines:
+        if line.startswith(RSS_MARKER):
+            value = line[len(RSS_MARKER):].strip()
+            return int(value) if value.isdigit() else None
+    return None
+
+def read_usage(stderr_lines):
+    for line in stderr_lines:
+        if line.startswith(USAGE_MARKER):
+            return json.loads(line[len(USAGE_MARKER):])
+    return None
+
+def latency_stats(latencies, errors, elapsed):
+    """p50/p95/p99 and throughput for one agent in one mode."""
+    ms = lambda s: round(s * 1000, 1)
+    calls = len(latencies)
+    return {
+        "calls": calls,
+        "errors": errors,
+        "p50Ms": ms(percentile(latencies, 50)) if latencies else None,
+        "p95Ms": ms(percentile(latencies, 95)) if latencies else None,
+        "p99Ms": ms(percentile(latencies, 99)) if latencies else None,
+        "meanMs": ms(sum(latencies) / calls) if latencies else None,
+        "throughputPerSec": round(calls / elapsed, 2) if elapsed else None,
+    }
+
+def run_calls(call, calls, concurrency):
+    """Issues `calls` calls from `concurrency` threads; returns (latencies, errors, elapsed)."""
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def one(_):
+        nonlocal errors
+        started = time.perf_counter()
+        ok = call()
+        took = time.perf_counter() - started
+        with lock:
+            latencies.append(took)
+            errors += 0 if ok else 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(calls)))
+    return latencies, errors, time.perf_counter() - started
+
+def import_profile(agent, env=None):
+    """
+    Imports one agent in a fresh interpreter under -X importtime. Returns the
+    cumulative import time, its budget, and any lazy module loaded eagerly.
+    """
+    module = AGENT_MODULES[agent]
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=AGENT_DIR,
+        env=env,
+    )
+    # Lines look like "import time:   self [us] | cumulative | module"
+    rows = [line.split("|") for line in process.stderr.splitlines() if line.startswith("import time:")]
+    loaded = {row[2].strip(): row[1].strip() for row in rows if len(row) == 3}
+    cumulative = loaded.get(module)
+    import_ms = round(int(cumulative) / 1000, 1) if cumulative and cumulative.isdigit() else None
+    budget = IMPORT_BUDGETS_MS[agent]
+    return {
+        "ok": process.returncode == 0,
+        "importMs": import_ms,
+        "budgetMs": budget,
+        "withinBudget": import_ms is not None and import_ms <= budget,
+        "eagerImports": sorted(name for name in loaded if name.split(".")[0] in LAZY_MODULES or name in LAZY_MODULES),
+    }
+
+def interpreter_startup_ms(runs=3, env=None):
+    """Best wall-clock time of `python -c pass`, the yardstick for STARTUP_MULTIPLE."""
+    best = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], cwd=AGENT_DIR, env=env, check=True)
+        took = (time.perf_counter() - started) * 1000
+        best = took if best is None else min(best, took)
+    return round(best, 1)
+
+class OneShot:
+    """The current Node model: a fresh interpreter per call, JSON on stdin/stdout."""
+
+    def __init__(self, env, model_config):
+        self.env = env
+        self.model_config = model_config
+        self.calls = 0
+        self.peak_rss = {}
+        self._lock = threading.Lock()
+
+    def call_env(self):
+        """A seeded run gives every process its own seed, or all would draw the same first outcome."""
+        seed = self.model_config.get("seed")
+        if seed is None:
+            return self.env
+        with self._lock:
+            self.calls += 1
+            n = self.calls
+        return {**self.env, "WATTWISE_FAKE_MODEL": json.dumps({**self.model_config, "seed": seed + n})}
+
+    def call(self, agent):
+        process = subprocess.run(
+            fake_command(*COMMANDS[agent]),
+            input=json.dumps(SAMPLES[agent]),
+            capture_output=True,
+            text=True,
+            cwd=AGENT_DIR,
+            env=self.call_env(),
+        )
+        rss = read_rss(process.stderr.splitlines())
+        with self._lock:
+            self.peak_rss[agent] = max(self.peak_rss.get(agent) or 0, rss or 0) or None
+        try:
+            result = json.loads(process.stdout.strip().splitlines()[-1])
+        except (ValueError, IndexError):
+            return False
+        return process.returncode == 0 and "error" not in result
+
+class ResidentClient:
+    """Talks NDJSON to one `python -m wattwise_agents serve` process."""
+
+    def __init__(self, env, workers):
+        self.process = subprocess.Popen(
+            fake_command("-m", "wattwise_agents", "serve", "--workers", str(workers)),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            cwd=AGENT_DIR,
+            env=env,
+        )
+        self.pending = {}
+        self.next_id = 0
+        self.stderr_tail = []
+        self._lock = threading.Lock()
+        threading.Thread(target=self._read_stdout, daemon=True).start()
+        self._stderr_reader = threading.Thread(target=self._read_stderr, daemon=True)
+        self._stderr_reader.start()
+
+    def _read_stdout(self):
+        for line in self.process.stdout:
+            response = json.loads(line)
+            with self._lock:
+                future = self.pending.pop(response.get("id"), None)
+            if future is not None:
+                future.set_result(response)
+
+    def _read_stderr(self):
+        # Drain stderr so agent logging can never fill the pipe and stall the worker
+        for line in self.process.stderr:
+            if line.startswith((RSS_MARKER, USAGE_MARKER)):
+                self.stderr_tail.append(line)
+
+    def request(self, agent, payload=None):
+        future = Future()
+        with self._lock:
+            self.next_id += 1
+            request_id = self.next_id
+            self.pending[request_id] = future
+            self.process.stdin.write(json.dumps({"id": request_id, "agent": agent, "payload": payload}) + "\n")
+            self.process.stdin.flush()
+        return future.result(timeout=300)
+
+    def call(self, agent):
+        return "error" not in self.request(agent, SAMPLES[agent])
+
+    def close(self):
+        """Stops the worker and returns its peak RSS in KiB."""
+        self.process.stdin.close()
+        self.process.wait(timeout=60)
+        self._stderr_reader.join(timeout=5)
+        return read_rss(self.stderr_tail)
+
+    def usage(self):
+        """Model calls and tokens the worker used, once it has been closed."""
+        return read_usage(self.stderr_tail)
+
+def bench_subprocess(agents, calls, concurrency, env, model_config):
+    runner = OneShot(env, model_config)
+    results = {}
+    for agent in agents:
+        log(f"subprocess: {agent}")
+        started = time.perf_counter()
+        cold_ok = runner.call(agent)
+        cold = time.perf_counter() - started
+        latencies, errors, elapsed = run_calls(lambda: runner.call(agent), calls, concurrency)
+        results[agent] = {
+            "coldStartMs": round(cold * 1000, 1),
+            "coldStartOk": cold_ok,
+            **latency_stats(latencies, errors, elapsed),
+            "peakRssKb": runner.peak_rss.get(agent),
+        }
+    peaks = [r["peakRssKb"] for r in results.values() if r["peakRssKb"]]
+    return {"process": {"peakRssKb": max(peaks) if peaks else None}, "agents": results}
+
+def bench_resident(agents, calls, concurrency, env, model_config):
+    log("resident: starting worker")
+    started = time.perf_counter()
+    client = ResidentClient(env, workers=concurrency)
+    try:
+        client.request("ping")
+        startup = time.perf_counter() - started
+        results = {}
+        for agent in agents:
+            log(f"resident: {agent}")
+            started = time.perf_counter()
+            cold_ok = client.call(agent)
+            cold = time.perf_counter() - started
+            latencies, errors, elapsed = run_calls(lambda: client.call(agent), calls, concurrency)
+            results[agent] = {
+                "coldStartMs": round(cold * 1000, 1),
+                "coldStartOk": cold_ok,
+                **latency_stats(latencies, errors, elapsed),
+            }
+    finally:
+        peak = client.close()
+    return {"process": {"startupMs": round(startup * 1000, 1), "peakRssKb": peak}, "agents": results}
+
+RUNNERS = {"subprocess": bench_subprocess, "resident": bench_resident}
+
+def bench_analysis_modes(calls, concurrency, env):
+    """
+    The analyze request in split and combined mode, each in its own resident
+    worker, with model calls and tokens per request alongside the latencies.
+    """
+    results = {}
+    for mode in ANALYSIS_MODES:
+        log(f"analysis: {mode}")
+        client = ResidentClient({**env, "WATTWISE_ANALYSIS_MODE": mode}, workers=concurrency)
+        try:
+            client.call("analyze")
+            latencies, errors, elapsed = run_calls(lambda: client.call("analyze"), calls, concurrency)
+        finally:
+            client.close()
+        usage = client.usage() or {}
+        per_request = lambda key: round(usage[key] / (calls + 1), 1) if key in usage else None
+        results[mode] = {
+            **latency_stats(latencies, errors, elapsed),
+            "modelCallsPerRequest": per_request("calls"),
+            "promptTokensPerRequest": per_request("promptTokens"),
+            "responseTokensPerRequest": per_request("responseTokens"),
+        }
+    return results
+
+def run_benchmark(agents=None, modes=MODES, calls=20, concurrency=4, model=None, cache=False):
+    """
+    Benchmarks each agent in each mode against the offline fake model and
+    returns a JSON-serializable report.
+    """
+    agents = list(agents or SAMPLES)
+    model_config = {**DEFAULT_CONFIG, **(model or {})}
+    env = bench_env(model_config, cache)
+    report = {
+        "version": REPORT_VERSION,
+        "startedAt": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"agents": agents, "calls": calls, "concurrency": concurrency, "cache": cache, "model": model_config},
+        "modes": {},
+    }
+    report["startup"] = {agent: import_profile(agent, env) for agent in agents}
+    for mode in modes:
+        report["modes"][mode] = RUNNERS[mode](agents, calls, concurrency, env, model_config)
+    if "analyze" in agents and "resident" in modes:
+        report["analysisModes"] = bench_analysis_modes(calls, concurrency, env)
+    return report
@@ -0,0 +1,202 @@
+import re
+
+FIELDS = ("totalAmount", "totalUnits", "billingPeriod", "consumerNumber")
+REQUIRED_FIELDS = ("totalAmount", "totalUnits")
+
+# Fields below this confidence are handed to the model
+ACCEPT_CONFIDENCE = 0.7
+
+_MONEY = r"(?:Rs\.?|INR|₹)?\s*([\d,]+(?:\.\d{1,2})?)"
+_UNITS = r"([\d,]+(?:\.\d+)?)"
+_SEP = r"\s*(?:\(?(?:Rs\.?|INR|₹|kWh|KWH)\)?)?\s*[:\-]?\s*"
+_DATE = r"\d{1,2}[-/.](?:\d{1,2}|[A-Za-z]{3})[-/.]\d{2,4}"
+_MONTH_YEAR = r"[A-Za-z]{3,9}[\s\-']*\d{2,4}"
+_PERIOD = rf"((?:{_DATE}|{_MONTH_YEAR})(?:\s*(?:to|-|–)\s*(?:{_DATE}|{_MONTH_YEAR}))?)"
+_ID = r"([A-Z0-9][A-Z0-9\-/]{4,19})"
+
+def _label(words):
+    return r"(?:" + "|".join(words) + r")" + _SEP
+
+# Label variants seen on most Indian utility bills, in order of preference
+GENERIC_PATTERNS = {
+    "totalAmount": [
+        _label([r"Net\s+Amount\s+Payable", r"Total\s+Amount\s+Payable", r"Total\s+Bill\s+Amount",
+                r"Total\s+Amount\s+Due", r"Total\s+Amount"]) + _MONEY,
+        _label([r"Amount\s+Payable", r"Bill\s+Amount", r"Amount\s+Due", r"Net\s+Payable"]) + _MONEY,
+    ],
+    "totalUnits": [
+        _label([r"Units\s+Consumed", r"Total\s+Units", r"Units\s+Billed", r"Net\s+Units",
+                r"Billed\s+Units", r"Total\s+Consumption"]) + _UNITS,
+        _label([r"Consumption", r"kWh\s+Consumed", r"Units"]) + _UNITS,
+    ],
+    "billingPeriod": [
+        _label([r"Bill(?:ing)?\s+Period", r"Bill(?:ing)?\s+Month", r"Period\s+of\s+Bill"]) + _PERIOD,
+        rf"(?:From)\s*[:\-]?\s*({_DATE}\s*(?:To)\s*[:\-]?\s*{_DATE})",
+    ],
+    "consumerNumber": [
+        _label([r"Consumer\s+(?:No\.?|Number|ID)", r"Account\s+(?:No\.?|Number)", r"CA\s+(?:No\.?|Number)",
+                r"Service\s+(?:Connection\s+)?(?:No\.?|Number)", r"K\s*No\.?"]) + _ID,
+    ],
+}
+
+def _compile(patterns):
+    return {field: [re.compile(p, re.IGNORECASE) for p in ps] for field, ps in patterns.items()}
+
+class Layout:
+    """
+    A utility's bill template. Patterns are compiled on first use so that
+    importing the rules (e.g. to reject an empty request) stays cheap.
+    """
+
+    def __init__(self, name, detect, patterns):
+        self.name = name
+        self.detect_pattern = detect
+        self.raw_patterns = patterns
+        self._detect = None
+        self._patterns = None
+
+    @property
+    def detect(self):
+        if self._detect is None:
+            self._detect = re.compile(self.detect_pattern, re.IGNORECASE)
+        return self._detect
+
+    @property
+    def patterns(self):
+        if self._patterns is None:
+            self._patterns = _compile(self.raw_patterns)
+        return self._patterns
+
+# Per-utility templates for the layouts we see most. They are tried before the
+# generic patterns and their matches are trusted more.
+LAYOUTS = [
+    Layout("MSEDCL", r"MSEDCL|Maharashtra\s+State\s+Electricity", {
+        "totalAmount": [_label([r"Bill\s+Amount", r"Current\s+Bill\s+Amount"]) + _MONEY],
+        "totalUnits": [_label([r"Consumption\s*\(Units\)", r"Units\s+Consumed"]) + _UNITS],
+        "billingPeriod": [_label([r"Bill\s+Month"]) + _PERIOD],
+        "consumerNumber": [_label([r"Consumer\s+No\.?"]) + r"(\d{12})"],
+    }),
+    Layout("BESCOM", r"BESCOM|Bangalore\s+Electricity\s+Supply", {
+        "totalAmount": [_label([r"Net\s+Amount\s+Due", r"Amount\s+Payable"]) + _MONEY],
+        "totalUnits": [_label([r"Consumption", r"Units"]) + _UNITS],
+        "billingPeriod": [_label([r"Billing\s+Period", r"Reading\s+Date"]) + _PERIOD],
+        "consumerNumber": [_label([r"Account\s+ID", r"RR\s+No\.?"]) + _ID],
+    }),
+    Layout("Tata Power", r"Tata\s+Power", {
+        "totalAmount": [_label([r"Total\s+Amount\s+Payable", r"Amount\s+Payable"]) + _MONEY],
+        "totalUnits": [_label([r"Total\s+Units\s+Billed", r"Units\s+Billed"]) + _UNITS],
+        "billingPeriod": [_label([r"Bill\s+Period"]) + _PERIOD],
+        "consumerNumber": [_label([r"CA\s+No\.?", r"Consumer\s+No\.?"]) + _ID],
+    }),
+    Layout("Adani Electricity", r"Adani\s+Electricity", {
+        "totalAmount": [_label([r"Total\s+Amount\s+Payable", r"Amount\s+Payable"]) + _MONEY],
+        "totalUnits": [_label([r"Total\s+Consumption", r"Units\s+Consumed"]) + _UNITS],
+        "billingPeriod": [_label([r"Bill\s+Period", r"Billing\s+Period"]) + _PERIOD],
+        "consumerNumber": [_label([r"Account\s+No\.?", r"Consumer\s+No\.?"]) + _ID],
+    }),
+    Layout("BSES", r"BSES\s+(?:Rajdhani|Yamuna)", {
+        "totalAmount": [_label([r"Net\s+Amount\s+Payable", r"Amount\s+Payable"]) + _MONEY],
+        "totalUnits": [_label([r"Units\s+Consumed", r"Billed\s+Units"]) + _UNITS],
+        "billingPeriod": [_label([r"Bill\s+Period"]) + _PERIOD],
+        "consumerNumber": [_label([r"CA\s+No\.?", r"CA\s+Number"]) + _ID],
+    }),
+    Layout("TANGEDCO", r"TANGEDCO|TNEB|Tamil\s+Nadu\s+Generation", {
+        "totalAmount": [_label([r"Amount\s+to\s+be\s+Paid", r"Bill\s+Amount"]) + _MONEY],
+        "totalUnits": [_label([r"Units\s+Consumed", r"Consumed\s+Units"]) + _UNITS],
+        "billingPeriod": [_label([r"Assessment\s+Date", r"Bill\s+Period"]) + _PERIOD],
+        "consumerNumber": [_label([r"Service\s+(?:Connection\s+)?No\.?"]) + _ID],
+    }),
+    Layout("CESC", r"CESC\s+Limited|\bCESC\b", {
+        "totalAmount": [_label([r"Amount\s+Payable", r"Net\s+Amount"]) + _MONEY],
+        "totalUnits": [_label([r"Units\s+Consumed", r"Consumption"]) + _UNITS],
+        "billingPeriod": [_label([r"Bill\s+Period", r"Billing\s+Period"]) + _PERIOD],
+        "consumerNumber": [_label([r"Customer\s+ID", r"Consumer\s+No\.?"]) + _ID],
+    }),
+]
+
+_generic = None
+
+def generic_patterns():
+    global _generic
+    if _generic is None:
+        _generic = _compile(GENERIC_PATTERNS)
+    return _generic
+
+def _number(raw):
+    value = float(raw.replace(",", ""))
+    return int(value) if value.is_integer() else value
+
+def _clean(field, raw):
+    raw = raw.strip()
+    if field in ("totalAmount", "totalUnits"):
+        return _number(raw)
+    return " ".join(raw.split())
+
+def _candidates(patterns, field, text):
+    values = []
+    for pattern in patterns:
+        for match in pattern.finditer(text):
+            try:
+                value = _clean(field, match.group(1))
+            except ValueError:
+                continue
+            if value not in values:
+                values.append(value)
+    return values
+
+class RuleExtraction:
+    """Field values found by the rules, each with a 0-1 confidence."""
+
+    def __init__(self, layout, values, scores):
+        self.layout = layout
+        self.values = values
+        self.scores = scores
+
+    def low_confidence_fields(self):
+        return [f for f in FIELDS if self.scores.get(f, 0.0) < ACCEPT_CONFIDENCE]
+
+    def needs_model(self):
+        low = self.low_confidence_fields()
+        return any(f in low for f in REQUIRED_FIELDS)
+
+    def confidence(self, fields=REQUIRED_FIELDS):
+        """Confidence level of the weakest of `fields`; "high" when there are none."""
+        score = min((self.scores.get(f, 0.0) for f in fields), default=1.0)
+        return "high" if score >= 0.85 else "medium" if score >= ACCEPT_CONFIDENCE else "low"
+
+    def result(self):
+        """The extraction in the same shape the model returns."""
+        return {
+            **{f: self.values.get(f) if self.scores.get(f, 0.0) >= ACCEPT_CONFIDENCE else None for f in FIELDS},
+            "confidence": self.confidence(),
+        }
+
+def extract_fields(text):
+    """
+    Runs the layout templates and generic patterns over bill text. Template
+    matches score 0.9 and generic ones 0.75; conflicting candidates and an
+    implausible tariff (amount / units) lower the score.
+    """
+    layout = next((l for l in LAYOUTS if l.detect.search(text)), None)
+    values, scores = {}, {}
+
+    for field in FIELDS:
+        tiers = []
+        if layout is not None and field in layout.patterns:
+            tiers.append((layout.patterns[field], 0.9))
+        tiers.append((generic_patterns()[field], 0.75))
+        for patterns, base in tiers:
+            found = _candidates(patterns, field, text)
+            if found:
+                values[field] = found[0]
+                scores[field] = base - (0.1 if len(found) > 1 else 0.0)
+                break
+
+    amount, units = values.get("totalAmount"), values.get("totalUnits")
+    if amount and units:
+        # Indian residential tariffs land between roughly ₹2 and ₹20 per unit
+        plausible = 1.5 <= amount / units <= 25
+        for field in REQUIRED_FIELDS:
+            scores[field] = round(min(1.0, scores[field] + 0.05) if plausible else scores[field] - 0.2, 2)
+
+    return RuleExtraction(layout.name if layout else None, values, scores)
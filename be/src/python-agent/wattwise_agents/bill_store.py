@@ -0,0 +1,148 @@
+"""
+Parsed bills keyed by what was uploaded: the SHA-256 of the PDF bytes for
+scans, or of the whitespace-normalized text for text bills, so uploading the
+same bill again answers from disk instead of calling Gemini.
+
+Each entry records the extractor fingerprint it was produced under (version,
+prompts, schema, model tiers and settings; see BillPdfParserAgent.fingerprint)
+and the model that answered. Entries whose fingerprint no longer matches are dropped
+when read and swept when an agent starts. The store is capped by entry count
+and bytes, evicting the least recently used.
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+from wattwise_agents.cache import CACHE_DIR
+from wattwise_agents.metrics import count
+
+def document_key(pdf_bytes):
+    return "pdf:" + hashlib.sha256(pdf_bytes).hexdigest()
+
+def text_key(text):
+    normalized = " ".join(text.split()).casefold()
+    return "text:" + hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+def fingerprint(*parts):
+    """A short digest of everything an extraction depends on."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+class BillStore:
+    def __init__(self, path, max_entries=10000, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.counters = {"hits": 0, "misses": 0, "invalidated": 0, "evictions": 0, "stores": 0}
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS bills ("
+            "key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, result TEXT NOT NULL, confidence TEXT, "
+            "model TEXT, stored_at REAL NOT NULL, used_at REAL NOT NULL, size INTEGER NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS bills_used_at ON bills (used_at)")
+
+    def _count(self, outcome, value=1):
+        self.counters[outcome] += value
+        count("wattwise_bill_store_total", value, outcome=outcome)
+
+    def get(self, key, current):
+        """
+        The stored entry for `key` as {"result", "confidence", "model", "storedAt"},
+        or None. An entry made under another fingerprint than `current` is deleted.
+        """
+        with self._lock:
+            row = self.db.execute(
+                "SELECT fingerprint, result, confidence, model, stored_at FROM bills WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._count("misses")
+                return None
+            if row[0] != current:
+                self.db.execute("DELETE FROM bills WHERE key = ?", (key,))
+                self._count("invalidated")
+                self._count("misses")
+                return None
+            self.db.execute("UPDATE bills SET used_at = ? WHERE key = ?", (time.time(), key))
+            self._count("hits")
+        return {"result": json.loads(row[1]), "confidence": row[2], "model": row[3], "storedAt": row[4]}
+
+    def put(self, key, current, result, model=None):
+        """Stores a successful extraction, then evicts down to the caps."""
+        if not isinstance(result, dict) or "error" in result:
+            return
+        serialized = json.dumps(result)
+        now = time.time()
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO bills (key, fingerprint, result, confidence, model, stored_at, used_at, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, current, serialized, result.get("confidence"), model, now, now, len(serialized)),
+            )
+            self._count("stores")
+            self._trim()
+
+    def _trim(self):
+        entries, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM bills").fetchone()
+        if entries <= self.max_entries and size <= self.max_bytes:
+            return
+        evicted = 0
+        for key, entry_size in self.db.execute("SELECT key, size FROM bills ORDER BY used_at").fetchall():
+            if entries <= self.max_entries and size <= self.max_bytes:
+                break
+            self.db.execute("DELETE FROM bills WHERE key = ?", (key,))
+            entries, size, evicted = entries - 1, size - entry_size, evicted + 1
+        self._count("evictions", evicted)
+
+    def sweep(self, current):
+        """Deletes every entry made under a fingerprint not in `current`."""
+        marks = ",".join("?" * len(current))
+        with self._lock:
+            deleted = self.db.execute(f"DELETE FROM bills WHERE fingerprint NOT IN ({marks})", tuple(current)).rowcount
+            if deleted > 0:
+                self._count("invalidated", deleted)
+        return max(deleted, 0)
+
+    def stats(self):
+        with self._lock:
+            entries, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM bills").fetchone()
+            return {**self.counters, "entries": entries, "bytes": size}
+
+class NullBillStore:
+    """Used when WATTWISE_BILL_STORE=off."""
+
+    def get(self, key, current):
+        return None
+
+    def put(self, key, current, result, model=None):
+        pass
+
+    def sweep(self, current):
+        return 0
+
+    def stats(self):
+        return {}
+
+_shared = None
+_shared_lock = threading.Lock()
+
+def get_bill_store():
+    """The process-wide store, configured from the environment."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            if os.getenv("WATTWISE_BILL_STORE", "on") == "off":
+                _shared = NullBillStore()
+            else:
+                _shared = BillStore(
+                    os.path.join(CACHE_DIR, "bills.sqlite3"),
+                    max_entries=int(os.getenv("WATTWISE_BILL_STORE_MAX_ENTRIES", "10000")),
+                    max_bytes=int(os.getenv("WATTWISE_BILL_STORE_MAX_BYTES", str(64 * 1024 * 1024))),
+                )
+        return _shared
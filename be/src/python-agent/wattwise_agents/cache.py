@@ -0,0 +1,204 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+CACHE_DIR = os.getenv(
+    "WATTWISE_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache"),
+)
+
+# Bump when a change in prompts or agent logic should invalidate old entries
+CACHE_VERSION = 1
+
+# Fields whose values are names and should not distinguish "AC" from "ac "
+_NAME_FIELDS = {"name", "city", "currentMonth", "region"}
+
+def normalize(value, field=None):
+    """
+    Canonical form of an agent input: names case-folded, numbers rounded and
+    lists of records sorted, so equivalent requests hash to the same key.
+    """
+    if isinstance(value, dict):
+        return {k: normalize(v, k) for k, v in value.items() if v is not None}
+    if isinstance(value, list):
+        items = [normalize(v) for v in value]
+        return sorted(items, key=lambda v: json.dumps(v, sort_keys=True))
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        rounded = round(float(value), 2)
+        return int(rounded) if rounded.is_integer() else rounded
+    if isinstance(value, str) and field in _NAME_FIELDS:
+        return " ".join(value.split()).casefold()
+    return value
+
+def canonical_key(namespace, data):
+    payload = json.dumps(normalize(data), sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha256(f"{namespace}:{CACHE_VERSION}:{payload}".encode("utf-8")).hexdigest()
+    return f"{namespace}:{digest}"
+
+class ResponseCache:
+    """
+    In-memory LRU with TTL and size limits, backed by SQLite so entries survive
+    restarts. Only successful results (no "error" key) are stored.
+    """
+
+    def __init__(self, path=None, ttl=86400, max_entries=2048, max_bytes=32 * 1024 * 1024,
+                 max_disk_entries=100000, ttls=None):
+        self.ttl = ttl
+        self.ttls = ttls or {}
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_disk_entries = max_disk_entries
+        self.memory = OrderedDict()  # key -> (expires_at, size, value)
+        self.memory_bytes = 0
+        self.counters = {"hits": 0, "diskHits": 0, "misses": 0, "evictions": 0, "expirations": 0, "stores": 0}
+        self._lock = threading.Lock()
+        self.db = None
+        if path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, stored_at REAL NOT NULL)"
+            )
+
+    def ttl_for(self, namespace):
+        return self.ttls.get(namespace, self.ttl)
+
+    def _remember(self, key, expires_at, value, size):
+        old = self.memory.pop(key, None)
+        if old is not None:
+            self.memory_bytes -= old[1]
+        self.memory[key] = (expires_at, size, value)
+        self.memory_bytes += size
+        while self.memory and (len(self.memory) > self.max_entries or self.memory_bytes > self.max_bytes):
+            _, (_, evicted_size, _) = self.memory.popitem(last=False)
+            self.memory_bytes -= evicted_size
+            self.counters["evictions"] += 1
+
+    def get(self, namespace, data):
+        key = canonical_key(namespace, data)
+        now = time.time()
+        with self._lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self.memory.move_to_end(key)
+                    self.counters["hits"] += 1
+                    return entry[2]
+                self.memory.pop(key)
+                self.memory_bytes -= entry[1]
+                self.counters["expirations"] += 1
+
+            if self.db is not None:
+                row = self.db.execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    if row[1] > now:
+                        value = json.loads(row[0])
+                        self._remember(key, row[1], value, len(row[0]))
+                        self.counters["diskHits"] += 1
+                        return value
+                    self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self.counters["expirations"] += 1
+
+            self.counters["misses"] += 1
+            return None
+
+    def set(self, namespace, data, value):
+        # Failures and answers degraded by a failed model call are worth retrying
+        if not isinstance(value, dict) or "error" in value or "degraded" in value:
+            return
+        key = canonical_key(namespace, data)
+        serialized = json.dumps(value)
+        now = time.time()
+        expires_at = now + self.ttl_for(namespace)
+        with self._lock:
+            self._remember(key, expires_at, value, len(serialized))
+            self.counters["stores"] += 1
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, expires_at, stored_at) VALUES (?, ?, ?, ?)",
+                    (key, serialized, expires_at, now),
+                )
+                if self.counters["stores"] % 256 == 0:
+                    self._trim_disk(now)
+
+    def _trim_disk(self, now):
+        self.db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        self.db.execute(
+            "DELETE FROM responses WHERE key NOT IN "
+            "(SELECT key FROM responses ORDER BY stored_at DESC LIMIT ?)",
+            (self.max_disk_entries,),
+        )
+
+    def get_or_compute(self, namespace, data, compute):
+        cached = self.get(namespace, data)
+        if cached is not None:
+            return cached
+        result = compute()
+        self.set(namespace, data, result)
+        return result
+
+    async def get_or_compute_async(self, namespace, data, compute):
+        cached = self.get(namespace, data)
+        if cached is not None:
+            return cached
+        result = await compute()
+        self.set(namespace, data, result)
+        return result
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["diskHits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "entries": len(self.memory),
+                "bytes": self.memory_bytes,
+                "hitRate": round((lookups - self.counters["misses"]) / lookups, 4) if lookups else 0.0,
+            }
+
+class NullCache:
+    """Drop-in replacement used when WATTWISE_CACHE=off."""
+
+    def get(self, namespace, data):
+        return None
+
+    def set(self, namespace, data, value):
+        pass
+
+    def get_or_compute(self, namespace, data, compute):
+        return compute()
+
+    async def get_or_compute_async(self, namespace, data, compute):
+        return await compute()
+
+    def stats(self):
+        return {}
+
+_shared = None
+_shared_lock = threading.Lock()
+
+def get_cache():
+    """The process-wide cache shared by every agent, configured from the environment."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            if os.getenv("WATTWISE_CACHE", "on") == "off":
+                _shared = NullCache()
+            else:
+                _shared = ResponseCache(
+                    path=os.path.join(CACHE_DIR, "responses.sqlite3"),
+                    ttl=float(os.getenv("WATTWISE_CACHE_TTL", "86400")),
+                    max_entries=int(os.getenv("WATTWISE_CACHE_MAX_ENTRIES", "2048")),
+                    # Weather predictions depend on live conditions
+                    ttls={"weather": float(os.getenv("WATTWISE_WEATHER_CACHE_TTL", "3600"))},
+                )
+        return _shared
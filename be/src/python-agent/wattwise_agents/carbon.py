@@ -0,0 +1,117 @@
+import os
+import re
+import json
+import math
+
+# kg CO2 emitted per kWh drawn from the grid. "india" is the national average
+# the agents have always assumed; regional grids can be overridden with
+# WATTWISE_GRID_FACTORS='{"southern": 0.75}'.
+GRID_FACTORS = {
+    "india": 0.82,
+    "northern": 0.84,
+    "western": 0.86,
+    "southern": 0.78,
+    "eastern": 0.91,
+    "north-eastern": 0.55,
+}
+DEFAULT_REGION = "india"
+
+CITY_REGIONS = {
+    "delhi": "northern", "new delhi": "northern", "gurgaon": "northern", "gurugram": "northern",
+    "noida": "northern", "jaipur": "northern", "lucknow": "northern", "chandigarh": "northern",
+    "mumbai": "western", "pune": "western", "ahmedabad": "western", "surat": "western",
+    "nagpur": "western", "indore": "western", "bhopal": "western",
+    "bengaluru": "southern", "bangalore": "southern", "chennai": "southern", "hyderabad": "southern",
+    "kochi": "southern", "coimbatore": "southern", "visakhapatnam": "southern",
+    "kolkata": "eastern", "patna": "eastern", "bhubaneswar": "eastern", "ranchi": "eastern",
+    "guwahati": "north-eastern", "shillong": "north-eastern",
+}
+
+# Multipliers applied to an appliance's nominal units. Estimates are computed
+# as watts x hours, but compressors and thermostats cycle, so appliances that
+# run "all day" draw well below their rated power on average. Keys are single
+# name tokens or whole phrases.
+APPLIANCE_ADJUSTMENTS = {
+    "refrigerator": 0.5,
+    "fridge": 0.5,
+    "ac": 0.8,
+    "air conditioner": 0.8,
+    "storage": 0.7,  # storage geysers hold temperature on a thermostat
+}
+
+TREE_KG_PER_YEAR = 21.77  # CO2 absorbed by one mature tree in a year
+CAR_KG_PER_KM = 0.171     # average petrol car
+
+def appliance_units(item):
+    """Monthly kWh for a breakdown line, derived from its rating when not given."""
+    units = item.get('monthlyUnits')
+    if units is not None:
+        return float(units)
+    watts = item.get('watts') or item.get('wattageUsed') or 0
+    return float(watts) * float(item.get('hours') or 0) * float(item.get('count') or 1) * 30 / 1000
+
+def describe(footprint):
+    """Plain-text impact summary used when the model is unavailable or too slow."""
+    impact = footprint["impact"]
+    return (
+        f"Your monthly energy usage generates {footprint['carbonFootprint']}kg of CO2, "
+        f"which is equivalent to driving a car for {impact['carKm']}km. "
+        f"You would need {impact['trees']} trees to offset this."
+    )
+
+class CarbonEngine:
+    """
+    Deterministic carbon footprint calculator for a bill breakdown.
+    """
+
+    def __init__(self, grid_factors=None, adjustments=None):
+        self.grid_factors = dict(GRID_FACTORS)
+        self.grid_factors.update(grid_factors or {})
+        self.adjustments = dict(APPLIANCE_ADJUSTMENTS)
+        self.adjustments.update(adjustments or {})
+        self._phrases = [k for k in self.adjustments if " " in k]
+        self._adjustment_cache = {}
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            grid_factors=json.loads(os.getenv("WATTWISE_GRID_FACTORS", "{}")),
+            adjustments=json.loads(os.getenv("WATTWISE_APPLIANCE_ADJUSTMENTS", "{}")),
+        )
+
+    def grid_factor(self, region=None):
+        """Emission factor for a grid region or a city name, defaulting to the national average."""
+        key = (region or DEFAULT_REGION).strip().lower()
+        key = CITY_REGIONS.get(key, key)
+        return self.grid_factors.get(key, self.grid_factors[DEFAULT_REGION])
+
+    def adjustment(self, name):
+        key = (name or "").lower()
+        factor = self._adjustment_cache.get(key)
+        if factor is None:
+            tokens = re.findall(r"[a-z0-9]+", key)
+            joined = " ".join(tokens)
+            factor = 1.0
+            for token in tokens:
+                factor = min(factor, self.adjustments.get(token, 1.0))
+            for phrase in self._phrases:
+                if phrase in joined:
+                    factor = min(factor, self.adjustments[phrase])
+            self._adjustment_cache[key] = factor
+        return factor
+
+    def calculate(self, breakdown, region=None):
+        """
+        Returns carbonFootprint (kg CO2) and its tree / car-km equivalents.
+        """
+        factor = self.grid_factor(region)
+        kwh = sum(appliance_units(item) * self.adjustment(item.get('name')) for item in breakdown)
+        co2 = kwh * factor
+        return {
+            "carbonFootprint": round(co2, 1),
+            "impact": {
+                "trees": math.ceil(co2 / TREE_KG_PER_YEAR) if co2 > 0 else 0,
+                "carKm": round(co2 / CAR_KG_PER_KM),
+            },
+            "emissionFactor": factor,
+        }
@@ -0,0 +1,303 @@
+import math
+
+from wattwise_agents.weather import CITY_COORDINATES, normalize_city
+
+MONTHS = [
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December",
+]
+
+# Approximate monthly normals, January..December: mean temperature (°C) and
+# mean relative humidity (%). Cities not listed use the nearest station.
+NORMALS = {
+    "mumbai": (
+        [24.4, 25.2, 27.2, 28.9, 30.2, 29.3, 27.8, 27.5, 27.8, 28.7, 27.9, 25.9],
+        [62, 63, 66, 70, 71, 80, 86, 86, 83, 75, 66, 62],
+    ),
+    "pune": (
+        [21.0, 22.6, 25.6, 28.6, 29.1, 26.4, 24.6, 24.0, 24.4, 25.2, 22.9, 20.9],
+        [52, 43, 36, 40, 52, 74, 83, 85, 80, 67, 57, 54],
+    ),
+    "delhi": (
+        [14.2, 17.4, 22.9, 29.1, 33.1, 33.6, 31.3, 30.1, 29.3, 25.9, 20.1, 15.3],
+        [70, 62, 49, 33, 34, 48, 71, 76, 68, 56, 60, 69],
+    ),
+    "jaipur": (
+        [15.5, 18.6, 24.1, 30.0, 33.6, 33.3, 30.4, 28.9, 28.8, 26.3, 21.1, 16.7],
+        [54, 46, 35, 24, 27, 43, 68, 75, 63, 40, 41, 50],
+    ),
+    "lucknow": (
+        [15.6, 19.0, 24.8, 30.6, 33.1, 33.0, 30.3, 29.6, 29.2, 26.2, 20.9, 16.5],
+        [72, 62, 49, 36, 41, 58, 79, 83, 79, 68, 66, 72],
+    ),
+    "chandigarh": (
+        [13.8, 16.6, 21.0, 26.6, 30.7, 31.7, 29.5, 28.6, 27.6, 24.2, 19.0, 14.8],
+        [70, 64, 55, 38, 33, 46, 74, 80, 71, 57, 61, 69],
+    ),
+    "srinagar": (
+        [2.5, 4.5, 9.0, 13.9, 17.7, 21.8, 24.5, 23.9, 20.1, 14.2, 8.3, 4.0],
+        [80, 76, 68, 60, 58, 55, 63, 67, 65, 63, 71, 79],
+    ),
+    "ahmedabad": (
+        [20.2, 22.8, 27.8, 31.9, 33.9, 32.4, 29.3, 28.2, 28.8, 28.1, 24.4, 21.2],
+        [53, 45, 38, 40, 51, 64, 79, 81, 74, 56, 50, 54],
+    ),
+    "bhopal": (
+        [17.3, 20.2, 25.2, 29.9, 33.2, 30.2, 26.4, 25.4, 25.8, 24.9, 20.9, 17.8],
+        [58, 48, 35, 29, 32, 57, 83, 87, 79, 57, 52, 57],
+    ),
+    "bengaluru": (
+        [21.3, 23.3, 25.9, 27.4, 26.8, 24.4, 23.5, 23.5, 23.8, 23.6, 22.1, 20.9],
+        [59, 51, 46, 54, 64, 75, 79, 79, 76, 74, 71, 66],
+    ),
+    "hyderabad": (
+        [21.9, 24.6, 28.2, 31.0, 32.7, 28.9, 26.6, 26.0, 26.2, 25.5, 23.2, 21.2],
+        [59, 49, 42, 42, 42, 63, 74, 77, 76, 67, 61, 60],
+    ),
+    "chennai": (
+        [25.5, 26.6, 28.5, 30.6, 32.7, 32.0, 30.8, 30.2, 29.8, 28.3, 26.6, 25.6],
+        [71, 70, 70, 72, 66, 61, 64, 68, 71, 78, 80, 75],
+    ),
+    "kochi": (
+        [27.3, 27.9, 28.8, 29.3, 28.9, 27.1, 26.5, 26.7, 27.1, 27.5, 27.6, 27.4],
+        [70, 72, 74, 75, 78, 86, 88, 87, 85, 83, 79, 72],
+    ),
+    "kolkata": (
+        [19.9, 23.0, 27.6, 30.4, 31.0, 30.6, 29.6, 29.5, 29.4, 28.1, 24.4, 20.5],
+        [65, 62, 61, 68, 74, 81, 86, 86, 85, 78, 69, 66],
+    ),
+    "patna": (
+        [16.4, 20.0, 25.6, 30.2, 31.6, 31.3, 29.7, 29.5, 29.2, 27.0, 22.1, 17.6],
+        [70, 60, 45, 43, 57, 71, 82, 83, 82, 74, 68, 71],
+    ),
+    "guwahati": (
+        [17.2, 19.5, 23.3, 25.6, 27.1, 28.6, 29.1, 29.1, 28.3, 26.1, 22.2, 18.6],
+        [76, 68, 63, 72, 78, 83, 84, 84, 84, 81, 78, 78],
+    ),
+}
+DEFAULT_CITY = "mumbai"
+
+APPLIANCE_CLASSES = ("cooling", "fans", "heating", "refrigeration", "other")
+
+# name token -> appliance class; checked in order, first match wins
+CLASS_KEYWORDS = (
+    ("fan", "fans"),
+    ("ac", "cooling"),
+    ("conditioner", "cooling"),
+    ("cooler", "cooling"),
+    ("refrigerator", "refrigeration"),
+    ("fridge", "refrigeration"),
+    ("freezer", "refrigeration"),
+    ("heater", "heating"),
+    ("geyser", "heating"),
+    ("blower", "heating"),
+)
+
+# Relative usage of each class as a function of the "feels like" temperature:
+# floor + slope * degrees beyond the comfort threshold. Cooling and fans rise
+# above the threshold, heating rises below it.
+SENSITIVITY = {
+    "cooling": (0.15, 0.12, 22.0),
+    "fans": (0.30, 0.07, 20.0),
+    "heating": (0.30, 0.08, 22.0),
+}
+
+FACTOR_RANGE = (0.6, 1.6)
+
+def month_index(month):
+    """0-based month index from a name ("November", "nov") or a 1-based number."""
+    if isinstance(month, int) or (isinstance(month, str) and month.strip().isdigit()):
+        return (int(month) - 1) % 12
+    prefix = (month or "").strip()[:3].lower()
+    for i, name in enumerate(MONTHS):
+        if name[:3].lower() == prefix:
+            return i
+    raise ValueError(f"Unknown month: {month}")
+
+def feels_like(temp, humidity):
+    # Humid heat drives cooling demand harder than the dry-bulb reading suggests
+    return temp + 0.05 * max(0.0, humidity - 60) if temp > 24 else temp
+
+def class_usage(appliance_class, temp, humidity):
+    t = feels_like(temp, humidity)
+    if appliance_class == "refrigeration":
+        return 1.0 + 0.02 * (t - 25)
+    if appliance_class == "heating":
+        floor, slope, threshold = SENSITIVITY["heating"]
+        return floor + slope * max(0.0, threshold - t)
+    if appliance_class in SENSITIVITY:
+        floor, slope, threshold = SENSITIVITY[appliance_class]
+        return floor + slope * max(0.0, t - threshold)
+    return 1.0
+
+class Climatology:
+    """
+    Next-month bill prediction from monthly normals and a per-class
+    sensitivity model. Class ratios are computed once per city and month;
+    each household is then a weighted sum over its class energy shares.
+    """
+
+    def __init__(self, normals=None):
+        self.normals = normals or NORMALS
+        self._stations = {}
+        self._class_ratios = {}
+        self._class_cache = {}
+
+    def station(self, city):
+        """The normals table to use for a city: its own, or the nearest listed one."""
+        key = normalize_city(city) or DEFAULT_CITY
+        station = self._stations.get(key)
+        if station is None:
+            station = key if key in self.normals else DEFAULT_CITY
+            coords = CITY_COORDINATES.get(key)
+            if key not in self.normals and coords is not None:
+                station = min(
+                    (s for s in self.normals if s in CITY_COORDINATES),
+                    key=lambda s: math.dist(coords, CITY_COORDINATES[s]),
+                )
+            self._stations[key] = station
+        return station
+
+    def conditions(self, city, index):
+        """Normal temperature and humidity for a city in a 0-based month."""
+        temps, humidity = self.normals[self.station(city)]
+        return temps[index % 12], humidity[index % 12]
+
+    def appliance_class(self, name):
+        key = (name or "").lower()
+        cls = self._class_cache.get(key)
+        if cls is None:
+            tokens = set("".join(c if c.isalnum() else " " for c in key).split())
+            cls = next((c for word, c in CLASS_KEYWORDS if word in tokens), "other")
+            self._class_cache[key] = cls
+        return cls
+
+    def class_ratios(self, city, month, live=None):
+        """
+        Next month's usage relative to this month for every appliance class.
+        Live conditions shift next month's normals by half of today's anomaly.
+        """
+        index = month_index(month)
+        cache_key = (self.station(city), index)
+        if live is None and cache_key in self._class_ratios:
+            return self._class_ratios[cache_key]
+
+        now_t, now_h = self.conditions(city, index)
+        next_t, next_h = self.conditions(city, index + 1)
+        if live is not None:
+            next_t += 0.5 * (live["currentTemp"] - now_t)
+            now_t, now_h = live["currentTemp"], live["humidity"]
+
+        ratios = {
+            cls: class_usage(cls, next_t, next_h) / class_usage(cls, now_t, now_h)
+            for cls in APPLIANCE_CLASSES
+        }
+        if live is None:
+            self._class_ratios[cache_key] = ratios
+        return ratios
+
+    def class_energy(self, appliances):
+        """Monthly energy per appliance class (watts x hours x count)."""
+        energy = dict.fromkeys(APPLIANCE_CLASSES, 0.0)
+        for item in appliances:
+            load = (item.get('watts') or 0) * (item.get('hours') or 0) * (item.get('count') or 1)
+            energy[self.appliance_class(item.get('name'))] += load
+        return energy
+
+    def predict(self, data, live=None):
+        """
+        Returns nextMonth, weatherFactor and predictedBill for one household,
+        plus the figures used to reach them.
+        """
+        city = data.get('city')
+        month = data.get('currentMonth')
+        current_bill = float(data.get('currentBill') or 0)
+        ratios = self.class_ratios(city, month, live)
+        energy = self.class_energy(data.get('appliances', []))
+
+        total = sum(energy.values())
+        factor = sum(energy[c] * ratios[c] for c in APPLIANCE_CLASSES) / total if total else 1.0
+        factor = round(min(max(factor, FACTOR_RANGE[0]), FACTOR_RANGE[1]), 2)
+
+        index = month_index(month)
+        next_t, next_h = self.conditions(city, index + 1)
+        return {
+            "nextMonth": MONTHS[(index + 1) % 12],
+            "weatherFactor": factor,
+            "predictedBill": round(current_bill * factor, 2),
+            "climate": {
+                "station": self.station(city),
+                "nextMonthTemp": next_t,
+                "nextMonthHumidity": next_h,
+                "classRatios": {c: round(r, 3) for c, r in ratios.items() if energy[c]},
+            },
+        }
+
+    def predict_many(self, requests):
+        """
+        The same predictions as predict() for many households at once: class
+        energy and weighted ratios are computed with NumPy over every
+        appliance, with ratios shared per station and month.
+        """
+        import numpy as np
+
+        seasons, season, index = {}, [], []
+        owner, appliance_class, load = [], [], []
+        classes = {c: i for i, c in enumerate(APPLIANCE_CLASSES)}
+        for i, data in enumerate(requests):
+            month = month_index(data.get('currentMonth'))
+            key = (self.station(data.get('city')), month)
+            if key not in seasons:
+                ratios = self.class_ratios(data.get('city'), MONTHS[month])
+                seasons[key] = (len(seasons), [ratios[c] for c in APPLIANCE_CLASSES])
+            season.append(seasons[key][0])
+            index.append(month)
+            for item in data.get('appliances', []):
+                owner.append(i)
+                appliance_class.append(classes[self.appliance_class(item.get('name'))])
+                load.append((item.get('watts') or 0) * (item.get('hours') or 0) * (item.get('count') or 1))
+
+        households, width = len(requests), len(APPLIANCE_CLASSES)
+        cells = np.array(owner, dtype=np.int64) * width + np.array(appliance_class, dtype=np.int64)
+        energy = np.bincount(cells, np.array(load, dtype=float), households * width).reshape(households, width)
+        ratios = np.array([r for _, r in sorted(seasons.values())], dtype=float).reshape(-1, width)[season]
+        weighted = (energy * ratios).sum(axis=1)
+        total = energy.sum(axis=1)
+        factors = np.divide(weighted, total, out=np.ones(households), where=total != 0)
+
+        predictions = []
+        for i, data in enumerate(requests):
+            factor = round(min(max(float(factors[i]), FACTOR_RANGE[0]), FACTOR_RANGE[1]), 2)
+            next_t, next_h = self.conditions(data.get('city'), index[i] + 1)
+            predictions.append({
+                "nextMonth": MONTHS[(index[i] + 1) % 12],
+                "weatherFactor": factor,
+                "predictedBill": round(float(data.get('currentBill') or 0) * factor, 2),
+                "climate": {
+                    "station": self.station(data.get('city')),
+                    "nextMonthTemp": next_t,
+                    "nextMonthHumidity": next_h,
+                    "classRatios": {
+                        c: round(float(ratios[i, j]), 3) for j, c in enumerate(APPLIANCE_CLASSES) if energy[i, j]
+                    },
+                },
+            })
+        return predictions
+
+def explain(data, prediction):
+    """Plain-text reasoning used when the model is unavailable or too slow."""
+    climate = prediction["climate"]
+    change = round((prediction["weatherFactor"] - 1) * 100)
+    direction = "increase" if change > 0 else "decrease" if change < 0 else "no change"
+    drivers = ", ".join(
+        f"{cls} usage x{ratio}" for cls, ratio in climate["classRatios"].items() if abs(ratio - 1) >= 0.05
+    )
+    text = (
+        f"{prediction['nextMonth']} in {data.get('city')} typically averages "
+        f"{climate['nextMonthTemp']}°C with {climate['nextMonthHumidity']}% humidity. "
+    )
+    if drivers:
+        text += f"Expected seasonal shifts: {drivers}. "
+    if change:
+        return text + f"Net effect: about {abs(change)}% {direction} in the bill."
+    return text + "Net effect: no significant change in the bill."
@@ -0,0 +1,144 @@
+import os
+import asyncio
+from datetime import datetime
+
+from wattwise_agents.metrics import span
+from wattwise_agents.worker import AgentWorker
+
+DEFAULT_TIMEOUT = float(os.getenv("WATTWISE_AGENT_TIMEOUT", "45"))
+# "split" asks the CO2 and recommendation agents separately, "combined" asks
+# one agent for both in a single model call
+ANALYSIS_MODE = os.getenv("WATTWISE_ANALYSIS_MODE", "split")
+ANALYSIS_MODES = ("split", "combined")
+
+def build_weather_input(bill, city=None, current_month=None):
+    """Derives the weather agent's input from a normalized bill."""
+    breakdown = bill.get('breakdown', [])
+    return {
+        "city": city or "Mumbai",
+        "currentMonth": current_month or datetime.now().strftime("%B"),
+        "currentBill": sum(item.get('estimatedCost') or 0 for item in breakdown),
+        "appliances": [
+            {
+                "name": item.get('name'),
+                "count": item.get('count'),
+                "hours": item.get('hours'),
+                "watts": item.get('watts'),
+            }
+            for item in breakdown
+        ],
+    }
+
+class AnalysisDispatcher:
+    """
+    Runs the CO2, recommendation and weather agents concurrently in one event
+    loop and merges their results. A failing or slow agent only blanks its own
+    section of the document; its message is reported under "errors".
+
+    In "combined" mode the CO2 and recommendation sections come from one
+    CombinedAnalysisAgent call instead; the merged document is the same.
+    A request can pick its mode with "analysisMode".
+
+    Given an `emit`, the agents' progress events (see streaming.py) and a
+    "section" event per finished agent are passed to it along the way.
+    """
+
+    # Built from other resident agents rather than owning a model of its own
+    composite = True
+
+    def __init__(self, get_agent=None, timeouts=None, mode=None):
+        self.get_agent = get_agent or AgentWorker().get_agent
+        self.mode = mode or ANALYSIS_MODE
+        if self.mode not in ANALYSIS_MODES:
+            raise ValueError(f"Unknown analysis mode: {self.mode}")
+        self.timeouts = {
+            "co2": DEFAULT_TIMEOUT,
+            "recommendation": DEFAULT_TIMEOUT,
+            "combined": DEFAULT_TIMEOUT,
+            "weather": DEFAULT_TIMEOUT,
+        }
+        self.timeouts.update(timeouts or {})
+
+    async def _call(self, name, method, payload, emit=None):
+        """
+        Returns (result, error) for one agent call, never raising. An agent
+        that failed part way may return what it has under "partial".
+        """
+        timeout = self.timeouts[name]
+        try:
+            agent = await asyncio.to_thread(self.get_agent, name)
+            async_method = getattr(agent, f"{method}_async", None)
+            if async_method is not None and emit is not None:
+                pending = async_method(payload, emit)
+            elif async_method is not None:
+                pending = async_method(payload)
+            else:
+                pending = asyncio.to_thread(getattr(agent, method), payload)
+            with span("analyze.agent", agent=name):
+                result = await asyncio.wait_for(pending, timeout)
+        except asyncio.TimeoutError:
+            return None, f"{name} agent timed out after {timeout:g}s"
+        except Exception as e:
+            return None, str(e)
+
+        if isinstance(result, dict) and "error" in result:
+            return result.get("partial"), result["error"]
+        if emit is not None:
+            emit("section", name=name, result=result)
+        return result, None
+
+    async def _split(self, bill, city, emit=None):
+        """(co2, co2_error), (rec, rec_error) from two agents."""
+        return await asyncio.gather(
+            self._call("co2", "analyze", {"city": city, **bill}, emit),
+            self._call("recommendation", "analyze", bill, emit),
+        )
+
+    async def _combined(self, bill, city, emit=None):
+        """The same pairs as _split, from one CombinedAnalysisAgent call."""
+        result, error = await self._call("combined", "analyze", {"city": city, **bill}, emit)
+        if error is None:
+            return (result, None), (result, None)
+        # A model failure still leaves the locally computed footprint
+        return (result, None if result else error), (None, error)
+
+    async def analyze_async(self, data, emit=None):
+        bill = data.get('billData') or {}
+        if not bill.get('breakdown'):
+            return {"error": "billData with breakdown is required"}
+        mode = data.get('analysisMode') or self.mode
+        if mode not in ANALYSIS_MODES:
+            return {"error": f"Unknown analysis mode: {mode}"}
+
+        weather_input = build_weather_input(bill, data.get('city'), data.get('currentMonth'))
+        sections = self._combined if mode == "combined" else self._split
+        ((co2, co2_error), (rec, rec_error)), (weather, weather_error) = await asyncio.gather(
+            sections(bill, data.get('city'), emit),
+            self._call("weather", "predict", weather_input, emit),
+        )
+
+        errors = {
+            name: error
+            for name, error in (("co2", co2_error), ("recommendation", rec_error), ("weather", weather_error))
+            if error
+        }
+        if len(errors) == 3:
+            return {"error": "All agents failed: " + "; ".join(f"{k}: {v}" for k, v in errors.items())}
+
+        merged = {
+            "carbonFootprint": co2.get('carbonFootprint') if co2 else None,
+            "impact": co2.get('impact') if co2 else None,
+            "suggestions": rec.get('suggestions', []) if rec else [],
+            "weatherPrediction": weather,
+        }
+        if errors:
+            merged["errors"] = errors
+        return merged
+
+    def run(self, data):
+        """Synchronous entry point used by the worker and the CLI."""
+        return asyncio.run(self.analyze_async(data))
+
+    def stream(self, data, emit):
+        """run, passing progress events to emit; used for streaming requests."""
+        return asyncio.run(self.analyze_async(data, emit))
@@ -0,0 +1,51 @@
+import os
+import re
+
+# KEY=value, optionally preceded by "export"
+ASSIGNMENT = re.compile(r"^\s*(?:export\s+)?([A-Za-z_][A-Za-z0-9_.]*)\s*=\s*(.*?)\s*$")
+ESCAPES = {"n": "\n", "r": "\r", "t": "\t", '"': '"', "\\": "\\"}
+
+def find_env_file(start):
+    """The nearest .env in start or one of its parents, like python-dotenv's find_dotenv."""
+    directory = os.path.abspath(start)
+    while True:
+        path = os.path.join(directory, ".env")
+        if os.path.isfile(path):
+            return path
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+def parse_value(raw):
+    if raw[:1] == "'" and raw.rfind("'") > 0:
+        return raw[1:raw.rfind("'")]
+    if raw[:1] == '"' and raw.rfind('"') > 0:
+        body = raw[1:raw.rfind('"')]
+        return re.sub(r"\\(.)", lambda m: ESCAPES.get(m.group(1), m.group(0)), body)
+    # Unquoted values end at a " #" comment
+    return re.split(r"\s+#", raw, maxsplit=1)[0].strip()
+
+def parse_env(text):
+    """KEY -> value for the single-line assignments python-dotenv understands."""
+    values = {}
+    for line in text.splitlines():
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        match = ASSIGNMENT.match(line)
+        if match:
+            values[match.group(1)] = parse_value(match.group(2))
+    return values
+
+def load_env(start):
+    """
+    Loads the nearest .env without overriding variables already set. Parsed
+    here rather than with python-dotenv, so importing the package stays cheap.
+    """
+    path = find_env_file(start)
+    if path is None:
+        return None
+    with open(path, encoding="utf-8") as f:
+        for key, value in parse_env(f.read()).items():
+            os.environ.setdefault(key, value)
+    return path
@@ -0,0 +1,257 @@
+"""
+Offline stand-in for genai.GenerativeModel, used by the benchmarks.
+
+Configured through WATTWISE_FAKE_MODEL (a JSON object) or install(config):
+    latency        "fixed:MS", "uniform:LOW:HIGH" or "lognormal:MEDIAN:SIGMA"
+    malformedRate  share of calls answered with broken or non-JSON text
+    errorRate      share of calls that raise like an upstream 503
+    seed           makes the sequence of latencies and failures repeatable
+
+Streamed calls (stream=True) give their first chunk after FIRST_CHUNK_SHARE
+of the sampled latency and the rest of the text spread over the remainder.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import threading
+
+DEFAULT_CONFIG = {"latency": "lognormal:400:0.35", "malformedRate": 0.0, "errorRate": 0.0, "seed": None}
+FIRST_CHUNK_SHARE = 0.2
+CHUNK_CHARS = 40
+
+# prompt marker -> canned answer; checked in order, first match wins
+CANNED = (
+    ("Energy and Carbon Advisor Agent", json.dumps({
+        "description": "Your home emitted about 724 kg of CO2 this month, roughly what 34 trees absorb in a year.",
+        "suggestions": [
+            {"name": "Air Conditioner", "reductionPercentage": 0.15,
+             "strategy": "Set the AC to 24°C and use the timer at night to save 15%"},
+            {"name": "Refrigerator", "reductionPercentage": 0.05,
+             "strategy": "Keep the door closed and the coils clean to save 5%"},
+        ],
+    })),
+    ("Energy Efficiency Expert Agent", json.dumps({"suggestions": [
+        {"name": "Air Conditioner", "reductionPercentage": 0.15,
+         "strategy": "Set the AC to 24°C and use the timer at night to save 15%"},
+        {"name": "Refrigerator", "reductionPercentage": 0.05,
+         "strategy": "Keep the door closed and the coils clean to save 5%"},
+    ]})),
+    ("Energy Efficiency Agent", json.dumps({"carbonFootprint": "724 kg CO2", "suggestions": [
+        {"name": "Air Conditioner", "reductionPercentage": 0.15,
+         "strategy": "Turn off the AC when leaving the room to save 15%"},
+    ]})),
+    ("Bill Parser Agent", json.dumps({
+        "totalAmount": 3450.5, "totalUnits": 420, "billingPeriod": "Oct 2023 - Nov 2023",
+        "consumerNumber": "123456789012", "confidence": "high",
+    })),
+    ("Carbon Footprint Agent", "Your home emitted about 724 kg of CO2 this month, "
+                               "roughly what 34 trees absorb in a year."),
+    ("Weather-Based", "Next month is usually cooler, so air conditioner use should drop "
+                      "and the bill should come down slightly."),
+)
+
+MALFORMED = (
+    '{"suggestions": [{"name": "Air Conditioner", "reductionPerc',
+    "Sure! Here is the analysis you asked for:\n\n- Use less AC",
+    "```json\n{'totalAmount': 3450.5, 'totalUnits': 420,}\n```",
+    None,  # blocked: reading .text raises, as it does for a response with no candidates
+)
+
+# Calls and estimated tokens across every FakeModel in this process
+USAGE = {"calls": 0, "promptTokens": 0, "responseTokens": 0}
+_usage_lock = threading.Lock()
+
+class FakeUsage:
+    def __init__(self, prompt_tokens, response_tokens):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = response_tokens
+
+class FakeResponse:
+    def __init__(self, text, prompt=""):
+        self._text = text
+        # Roughly four characters per token, like Gemini on English text
+        self.usage_metadata = FakeUsage(len(prompt) // 4, len(text or "") // 4)
+
+    @property
+    def text(self):
+        if self._text is None:
+            raise ValueError("The response has no candidates (finish_reason: SAFETY)")
+        return self._text
+
+class FakeStream:
+    """A FakeResponse read in chunks, with `delay` spread across them."""
+
+    def __init__(self, response, delay):
+        self.response = response
+        self.usage_metadata = response.usage_metadata
+        text = response._text
+        self.chunks = [text[i:i + CHUNK_CHARS] for i in range(0, len(text), CHUNK_CHARS)] if text else [text]
+        self.pause = delay / max(1, len(self.chunks) - 1)
+
+    @property
+    def text(self):
+        return self.response.text
+
+    def __iter__(self):
+        for i, chunk in enumerate(self.chunks):
+            if i:
+                time.sleep(self.pause)
+            yield FakeResponse(chunk)
+
+    async def __aiter__(self):
+        for i, chunk in enumerate(self.chunks):
+            if i:
+                await asyncio.sleep(self.pause)
+            yield FakeResponse(chunk)
+
+def parse_latency(spec):
+    """Returns a function sampling one latency in seconds from a spec string."""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(":") if v]
+    if kind == "fixed":
+        return lambda rng: values[0] / 1000
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda rng: rng.lognormvariate(0, sigma) * median / 1000
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+EXAMPLES = {"STRING": "n/a", "NUMBER": 0, "INTEGER": 0, "BOOLEAN": False}
+
+def example(schema):
+    """The smallest value matching a response schema; the fake's answer to repair prompts."""
+    kind = schema["type"].upper()
+    if kind == "OBJECT":
+        return {name: example(sub) for name, sub in schema.get("properties", {}).items()}
+    if kind == "ARRAY":
+        return [example(schema["items"])]
+    return schema["enum"][0] if "enum" in schema else EXAMPLES[kind]
+
+def answer(prompt):
+    if prompt.startswith("Fix this JSON"):
+        schema = next(line for line in prompt.splitlines() if line.startswith("Schema: "))
+        return json.dumps(example(json.loads(schema[len("Schema: "):])))
+    return next((text for marker, text in CANNED if marker in prompt), "OK")
+
+def prompt_text(contents):
+    if isinstance(contents, str):
+        return contents
+    return " ".join(part for part in contents if isinstance(part, str))
+
+class FakeModel:
+    """Answers generate_content calls with canned text after a sampled delay."""
+
+    def __init__(self, model_name=None, config=None, **kwargs):
+        self.model_name = self.name = model_name
+        self.config = {**DEFAULT_CONFIG, **(config or load_config())}
+        self.sample_latency = parse_latency(self.config["latency"])
+        self.rng = random.Random(self.config["seed"])
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _plan(self, contents):
+        """Picks the delay and the outcome of one call."""
+        with self._lock:
+            self.calls += 1
+            delay = self.sample_latency(self.rng)
+            roll = self.rng.random()
+            malformed = self.rng.choice(MALFORMED)
+        if roll < self.config["errorRate"]:
+            return delay, RuntimeError("503 The model is overloaded. Please try again later.")
+        prompt = prompt_text(contents)
+        if roll < self.config["errorRate"] + self.config["malformedRate"]:
+            response = FakeResponse(malformed, prompt)
+        else:
+            response = FakeResponse(answer(prompt), prompt)
+        with _usage_lock:
+            USAGE["calls"] += 1
+            USAGE["promptTokens"] += response.usage_metadata.prompt_token_count
+            USAGE["responseTokens"] += response.usage_metadata.candidates_token_count
+        return delay, response
+
+    @staticmethod
+    def _timeout(kwargs):
+        return (kwargs.get("request_options") or {}).get("timeout")
+
+    def generate_content(self, contents, **kwargs):
+        delay, outcome = self._plan(contents)
+        timeout = self._timeout(kwargs)
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError("504 Deadline Exceeded")
+        first = delay * FIRST_CHUNK_SHARE if kwargs.get("stream") else delay
+        time.sleep(first)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return FakeStream(outcome, delay - first) if kwargs.get("stream") else outcome
+
+    async def generate_content_async(self, contents, **kwargs):
+        delay, outcome = self._plan(contents)
+        timeout = self._timeout(kwargs)
+        if timeout is not None and delay > timeout:
+            await asyncio.sleep(timeout)
+            raise TimeoutError("504 Deadline Exceeded")
+        first = delay * FIRST_CHUNK_SHARE if kwargs.get("stream") else delay
+        await asyncio.sleep(first)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return FakeStream(outcome, delay - first) if kwargs.get("stream") else outcome
+
+def load_config():
+    raw = os.getenv("WATTWISE_FAKE_MODEL")
+    return json.loads(raw) if raw else {}
+
+def install(config=None):
+    """
+    Replaces genai.GenerativeModel with FakeModel for this process so the
+    agents run unchanged but never reach the network.
+    """
+    import google.generativeai as genai
+
+    os.environ.setdefault("GEMINI_API_KEY", "offline")
+    genai.configure = lambda *args, **kwargs: None
+    genai.GenerativeModel = lambda model_name=None, **kwargs: FakeModel(model_name, config, **kwargs)
+
+def peak_rss_kb():
+    """Peak resident set size of this process in KiB, or None where unsupported."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+RSS_MARKER = "[FakeModel] peakRssKb="
+USAGE_MARKER = "[FakeModel] usage="
+
+def report():
+    print(f"{RSS_MARKER}{peak_rss_kb()}", file=sys.stderr, flush=True)
+    print(f"{USAGE_MARKER}{json.dumps(USAGE)}", file=sys.stderr, flush=True)
+
+def main(argv=None):
+    """
+    python -m wattwise_agents.fake_model SCRIPT | -m MODULE [ARGS...]
+
+    Runs an agent script (or module) with the fake model installed and
+    reports the process's peak RSS and model usage on stderr when it exits.
+    """
+    import atexit
+    import runpy
+
+    argv = list(sys.argv[1:] if argv is None else argv)
+    install()
+    atexit.register(report)
+
+    if argv[0] == "-m":
+        sys.argv = argv[1:]
+        runpy.run_module(argv[1], run_name="__main__", alter_sys=True)
+    else:
+        sys.argv = argv
+        runpy.run_path(argv[0], run_name="__main__")
+
+if __name__ == "__main__":
+    main()
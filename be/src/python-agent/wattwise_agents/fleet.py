@@ -0,0 +1,299 @@
+"""
+Bulk carbon, savings and seasonal forecast reports for a whole user base,
+without the model.
+
+Input is a columnar export with one row per breakdown line, grouped by user:
+    userId, city, month, name, count, hours, watts, monthlyUnits, estimatedCost
+as CSV, or as Parquet when pyarrow is installed. Only userId and name are
+required. Rows are read in chunks that end on a user boundary, each chunk is
+computed with NumPy in a worker process, and one line per user is written as
+soon as its chunk is done. Only a few chunks and the per-city totals are ever
+held in memory.
+
+The numbers match the agents: CarbonEngine for the footprint, SavingsRules
+for the top appliances' savings (appliances the rules do not know count as
+no savings) and Climatology for the next-month forecast.
+"""
+import os
+import io
+import csv
+import sys
+import time
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from wattwise_agents.carbon import CAR_KG_PER_KM, TREE_KG_PER_YEAR, CarbonEngine
+from wattwise_agents.climatology import APPLIANCE_CLASSES, FACTOR_RANGE, MONTHS, Climatology, month_index
+from wattwise_agents.savings import REDUCTION_RANGE, TOP_APPLIANCES, SavingsRules
+
+COLUMNS = ("userId", "city", "month", "name", "count", "hours", "watts", "monthlyUnits", "estimatedCost")
+OUTPUT_COLUMNS = (
+    "userId", "city", "month", "carbonFootprint", "trees", "carKm",
+    "currentBill", "projectedSavings", "nextMonth", "weatherFactor", "predictedBill",
+)
+TOTALS = ("users", "carbonFootprint", "trees", "carKm", "currentBill", "projectedSavings", "predictedBill")
+
+DEFAULT_CHUNK_ROWS = int(os.getenv("WATTWISE_FLEET_CHUNK_ROWS", "100000"))
+DEFAULT_CITY = "Mumbai"
+
+def log(message):
+    print(f"[Fleet] {message}", file=sys.stderr)
+
+# -- reading --------------------------------------------------------------
+
+def read_csv(path, batch_rows):
+    """Batches of at most batch_rows rows from a CSV file, as column -> list."""
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        while True:
+            batch = list(islice(reader, batch_rows))
+            if not batch:
+                return
+            yield dict(zip(header, map(list, zip(*batch))))
+
+def read_parquet(path, batch_rows):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Reading Parquet needs pyarrow (pip install pyarrow)")
+    source = pq.ParquetFile(path)
+    columns = [c for c in COLUMNS if c in source.schema_arrow.names]
+    for batch in source.iter_batches(batch_size=batch_rows, columns=columns):
+        yield batch.to_pydict()
+
+def read_batches(path, batch_rows=DEFAULT_CHUNK_ROWS):
+    if path.lower().endswith((".parquet", ".pq")):
+        return read_parquet(path, batch_rows)
+    return read_csv(path, batch_rows)
+
+def chunks(batches, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Regroups batches into chunks of about chunk_rows rows, each cut where
+    userId changes so no user is split across two chunks.
+    """
+    buffer = {}
+    for batch in batches:
+        if "userId" not in batch or "name" not in batch:
+            raise ValueError("The export needs userId and name columns")
+        for name, values in batch.items():
+            buffer.setdefault(name, []).extend(values)
+        ids = buffer["userId"]
+        while len(ids) > chunk_rows:
+            cut = next((i for i in range(chunk_rows, len(ids)) if ids[i] != ids[i - 1]), None)
+            if cut is None:
+                break
+            yield {name: values[:cut] for name, values in buffer.items()}
+            buffer = {name: values[cut:] for name, values in buffer.items()}
+            ids = buffer["userId"]
+    if buffer.get("userId"):
+        yield buffer
+
+def numeric(values, default):
+    """A float array from a column of numbers or strings, blanks as `default`."""
+    array = np.array(values, dtype=object)
+    array[(array == "") | (array == None)] = "nan"  # noqa: E711 (elementwise)
+    array = array.astype(float)
+    array[np.isnan(array)] = default
+    return array
+
+def text(columns, name, default, rows):
+    values = columns.get(name)
+    if values is None:
+        return np.full(rows, default, dtype=object).astype(str)
+    array = np.array(values, dtype=object)
+    array[(array == "") | (array == None)] = default  # noqa: E711 (elementwise)
+    return array.astype(str)
+
+# -- computing ------------------------------------------------------------
+
+class FleetAnalyzer:
+    """
+    Vectorized versions of the per-household calculations. Anything keyed by
+    appliance name, city or month is looked up once per distinct value, then
+    broadcast over the rows.
+    """
+
+    def __init__(self, engine=None, rules=None, climatology=None, month=None):
+        self.engine = engine or CarbonEngine.from_env()
+        self.rules = rules or SavingsRules()
+        self.climatology = climatology or Climatology()
+        self.month = month or datetime.now().strftime("%B")
+        self.kinds = sorted(self.rules.rules)
+
+    def reduction(self, kinds, hours, watts):
+        """Each line's rule reduction, 0 where the rules do not know the appliance."""
+        reduction = np.zeros(len(kinds))
+        for code, kind in enumerate(self.kinds):
+            rows = kinds == code
+            if not rows.any():
+                continue
+            rules = self.rules.rules[kind]
+            conditions = [(hours[rows] >= h) & (watts[rows] >= w) for h, w, _, _ in rules]
+            values = [min(max(r, REDUCTION_RANGE[0]), REDUCTION_RANGE[1]) for _, _, r, _ in rules]
+            reduction[rows] = np.select(conditions, values, 0.0)
+        return reduction
+
+    def analyze(self, columns):
+        """Per-user results for one chunk, as column -> array, in input order."""
+        ids = np.array(columns["userId"], dtype=object).astype(str)
+        rows = len(ids)
+        names = text(columns, "name", "", rows)
+        count = numeric(columns.get("count", [None] * rows), 1.0)
+        count[count == 0] = 1.0  # `count or 1`, as in the agents
+        hours = numeric(columns.get("hours", [None] * rows), 0.0)
+        watts = numeric(columns.get("watts", [None] * rows), 0.0)
+        units = numeric(columns.get("monthlyUnits", [None] * rows), np.nan)
+        cost = numeric(columns.get("estimatedCost", [None] * rows), 0.0)
+
+        # Users in order of first appearance
+        unique_ids, first, user = np.unique(ids, return_index=True, return_inverse=True)
+        order = np.argsort(first)
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        user = rank[user]
+        first = first[order]
+        users = len(first)
+        cities = text(columns, "city", DEFAULT_CITY, rows)[first]
+        months = text(columns, "month", self.month, rows)[first]
+
+        # Footprint: appliance_units x adjustment x the user's grid factor
+        kwh = np.where(np.isnan(units), watts * hours * count * 30 / 1000, units)
+        unique_names, name = np.unique(names, return_inverse=True)
+        adjustment = np.array([self.engine.adjustment(n) for n in unique_names])[name]
+        unique_cities, city = np.unique(cities, return_inverse=True)
+        grid = np.array([self.engine.grid_factor(c) for c in unique_cities])[city]
+        co2 = np.bincount(user, kwh * adjustment, users) * grid
+
+        # Savings on each user's top appliances by cost, like SavingsRules.recommend
+        rank_cost = np.where(cost != 0, cost, np.nan_to_num(units))
+        ordered = np.lexsort((-rank_cost, user))
+        starts = np.searchsorted(user[ordered], np.arange(users))
+        top = np.zeros(rows, dtype=bool)
+        top[ordered[np.arange(rows) - starts[user[ordered]] < TOP_APPLIANCES]] = True
+        codes = {kind: i for i, kind in enumerate(self.kinds)}
+        kinds = np.array([codes.get(self.rules.kind(n), -1) for n in unique_names])[name]
+        savings = np.bincount(user, np.where(top, cost * self.reduction(kinds, hours, watts), 0.0), users)
+
+        # Forecast: class energy weighted by next month / this month usage ratios
+        bill = np.bincount(user, cost, users)
+        classes = {c: i for i, c in enumerate(APPLIANCE_CLASSES)}
+        appliance_class = np.array([classes[self.climatology.appliance_class(n)] for n in unique_names])[name]
+        unique_months, month = np.unique(months, return_inverse=True)
+        month_codes = np.array([month_index(m) for m in unique_months])[month]
+        unique_seasons, season = np.unique(city * 12 + month_codes, return_inverse=True)
+        ratios = np.array([
+            [r[c] for c in APPLIANCE_CLASSES]
+            for r in (self.climatology.class_ratios(unique_cities[s // 12], MONTHS[s % 12]) for s in unique_seasons)
+        ])
+        energy = watts * hours * count
+        weighted = np.bincount(user, energy * ratios[season[user], appliance_class], users)
+        total = np.bincount(user, energy, users)
+        factor = np.divide(weighted, total, out=np.ones(users), where=total > 0)
+        factor = np.round(np.clip(factor, *FACTOR_RANGE), 2)
+
+        return {
+            "userId": unique_ids[order],
+            "city": cities,
+            "month": months,
+            "carbonFootprint": np.round(co2, 1),
+            "trees": np.where(co2 > 0, np.ceil(co2 / TREE_KG_PER_YEAR), 0).astype(int),
+            "carKm": np.round(co2 / CAR_KG_PER_KM).astype(int),
+            "currentBill": np.round(bill, 2),
+            "projectedSavings": np.round(savings, 2),
+            "nextMonth": np.array(MONTHS, dtype=object)[(month_codes + 1) % 12],
+            "weatherFactor": factor,
+            "predictedBill": np.round(bill * factor, 2),
+        }
+
+def summarize(result):
+    """Totals per city for one chunk's users."""
+    cities, city = np.unique(result["city"], return_inverse=True)
+    sums = {field: np.bincount(city, result[field], len(cities)).tolist() for field in TOTALS[1:]}
+    users = np.bincount(city, minlength=len(cities)).tolist()
+    return {
+        name: {"users": users[i], **{field: sums[field][i] for field in TOTALS[1:]}}
+        for i, name in enumerate(cities.tolist())
+    }
+
+def render(result):
+    out = io.StringIO()
+    csv.writer(out).writerows(zip(*(result[c].tolist() for c in OUTPUT_COLUMNS)))
+    return out.getvalue()
+
+# One analyzer per worker process and default month, reused across chunks
+_analyzers = {}
+
+def analyze_chunk(columns, month=None):
+    """Worker entry point: (CSV lines, per-city totals, rows) for one chunk."""
+    if month not in _analyzers:
+        _analyzers[month] = FleetAnalyzer(month=month)
+    result = _analyzers[month].analyze(columns)
+    return render(result), summarize(result), len(columns["userId"])
+
+# -- running --------------------------------------------------------------
+
+class FleetReport:
+    """
+    Runs analyze_chunk over an export on `processes` worker processes (in
+    this process when 1), writing user lines in input order as chunks finish
+    and keeping running totals. At most 2 x processes chunks are in flight.
+    """
+
+    def __init__(self, processes=None, chunk_rows=DEFAULT_CHUNK_ROWS, month=None, output=None):
+        self.processes = processes or os.cpu_count() or 1
+        self.chunk_rows = chunk_rows
+        self.month = month
+        self.output = output or sys.stdout
+        self.cities = {}
+        self.counts = {"rows": 0, "users": 0, "chunks": 0}
+
+    def collect(self, lines, totals, rows):
+        self.output.write(lines)
+        self.output.flush()
+        for city, values in totals.items():
+            row = self.cities.setdefault(city, dict.fromkeys(TOTALS, 0))
+            for field, value in values.items():
+                row[field] += value
+        self.counts["rows"] += rows
+        self.counts["users"] += sum(values["users"] for values in totals.values())
+        self.counts["chunks"] += 1
+
+    def run(self, path):
+        started = time.perf_counter()
+        csv.writer(self.output).writerow(OUTPUT_COLUMNS)
+        pending = chunks(read_batches(path, self.chunk_rows), self.chunk_rows)
+        if self.processes == 1:
+            for chunk in pending:
+                self.collect(*analyze_chunk(chunk, self.month))
+        else:
+            with ProcessPoolExecutor(max_workers=self.processes) as pool:
+                window = deque()
+                for chunk in pending:
+                    window.append(pool.submit(analyze_chunk, chunk, self.month))
+                    if len(window) >= 2 * self.processes:
+                        self.collect(*window.popleft().result())
+                while window:
+                    self.collect(*window.popleft().result())
+        return self.summary(time.perf_counter() - started)
+
+    def summary(self, elapsed):
+        def rounded(values):
+            return {k: round(v, 2) if k in ("carbonFootprint", "currentBill", "projectedSavings", "predictedBill")
+                    else int(v) for k, v in values.items()}
+
+        overall = dict.fromkeys(TOTALS, 0)
+        for values in self.cities.values():
+            for field, value in values.items():
+                overall[field] += value
+        return {
+            **self.counts,
+            "elapsedSeconds": round(elapsed, 3),
+            "rowsPerSecond": round(self.counts["rows"] / elapsed) if elapsed else None,
+            "totals": rounded(overall),
+            "byCity": {city: rounded(values) for city, values in sorted(self.cities.items())},
+        }
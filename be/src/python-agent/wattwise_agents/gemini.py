@@ -0,0 +1,43 @@
+import threading
+
+from wattwise_agents.metrics import span
+
+class LazyModel:
+    """
+    A Gemini model that imports and configures google.generativeai on first
+    use, so requests answered locally never pay for loading the SDK.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, name, api_key):
+        self.name = name
+        self.api_key = api_key
+        self._model = None
+
+    def load(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    with span("gemini.import"):
+                        import google.generativeai as genai
+                    genai.configure(api_key=self.api_key)
+                    self._model = genai.GenerativeModel(self.name)
+        return self._model
+
+    def generate_content(self, *args, **kwargs):
+        return self.load().generate_content(*args, **kwargs)
+
+    async def generate_content_async(self, *args, **kwargs):
+        return await self.load().generate_content_async(*args, **kwargs)
+
+_models = {}
+_models_lock = threading.Lock()
+
+def get_model(name, api_key):
+    """The process-wide client for a model name; every agent using it shares one."""
+    with _models_lock:
+        model = _models.get(name)
+        if model is None or model.api_key != api_key:
+            model = _models[name] = LazyModel(name, api_key)
+        return model
@@ -0,0 +1,425 @@
+"""
+Load test for the agent layer: virtual users replay production-like traffic
+against one resident worker (`serve`) that talks to the fake model and to a
+local fake OpenWeatherMap, at increasing numbers of concurrent users.
+
+Request kinds:
+    analysis     the analyze request (CO2, recommendations and weather together)
+    bill-text    a text bill upload
+    bill-vision  a scanned bill upload, handed over as a PDF path like the backend does
+
+A traffic mode is "mixed" (kinds drawn by MIX) or a single kind. Each mode
+gets its own worker, so its CPU and memory are its own, and runs every user
+level for `duration` seconds. Users send a request, wait for the answer and
+think for an exponentially distributed time before the next, like people
+clicking through the app. Breakdowns are drawn from the appliance catalogue
+(be/src/data/presets.ts) and every request is different, so the response
+cache and bill store are off and only the agents' own work is measured.
+
+The saturation point of a mode is the first level where throughput grows by
+less than MIN_GAIN over the previous level, errors pass the error budget or
+p99 passes the SLO.
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import tempfile
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from wattwise_agents import AGENT_DIR
+from wattwise_agents.bench import BREAKDOWN, ResidentClient, bench_env, latency_stats
+from wattwise_agents.fake_model import DEFAULT_CONFIG, parse_latency
+from wattwise_agents.weather import CITY_COORDINATES
+
+# Bump when the shape of the report changes
+REPORT_VERSION = 1
+
+KINDS = ("analysis", "bill-text", "bill-vision")
+MIX = {"analysis": 0.6, "bill-text": 0.3, "bill-vision": 0.1}
+DEFAULT_USERS = (50, 100, 200, 500)
+DEFAULT_WEATHER = {"latency": "lognormal:120:0.4", "errorRate": 0.02}
+
+# A level is saturated when throughput grows by less than this share over the previous one
+MIN_GAIN = 0.1
+
+PRESETS_PATH = os.path.join(os.path.dirname(AGENT_DIR), "data", "presets.ts")
+PRESET_PATTERN = re.compile(r"""name:\s*(["'])(.+?)\1,\s*category:\s*"(\w+)",\s*wattage:\s*(\d+)""")
+
+# category -> (fewest, most) hours a day and most units in a home
+USAGE = {
+    "Cooling": ((4, 12), 4),
+    "Lighting": ((4, 8), 12),
+    "Kitchen": ((0.5, 2), 1),
+    "Laundry": ((0.5, 1.5), 1),
+    "Entertainment": ((2, 6), 2),
+    "Heating": ((0.5, 2), 1),
+    "Other": ((0.5, 2), 1),
+}
+ALWAYS_ON = ("Refrigerator",)
+RATE_PER_UNIT = 8.0
+MONTHS = ("January", "February", "March", "April", "May", "June", "July", "August",
+          "September", "October", "November", "December")
+
+def log(message):
+    print(f"[LoadTest] {message}", file=sys.stderr)
+
+def load_catalogue(path=PRESETS_PATH):
+    """The app's appliance presets as [(name, category, watts)]; the bench breakdown if the file is missing."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            presets = [(name, category, int(watts)) for _, name, category, watts in PRESET_PATTERN.findall(f.read())]
+    except FileNotFoundError:
+        presets = []
+    if not presets:
+        log(f"No presets at {path}, using the benchmark appliances")
+        presets = [(item["name"], "Other", item["watts"]) for item in BREAKDOWN]
+    return presets
+
+def synthetic_pdf(lines):
+    """A one-page PDF with `lines` of text, like a small scanned bill the backend writes to disk."""
+    escape = lambda line: line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    text = " T* ".join(f"({escape(line)}) Tj" for line in lines)
+    content = f"BT /F1 11 Tf 14 TL 50 780 Td {text} ET".encode("latin-1", "replace")
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+class Traffic:
+    """Builds (agent, payload) requests for each kind from one seeded generator per user."""
+
+    def __init__(self, catalogue, workdir, mix=MIX):
+        self.catalogue = catalogue
+        self.workdir = workdir
+        self.kinds = list(mix)
+        self.weights = [mix[kind] for kind in self.kinds]
+        self.cities = sorted(CITY_COORDINATES)
+        self.scans = 0
+        self._lock = threading.Lock()
+
+    def breakdown(self, rng):
+        items = []
+        for name, category, watts in rng.sample(self.catalogue, rng.randint(4, min(10, len(self.catalogue)))):
+            (low, high), most = USAGE.get(category, USAGE["Other"])
+            hours = 24 if name.startswith(ALWAYS_ON) else round(rng.uniform(low, high), 1)
+            count = rng.randint(1, most)
+            units = round(watts * hours * count * 30 / 1000, 1)
+            items.append({
+                "name": name, "count": count, "hours": hours, "watts": watts,
+                "monthlyUnits": units, "estimatedCost": round(units * RATE_PER_UNIT),
+            })
+        return items
+
+    def bill_lines(self, rng):
+        units = rng.randint(80, 900)
+        lines = [
+            f"{rng.choice(['Some Power Distribution Ltd', 'City Electric Supply Co.'])}",
+            f"Account Number : AC-{rng.randint(10000, 99999)}",
+            f"Billing Period: 01/{rng.randint(1, 12):02d}/2024 to 30/{rng.randint(1, 12):02d}/2024",
+        ]
+        # About half the bills lack a labelled units line, so the parser asks the model
+        if rng.random() < 0.5:
+            lines.append(f"Units Consumed (kWh): {units}")
+        lines.append(f"Net Amount Payable: Rs. {units * RATE_PER_UNIT:,.2f}")
+        return lines
+
+    def scan(self, rng):
+        """Writes a scanned bill to the work directory, as the upload controller does."""
+        with self._lock:
+            self.scans += 1
+            path = os.path.join(self.workdir, f"bill-{self.scans}.pdf")
+        with open(path, "wb") as f:
+            f.write(synthetic_pdf(self.bill_lines(rng)))
+        return path
+
+    def kind(self, rng):
+        return rng.choices(self.kinds, self.weights)[0]
+
+    def request(self, kind, rng):
+        if kind == "analysis":
+            return "analyze", {
+                "billData": {"breakdown": self.breakdown(rng)},
+                "city": rng.choice(self.cities).title(),
+                "currentMonth": rng.choice(MONTHS),
+            }
+        if kind == "bill-text":
+            return "bill", {"pdfText": "\n".join(self.bill_lines(rng)), "isImageBased": False}
+        return "bill", {"pdfPath": self.scan(rng), "isImageBased": True}
+
+class FakeWeatherServer:
+    """
+    A local stand-in for the OpenWeatherMap endpoints the agents call, with
+    sampled latency and an error rate, on an ephemeral port.
+    """
+
+    def __init__(self, latency=DEFAULT_WEATHER["latency"], error_rate=DEFAULT_WEATHER["errorRate"], seed=None):
+        sample = parse_latency(latency)
+        rng = random.Random(seed)
+        lock = threading.Lock()
+        self.requests = 0
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with lock:
+                    server.requests += 1
+                    delay, failed = sample(rng), rng.random() < error_rate
+                time.sleep(delay)
+                if failed:
+                    return self.reply(503, {"cod": 503, "message": "Service Unavailable"})
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                lat = float(query.get("lat", ["20"])[0])
+                temp = round(34 - abs(lat - 10) * 0.4, 1)
+                if url.path == "/geo/1.0/direct":
+                    return self.reply(200, [{"lat": 20.0, "lon": 78.0}])
+                if url.path == "/data/2.5/weather":
+                    return self.reply(200, {"main": {"temp": temp, "humidity": 60}, "weather": [{"description": "haze"}]})
+                if url.path == "/data/2.5/forecast":
+                    steps = int(query.get("cnt", ["8"])[0])
+                    return self.reply(200, {"list": [{"main": {"temp": temp - 1, "humidity": 65}}] * steps})
+                self.reply(404, {"cod": 404, "message": "Not found"})
+
+            def reply(self, status, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+class ProcessSampler:
+    """
+    CPU time and resident memory of one process from /proc, sampled in the
+    background while a level runs. Reports None where /proc is unavailable.
+    """
+
+    def __init__(self, pid, interval=0.5):
+        self.pid = pid
+        self.interval = interval
+        self.ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+        self._stop = threading.Event()
+
+    def cpu_seconds(self):
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            return None
+        # utime and stime are the 14th and 15th fields, counted from the pid
+        return (int(fields[11]) + int(fields[12])) / self.ticks
+
+    def rss_kb(self):
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1])
+        except OSError:
+            return None
+        return None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.cpu_start = self.cpu_seconds()
+        self.peak = self.rss_kb()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = self.rss_kb()
+            if rss is not None:
+                self.peak = max(self.peak or 0, rss)
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        elapsed = time.perf_counter() - self.started
+        cpu_end = self.cpu_seconds()
+        cpu = None if self.cpu_start is None or cpu_end is None else cpu_end - self.cpu_start
+        self.result = {
+            # 100 is one core fully busy
+            "cpuPercent": round(100 * cpu / elapsed, 1) if cpu is not None else None,
+            "rssKb": self.rss_kb(),
+            "peakRssKb": self.peak,
+        }
+        self.cpu = cpu
+
+def run_level(client, traffic, users, duration, think_ms, seed=None):
+    """
+    Runs `users` closed-loop virtual users for `duration` seconds; returns
+    per-kind latencies and outcomes and the measured wall time.
+    """
+    deadline = time.perf_counter() + duration
+    samples = {kind: {"latencies": [], "errors": 0, "partial": 0} for kind in KINDS}
+    lock = threading.Lock()
+
+    def user(n):
+        rng = random.Random(None if seed is None else seed * 100003 + n)
+        # Users arrive spread over the first think time, not all at once
+        time.sleep(rng.uniform(0, think_ms / 1000))
+        while time.perf_counter() < deadline:
+            kind = traffic.kind(rng)
+            agent, payload = traffic.request(kind, rng)
+            started = time.perf_counter()
+            try:
+                response = client.request(agent, payload)
+            except Exception as e:
+                response = {"error": str(e)}
+            took = time.perf_counter() - started
+            with lock:
+                sample = samples[kind]
+                sample["latencies"].append(took)
+                if "error" in response:
+                    sample["errors"] += 1
+                elif isinstance(response.get("result"), dict) and response["result"].get("errors"):
+                    sample["partial"] += 1
+            if think_ms:
+                time.sleep(min(rng.expovariate(1000 / think_ms), 10 * think_ms / 1000))
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=user, args=(n,), daemon=True) for n in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+def level_report(users, samples, elapsed, usage):
+    kinds = {}
+    for kind, sample in samples.items():
+        if sample["latencies"]:
+            kinds[kind] = {**latency_stats(sample["latencies"], sample["errors"], elapsed),
+                           "partial": sample["partial"]}
+    latencies = [latency for sample in samples.values() for latency in sample["latencies"]]
+    errors = sum(sample["errors"] for sample in samples.values())
+    overall = latency_stats(latencies, errors, elapsed)
+    overall["errorRate"] = round(errors / len(latencies), 4) if latencies else None
+    if usage.get("cpuSeconds") is not None and latencies:
+        usage["cpuSecondsPerRequest"] = round(usage["cpuSeconds"] / len(latencies), 4)
+    return {"users": users, **overall, "kinds": kinds, "worker": usage}
+
+def saturation(levels, slo_ms, error_budget, min_gain=MIN_GAIN):
+    """
+    The first level that is past saturation and why, or None if every level
+    kept up. `levels` are level reports in increasing user order.
+    """
+    previous = None
+    for level in levels:
+        reason = None
+        if level["errorRate"] is not None and level["errorRate"] > error_budget:
+            reason = "errors"
+        elif level["p99Ms"] is not None and level["p99Ms"] > slo_ms:
+            reason = "p99"
+        elif previous is not None and previous["throughputPerSec"]:
+            if level["throughputPerSec"] < previous["throughputPerSec"] * (1 + min_gain):
+                reason = "throughput"
+        if reason is not None:
+            return {
+                "users": level["users"],
+                "reason": reason,
+                "lastGoodUsers": previous["users"] if previous else None,
+                "maxThroughputPerSec": max(l["throughputPerSec"] or 0 for l in levels),
+            }
+        previous = level
+    return None
+
+def run_mode(mode, users, duration, think_ms, env, workers, catalogue, workdir, seed):
+    mix = MIX if mode == "mixed" else {mode: 1.0}
+    traffic = Traffic(catalogue, workdir, mix)
+    log(f"{mode}: starting worker")
+    client = ResidentClient(env, workers=workers)
+    levels = []
+    try:
+        client.request("ping")
+        # One request of each kind so imports and first calls are not measured
+        rng = random.Random(seed)
+        for kind in mix:
+            client.request(*traffic.request(kind, rng))
+        for count in users:
+            log(f"{mode}: {count} users for {duration}s")
+            sampler = ProcessSampler(client.process.pid)
+            with sampler:
+                samples, elapsed = run_level(client, traffic, count, duration, think_ms, seed)
+            usage = {**sampler.result, "cpuSeconds": round(sampler.cpu, 2) if sampler.cpu is not None else None}
+            level = level_report(count, samples, elapsed, usage)
+            log(f"{mode}: {count} users -> {level['throughputPerSec']}/s, p99 {level['p99Ms']} ms, "
+                f"{level['errors']} errors, cpu {usage['cpuPercent']}%")
+            levels.append(level)
+    finally:
+        peak = client.close()
+    return {"levels": levels, "worker": {"peakRssKb": peak}}
+
+def run_loadtest(users=DEFAULT_USERS, duration=30, modes=("mixed",), think_ms=1000, workers=8, model=None,
+                 weather=None, slo_ms=5000, error_budget=0.01, seed=None):
+    """
+    Runs every mode at every user level against the fake model and weather
+    server and returns a JSON-serializable report.
+    """
+    users = sorted(users)
+    model_config = {**DEFAULT_CONFIG, **(model or {})}
+    weather_config = {**DEFAULT_WEATHER, **(weather or {})}
+    catalogue = load_catalogue()
+    report = {
+        "version": REPORT_VERSION,
+        "startedAt": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": {
+            "users": users, "duration": duration, "modes": list(modes), "thinkMs": think_ms, "workers": workers,
+            "mix": MIX, "model": model_config, "weather": weather_config, "sloMs": slo_ms,
+            "errorBudget": error_budget, "appliances": len(catalogue), "cpus": os.cpu_count(),
+        },
+        "modes": {},
+    }
+    with FakeWeatherServer(weather_config["latency"], weather_config["errorRate"], seed) as server, \
+            tempfile.TemporaryDirectory(prefix="wattwise-load-") as workdir:
+        env = bench_env(model_config)
+        env.pop("WATTWISE_WEATHER_SNAPSHOT", None)
+        env.update({
+            "OPENWEATHER_API_KEY": "offline",
+            "OPENWEATHER_BASE_URL": server.url,
+        })
+        for mode in modes:
+            result = run_mode(mode, users, duration, think_ms, env, workers, catalogue, workdir, seed)
+            result["saturation"] = saturation(result["levels"], slo_ms, error_budget)
+            report["modes"][mode] = result
+        report["weatherRequests"] = server.requests
+    return report
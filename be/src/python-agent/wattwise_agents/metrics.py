@@ -0,0 +1,239 @@
+"""
+Timing spans and counters for the agents.
+
+WATTWISE_METRICS selects where they go:
+    off     (default) nothing is recorded; span() returns a shared no-op
+    stderr  one JSON object per span or model call on stderr
+    file    Prometheus textfile at WATTWISE_METRICS_FILE, rewritten at most
+            every WATTWISE_METRICS_INTERVAL seconds and at exit
+    both    stderr and file
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+import contextvars
+
+# Upper bounds of the span duration histogram, in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_parent = contextvars.ContextVar("wattwise_span", default=None)
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+NULL_SPAN = _NullSpan()
+
+class Span:
+    def __init__(self, metrics, name, attrs):
+        self.metrics = metrics
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        """Adds attributes known only once the stage has run (sizes, counts)."""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.parent = _parent.get()
+        self._token = _parent.set(self.name)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        _parent.reset(self._token)
+        self.metrics.record_span(self.name, elapsed, self.parent, self.attrs, exc_type is not None)
+        return False
+
+def _text_size(prompt):
+    """Characters of text and bytes of inline data in a prompt or content list."""
+    if isinstance(prompt, str):
+        return len(prompt), 0
+    chars = sum(len(part) for part in prompt if isinstance(part, str))
+    data = sum(len(part.get("data") or b"") for part in prompt if isinstance(part, dict))
+    return chars, data
+
+def _labels(labels):
+    return ",".join(f'{k}="{v}"' for k, v in labels)
+
+class Metrics:
+    def __init__(self, mode="off", path=None, stream=None, interval=10.0):
+        self.mode = mode
+        self.enabled = mode in ("stderr", "file", "both")
+        self.to_stream = mode in ("stderr", "both")
+        self.path = path if mode in ("file", "both") else None
+        self.stream = stream
+        self.interval = interval
+        self.spans = {}     # name -> [count, seconds, errors, bucket counts]
+        self.counters = {}  # (name, ((label, value), ...)) -> total
+        self.gauges = {}    # (name, ((label, value), ...)) -> last value
+        self.written_at = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        path = os.getenv("WATTWISE_METRICS_FILE") or os.path.join(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "wattwise_agents.prom"
+        )
+        return cls(
+            mode=os.getenv("WATTWISE_METRICS", "off"),
+            path=path,
+            interval=float(os.getenv("WATTWISE_METRICS_INTERVAL", "10")),
+        )
+
+    def span(self, name, **attrs):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, attrs)
+
+    def emit(self, event):
+        if self.to_stream:
+            print(json.dumps(event), file=self.stream or sys.stderr, flush=True)
+
+    def record_span(self, name, seconds, parent, attrs, failed):
+        with self._lock:
+            entry = self.spans.setdefault(name, [0, 0.0, 0, [0] * len(BUCKETS)])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] += 1 if failed else 0
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    entry[3][i] += 1
+        event = {"type": "span", "span": name, "ms": round(seconds * 1000, 3)}
+        if parent:
+            event["parent"] = parent
+        if failed:
+            event["error"] = True
+        self.emit({**event, **attrs})
+        self.maybe_write()
+
+    def count(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def gauge(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.gauges[key] = value
+
+    def model_call(self, agent, prompt, response=None, retries=0):
+        """
+        Records the size of one model round-trip: prompt and response
+        characters, inline data bytes and, when the SDK reports them, tokens.
+        """
+        if not self.enabled:
+            return
+        prompt_chars, data_bytes = _text_size(prompt)
+        event = {"type": "model", "agent": agent, "promptChars": prompt_chars}
+        if data_bytes:
+            event["dataBytes"] = data_bytes
+        if response is not None:
+            try:
+                event["responseChars"] = len(response.text)
+            except Exception:
+                event["responseChars"] = 0
+            usage = getattr(response, "usage_metadata", None)
+            if usage is not None:
+                event["promptTokens"] = getattr(usage, "prompt_token_count", None)
+                event["responseTokens"] = getattr(usage, "candidates_token_count", None)
+        if retries:
+            event["retries"] = retries
+
+        self.count("wattwise_model_calls_total", agent=agent, outcome="ok" if response is not None else "failed")
+        for field, metric in (
+            ("promptChars", "wattwise_model_prompt_chars_total"),
+            ("responseChars", "wattwise_model_response_chars_total"),
+            ("dataBytes", "wattwise_model_data_bytes_total"),
+            ("promptTokens", "wattwise_model_prompt_tokens_total"),
+            ("responseTokens", "wattwise_model_response_tokens_total"),
+            ("retries", "wattwise_model_retries_total"),
+        ):
+            if event.get(field):
+                self.count(metric, event[field], agent=agent)
+        self.emit(event)
+
+    def prometheus(self):
+        """Everything recorded so far in Prometheus text exposition format."""
+        with self._lock:
+            spans = {name: (c, s, e, list(b)) for name, (c, s, e, b) in self.spans.items()}
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+
+        lines = []
+        if spans:
+            lines += ["# HELP wattwise_span_seconds Time spent in each agent stage.",
+                      "# TYPE wattwise_span_seconds histogram"]
+            for name, (count, seconds, _, buckets) in sorted(spans.items()):
+                for bound, hits in zip(BUCKETS, buckets):
+                    lines.append(f'wattwise_span_seconds_bucket{{span="{name}",le="{bound}"}} {hits}')
+                lines.append(f'wattwise_span_seconds_bucket{{span="{name}",le="+Inf"}} {count}')
+                lines.append(f'wattwise_span_seconds_sum{{span="{name}"}} {seconds:.6f}')
+                lines.append(f'wattwise_span_seconds_count{{span="{name}"}} {count}')
+            lines += ["# TYPE wattwise_span_errors_total counter"]
+            lines += [f'wattwise_span_errors_total{{span="{name}"}} {errors}'
+                      for name, (_, _, errors, _) in sorted(spans.items())]
+        typed = set()
+        for (name, labels), value in sorted(counters.items()):
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{{{_labels(labels)}}} {value}")
+        for (name, labels), value in sorted(gauges.items()):
+            if name not in typed:
+                lines.append(f"# TYPE {name} gauge")
+                typed.add(name)
+            lines.append(f"{name}{{{_labels(labels)}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def maybe_write(self):
+        if self.path and time.monotonic() - self.written_at >= self.interval:
+            self.write()
+
+    def write(self):
+        """Rewrites the textfile atomically so a collector never reads half of it."""
+        if not self.path or not (self.spans or self.counters or self.gauges):
+            return
+        self.written_at = time.monotonic()
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            temp = f"{self.path}.{os.getpid()}.tmp"
+            with open(temp, "w", encoding="utf-8") as f:
+                f.write(self.prometheus())
+            os.replace(temp, self.path)
+        except OSError as e:
+            print(f"Could not write metrics file {self.path}: {e}", file=sys.stderr)
+
+_metrics = Metrics.from_env()
+if _metrics.path:
+    atexit.register(_metrics.write)
+
+def get_metrics():
+    return _metrics
+
+def span(name, **attrs):
+    """Times a stage: `with span("co2.model", agent="co2") as s: ...`. Free when metrics are off."""
+    return _metrics.span(name, **attrs) if _metrics.enabled else NULL_SPAN
+
+def count(name, value=1, **labels):
+    _metrics.count(name, value, **labels)
+
+def gauge(name, value, **labels):
+    _metrics.gauge(name, value, **labels)
+
+def model_call(agent, prompt, response=None, retries=0):
+    _metrics.model_call(agent, prompt, response, retries)
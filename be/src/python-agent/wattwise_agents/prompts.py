@@ -0,0 +1,119 @@
+"""
+Compact, token-budgeted serialization of agent inputs.
+
+Appliance breakdowns go in as a small table with only the columns the model
+needs instead of indented JSON, and bill text is cut down to the lines that
+mention the fields being extracted instead of its first 8000 characters.
+Every prompt records its estimated tokens and what the old format would
+have cost, as span attributes and wattwise_prompt_tokens*_total counters.
+"""
+import os
+import re
+
+from wattwise_agents.metrics import count
+
+# Estimated input tokens per agent for the embedded data (not the instructions)
+DEFAULT_BUDGETS = {"recommendation": 600, "carbon": 600, "combined": 600, "bill": 1500}
+
+# Bill lines mentioning a field, and the lines around them, are what the model reads
+FIELD_KEYWORDS = {
+    "totalAmount": r"amount|payable|total|due|net|₹|rs\.?|inr",
+    "totalUnits": r"units?|kwh|consumption|reading|billed",
+    "billingPeriod": r"period|month|\bfrom\b|\bto\b|date",
+    "consumerNumber": r"consumer|account|service|connection|\bca\b|\bk\s*no",
+}
+
+def budget(agent):
+    """Token budget for `agent`, overridable with WATTWISE_PROMPT_BUDGET_<AGENT>."""
+    return int(os.getenv(f"WATTWISE_PROMPT_BUDGET_{agent.upper()}", DEFAULT_BUDGETS[agent]))
+
+def count_tokens(text):
+    """
+    Estimated Gemini tokens: about four characters each for English text,
+    with every digit run and symbol counted on its own, since tables and
+    bills are mostly those.
+    """
+    symbols = len(re.findall(r"\d+|[^\w\s]", text))
+    return max(symbols, (len(text) + 3) // 4)
+
+def _number(value):
+    if isinstance(value, float):
+        return f"{value:.2f}".rstrip("0").rstrip(".")
+    return "" if value is None else str(value)
+
+def appliance_table(breakdown, max_tokens):
+    """
+    The breakdown as a pipe table of name, count, hours/day, watts and
+    kWh/month, biggest consumers first. Rows past the budget are folded
+    into a single "Other" row so the totals still add up.
+    """
+    def row(item):
+        watts = item.get("wattageUsed") or item.get("watts")
+        return "|".join([
+            str(item.get("name", "")).replace("|", "/"),
+            _number(item.get("count")),
+            _number(item.get("hours")),
+            _number(watts),
+            _number(item.get("monthlyUnits")),
+        ])
+
+    items = sorted(breakdown, key=lambda i: i.get("monthlyUnits") or 0, reverse=True)
+    lines = ["name|count|hours/day|watts|kWh/month"]
+    used = count_tokens(lines[0])
+    for n, item in enumerate(items):
+        line = row(item)
+        cost = count_tokens(line) + 1
+        if used + cost > max_tokens and n < len(items) - 1:
+            rest = items[n:]
+            units = sum(i.get("monthlyUnits") or 0 for i in rest)
+            lines.append(f"Other ({len(rest)} appliances)|||{_number(float(units))}")
+            break
+        lines.append(line)
+        used += cost
+    return "\n".join(lines)
+
+def bill_excerpt(text, fields, max_tokens):
+    """
+    The lines of a bill that mention `fields`, each with one line of context
+    either side, in document order. If there is budget left, the top of the
+    bill (utility name, consumer details) fills it.
+    """
+    lines = [" ".join(line.split()) for line in text.splitlines()]
+    lines = [line for line in lines if line]
+    pattern = re.compile("|".join(FIELD_KEYWORDS[f] for f in fields), re.IGNORECASE)
+
+    hits = [i for i, line in enumerate(lines) if pattern.search(line)]
+    wanted = []
+    for i in hits:
+        wanted += [i, i - 1, i + 1]
+    wanted += range(len(lines))
+
+    chosen, used = set(), 0
+    for i in wanted:
+        if i in chosen or not 0 <= i < len(lines):
+            continue
+        cost = count_tokens(lines[i]) + 1
+        if used + cost > max_tokens:
+            continue
+        chosen.add(i)
+        used += cost
+
+    out, previous = [], -1
+    for i in sorted(chosen):
+        if previous != -1 and i != previous + 1:
+            out.append("...")
+        out.append(lines[i])
+        previous = i
+    return "\n".join(out)
+
+def record(span, agent, prompt, compact, baseline):
+    """
+    Reports the prompt's estimated tokens and how many the `compact` input
+    saved over the `baseline` serialization it replaced.
+    """
+    tokens = count_tokens(prompt)
+    saved = max(0, count_tokens(baseline) - count_tokens(compact))
+    span.set(promptTokens=tokens, baselineTokens=tokens + saved, savedTokens=saved)
+    count("wattwise_prompt_tokens_total", tokens, agent=agent)
+    count("wattwise_prompt_tokens_saved_total", saved, agent=agent)
+    return tokens, saved
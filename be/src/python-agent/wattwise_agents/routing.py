@@ -0,0 +1,52 @@
+"""
+Model tiers and cascade routing.
+
+A request starts on the cheapest tier its input allows: small breakdowns and
+short bills go to the lite model, large inputs and scans to flash. It moves
+up one tier only when the answer fails schema validation or the model says
+its confidence is low. Decisions are counted in wattwise_route_requests_total
+and wattwise_route_escalations_total.
+"""
+import os
+
+# Cheapest first. Override with WATTWISE_MODEL_TIERS="lite-model,flash-model,pro-model".
+DEFAULT_TIERS = ("gemini-2.0-flash-lite", "gemini-2.0-flash", "gemini-2.5-pro")
+
+# Set WATTWISE_ROUTING=off to send every call to the agent's own model_name
+ROUTING_ENABLED = os.getenv("WATTWISE_ROUTING", "on") != "off"
+
+# Inputs above these sizes skip the lite tier
+APPLIANCE_LIMIT = int(os.getenv("WATTWISE_ROUTE_APPLIANCES", "12"))
+TEXT_LIMIT = int(os.getenv("WATTWISE_ROUTE_TEXT_CHARS", "6000"))
+
+class Router:
+    def __init__(self, tiers=DEFAULT_TIERS, enabled=ROUTING_ENABLED, appliance_limit=APPLIANCE_LIMIT,
+                 text_limit=TEXT_LIMIT):
+        self.tiers = tuple(tiers)
+        self.enabled = enabled
+        self.appliance_limit = appliance_limit
+        self.text_limit = text_limit
+
+    @classmethod
+    def from_env(cls):
+        tiers = os.getenv("WATTWISE_MODEL_TIERS")
+        return cls(tiers=[t.strip() for t in tiers.split(",") if t.strip()] if tiers else DEFAULT_TIERS)
+
+    def start(self, appliances=0, text_chars=0, vision=False):
+        """Index of the first tier to try for an input of this size and kind."""
+        large = appliances > self.appliance_limit or text_chars > self.text_limit
+        return min(1 if vision or large else 0, len(self.tiers) - 1)
+
+    def cascade(self, fallback, **complexity):
+        """Model names to try in order; just `fallback` when routing is off."""
+        if not self.enabled or not self.tiers:
+            return [fallback]
+        return list(self.tiers[self.start(**complexity):])
+
+_router = None
+
+def get_router():
+    global _router
+    if _router is None:
+        _router = Router.from_env()
+    return _router
@@ -0,0 +1,474 @@
+"""
+Common runtime for the Gemini-backed agents: shared clients, per-call
+deadlines, retries with jittered exponential backoff on transient errors,
+optional hedged requests, schema-constrained JSON output, routing across
+model tiers and, on the async path, streamed responses. Every attempt is
+admitted by the shared quota scheduler (scheduler.py) first.
+"""
+import os
+import sys
+import time
+import random
+import threading
+from collections import deque
+from contextvars import ContextVar, copy_context
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from wattwise_agents.gemini import get_model
+from wattwise_agents.metrics import count, model_call, span
+from wattwise_agents.routing import get_router
+from wattwise_agents.scheduler import current_pacer, current_priority, flight_key, get_scheduler
+from wattwise_agents.schema import SchemaError, compile_schema, repair_prompt
+from wattwise_agents.streaming import ItemStream
+
+DEFAULT_TIMEOUT = float(os.getenv("WATTWISE_MODEL_TIMEOUT", "30"))
+DEFAULT_RETRIES = int(os.getenv("WATTWISE_MODEL_RETRIES", "2"))
+# Hedging sends a second copy of a slow call, trading quota for tail latency
+HEDGE_ENABLED = os.getenv("WATTWISE_HEDGE", "off") == "on"
+HEDGE_MIN_SAMPLES = int(os.getenv("WATTWISE_HEDGE_MIN_SAMPLES", "20"))
+# Ask Gemini for JSON matching the agent's schema instead of only saying so in the prompt
+STRUCTURED_OUTPUT = os.getenv("WATTWISE_STRUCTURED_OUTPUT", "on") != "off"
+
+# HTTP / gRPC codes worth another attempt: quota, overload, upstream timeouts
+TRANSIENT_CODES = {408, 429, 500, 502, 503, 504}
+TRANSIENT_ERRORS = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+    "DeadlineExceeded", "GatewayTimeout", "Aborted", "Unknown",
+    "TimeoutError", "ConnectionError", "ConnectionResetError",
+}
+
+# The tier whose answer generate_routed last returned in this context
+_answered_by = ContextVar("wattwise_answered_by", default=None)
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+def answered_by(fn, *args):
+    """
+    Runs fn(*args) and returns its result with the model whose generate_routed
+    answer it was built on (None when no model answered, e.g. rules only).
+    """
+    context = copy_context()
+    context.run(_answered_by.set, None)
+    result = context.run(fn, *args)
+    return result, context.get(_answered_by)
+
+def is_transient(error):
+    """True for quota, overload and timeout errors that a retry may get past."""
+    if any(cls.__name__ in TRANSIENT_ERRORS for cls in type(error).__mro__):
+        return True
+    code = getattr(error, "code", None)
+    code = getattr(code, "value", code)  # gRPC status enums
+    if isinstance(code, int) and code in TRANSIENT_CODES:
+        return True
+    message = str(error)
+    return message[:3].isdigit() and int(message[:3]) in TRANSIENT_CODES
+
+def json_config(schema):
+    """generation_config constraining the response to JSON for `schema`."""
+    if not STRUCTURED_OUTPUT:
+        return None
+    return {"response_mime_type": "application/json", "response_schema": schema}
+
+class LatencyTracker:
+    """Recent successful call latencies for one model, used to time hedges."""
+
+    def __init__(self, size=200):
+        self.samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def p95(self, min_samples=HEDGE_MIN_SAMPLES):
+        with self._lock:
+            if len(self.samples) < min_samples:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+_trackers = {}
+_trackers_lock = threading.Lock()
+
+def latency_tracker(model_name):
+    with _trackers_lock:
+        return _trackers.setdefault(model_name, LatencyTracker())
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def hedge_executor():
+    """Threads for synchronous hedged calls, created on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=int(os.getenv("WATTWISE_HEDGE_THREADS", "16")))
+        return _executor
+
+class CallPolicy:
+    """
+    How one agent calls its model. `timeout` is the deadline for the whole
+    call, retries and backoff included; `hedge_after` fixes the hedge delay
+    instead of using the model's recent p95.
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, backoff=0.5, max_backoff=8.0,
+                 hedge=HEDGE_ENABLED, hedge_after=None):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge = hedge
+        self.hedge_after = hedge_after
+
+    def delay(self, attempt):
+        """Full-jitter exponential backoff before retry number `attempt` (1-based)."""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+class GeminiAgent:
+    """
+    Base class for the agents. Subclasses set `name` (used for spans and
+    metrics), `model_name`, `policy` and `priority` (the scheduler class their
+    calls queue in unless scheduler.priority() says otherwise), and call
+    generate() / generate_structured() / generate_routed() or their async
+    variants instead of the SDK.
+    """
+
+    name = "agent"
+    model_name = "gemini-2.0-flash"
+    policy = CallPolicy()
+    priority = "default"
+
+    def __init__(self, use_model=True, require_model=True):
+        self.api_key = os.getenv("GEMINI_API_KEY")
+        self.model = None
+        if use_model and self.api_key:
+            self.model = get_model(self.model_name, self.api_key)
+        elif require_model:
+            raise ValueError("GEMINI_API_KEY not found")
+        self.models = {self.model_name: self.model}
+        self.router = get_router()
+        self.scheduler = get_scheduler()
+
+    def model_for(self, name):
+        """The shared client for another tier; the agent's own model for its model_name."""
+        if name not in self.models:
+            self.models[name] = get_model(name, self.api_key)
+        return self.models[name]
+
+    def hedge_delay(self, remaining, model):
+        if not self.policy.hedge:
+            return None
+        delay = self.policy.hedge_after or latency_tracker(model.name).p95()
+        return delay if delay is not None and delay < remaining else None
+
+    # -- synchronous path --------------------------------------------------
+
+    def _attempt(self, model, contents, remaining, options):
+        """One model call, hedged with a second copy if it outlives the hedge delay."""
+        call_deadline = time.monotonic() + remaining
+        level = current_priority(self.priority)
+        pacer = current_pacer()
+
+        def call():
+            if pacer is not None:
+                pacer.wait()
+            charged = self.scheduler.acquire(model.name, contents, level, call_deadline - time.monotonic())
+            started = time.perf_counter()
+            response = model.generate_content(
+                contents, request_options={"timeout": call_deadline - time.monotonic()}, **options
+            )
+            latency_tracker(model.name).record(time.perf_counter() - started)
+            self.scheduler.settle(model.name, charged, response)
+            return response
+
+        hedge_after = self.hedge_delay(remaining, model)
+        if hedge_after is None:
+            return call()
+
+        deadline = time.monotonic() + remaining
+        pool = hedge_executor()
+        pending = {pool.submit(call)}
+        done, pending = wait(pending, timeout=hedge_after)
+        if not done:
+            count("wattwise_model_hedges_total", agent=self.name)
+            pending.add(pool.submit(call))
+        error = None
+        while pending or done:
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+            if not pending:
+                break
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                raise DeadlineExceeded(f"{self.name} model call exceeded its deadline")
+        raise error
+
+    def generate(self, contents, timeout=None, generation_config=None, model=None):
+        """
+        Calls the model (the agent's own unless `model` is given) within the
+        policy's deadline, retrying transient errors with jittered
+        exponential backoff. Returns the SDK response; identical calls
+        already in flight share theirs.
+        """
+        model = model or self.model
+        options = {"generation_config": generation_config} if generation_config else {}
+        return self.scheduler.shared(
+            flight_key(model.name, contents, options), lambda: self._generate(model, contents, timeout, options)
+        )
+
+    def _generate(self, model, contents, timeout, options):
+        deadline = time.monotonic() + (timeout or self.policy.timeout)
+        attempt, response = 0, None
+        try:
+            with span(f"{self.name}.model") as s:
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise DeadlineExceeded(f"{self.name} model call exceeded its deadline")
+                    try:
+                        response = self._attempt(model, contents, remaining, options)
+                        s.set(attempts=attempt + 1)
+                        return response
+                    except Exception as e:
+                        attempt += 1
+                        if attempt > self.policy.retries or not is_transient(e):
+                            raise
+                        pause = self.policy.delay(attempt)
+                        if time.monotonic() + pause >= deadline:
+                            raise
+                        time.sleep(pause)
+        finally:
+            model_call(self.name, contents, response, retries=attempt if response is not None else max(0, attempt - 1))
+
+    def _decode(self, decoder, text):
+        with span(f"{self.name}.parse"):
+            value, repaired = decoder.decode(text)
+        if repaired:
+            count("wattwise_json_repairs_total", agent=self.name, kind="local")
+        return value
+
+    def generate_structured(self, contents, decoder, timeout=None, model=None):
+        """
+        Asks for JSON matching decoder.schema and returns the decoded value.
+        Output that is still invalid after local repair gets one short
+        repair call, within what is left of the deadline, instead of a rerun
+        of the full prompt.
+        """
+        deadline = time.monotonic() + (timeout or self.policy.timeout)
+        config = json_config(decoder.schema)
+        text = self.generate(contents, timeout, config, model).text
+        try:
+            return self._decode(decoder, text)
+        except SchemaError as e:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise
+            count("wattwise_json_repairs_total", agent=self.name, kind="model")
+            fixed = self.generate(repair_prompt(text, decoder.schema, e.errors), remaining, config, model)
+            return self._decode(decoder, fixed.text)
+
+    def _escalate(self, tier, reason):
+        count("wattwise_route_escalations_total", agent=self.name, tier=tier, reason=reason)
+        print(f"[{self.name}] {tier} gave {reason.replace('_', ' ')} output, escalating", file=sys.stderr)
+
+    def generate_routed(self, contents, decoder, accept=None, timeout=None, **complexity):
+        """
+        generate_structured on the cheapest tier the input's `complexity`
+        (appliances, text_chars, vision) allows, moving up a tier while the
+        output fails validation or `accept(value)` is false. The last tier's
+        answer is returned even if not accepted. One deadline covers them all.
+        """
+        deadline = time.monotonic() + (timeout or self.policy.timeout)
+        tiers = self.router.cascade(self.model_name, **complexity)
+        count("wattwise_route_requests_total", agent=self.name, tier=tiers[0])
+        for i, tier in enumerate(tiers):
+            last = i == len(tiers) - 1 or deadline - time.monotonic() <= 0
+            try:
+                value = self.generate_structured(contents, decoder, deadline - time.monotonic(), self.model_for(tier))
+            except SchemaError:
+                if last:
+                    raise
+                self._escalate(tier, "invalid")
+                continue
+            if last or accept is None or accept(value):
+                _answered_by.set(tier)
+                return value
+            self._escalate(tier, "low_confidence")
+
+    def generate_text(self, contents, timeout=None):
+        response = self.generate(contents, timeout)
+        with span(f"{self.name}.parse"):
+            return response.text.strip()
+
+    # -- asynchronous path -------------------------------------------------
+
+    async def _attempt_async(self, model, contents, remaining, options):
+        import asyncio
+
+        level = current_priority(self.priority)
+        pacer = current_pacer()
+
+        async def call():
+            if pacer is not None:
+                await asyncio.to_thread(pacer.wait)
+            charged = await self.scheduler.acquire_async(model.name, contents, level, remaining)
+            started = time.perf_counter()
+            response = await model.generate_content_async(contents, **options)
+            latency_tracker(model.name).record(time.perf_counter() - started)
+            self.scheduler.settle(model.name, charged, response)
+            return response
+
+        first = asyncio.ensure_future(call())
+        hedge_after = self.hedge_delay(remaining, model)
+        if hedge_after is None:
+            return await asyncio.wait_for(first, remaining)
+
+        deadline = time.monotonic() + remaining
+        done, pending = await asyncio.wait({first}, timeout=hedge_after)
+        if not done:
+            count("wattwise_model_hedges_total", agent=self.name)
+            pending.add(asyncio.ensure_future(call()))
+        error = None
+        try:
+            while pending or done:
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, deadline - time.monotonic()), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise DeadlineExceeded(f"{self.name} model call exceeded its deadline")
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def generate_async(self, contents, timeout=None, generation_config=None, model=None, stream=False):
+        """
+        Same as generate, without blocking the event loop. With `stream` the
+        SDK's streamed response is returned once its first chunk is due;
+        only opening it is retried, and it is never shared.
+        """
+        model = model or self.model
+        options = {"generation_config": generation_config} if generation_config else {}
+        if stream:
+            return await self._generate_async(model, contents, timeout, {**options, "stream": True})
+        return await self.scheduler.shared_async(
+            flight_key(model.name, contents, options), lambda: self._generate_async(model, contents, timeout, options)
+        )
+
+    async def _generate_async(self, model, contents, timeout, options):
+        import asyncio
+
+        deadline = time.monotonic() + (timeout or self.policy.timeout)
+        attempt, response = 0, None
+        try:
+            with span(f"{self.name}.model") as s:
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise DeadlineExceeded(f"{self.name} model call exceeded its deadline")
+                    try:
+                        response = await self._attempt_async(model, contents, remaining, options)
+                        s.set(attempts=attempt + 1)
+                        return response
+                    except Exception as e:
+                        if isinstance(e, asyncio.TimeoutError) and not isinstance(e, DeadlineExceeded):
+                            e = DeadlineExceeded(f"{self.name} model call exceeded its deadline")
+                        attempt += 1
+                        if attempt > self.policy.retries or not is_transient(e):
+                            raise e
+                        pause = self.policy.delay(attempt)
+                        if time.monotonic() + pause >= deadline:
+                            raise e
+                        await asyncio.sleep(pause)
+        finally:
+            model_call(self.name, contents, response, retries=attempt if response is not None else max(0, attempt - 1))
+
+    async def _read_stream(self, response, decoder, on_item, key, deadline):
+        """
+        Reads a streamed response to the end within the deadline, passing each
+        element of the array `key` that matches its schema to on_item as soon
+        as it is complete. Returns the whole text.
+        """
+        import asyncio
+
+        items = ItemStream(key)
+        validate = compile_schema(decoder.schema["properties"][key]["items"])
+        chunks = []
+
+        async def read():
+            async for chunk in response:
+                chunks.append(chunk.text)
+                for item in items.feed(chunk.text):
+                    if not validate(item):
+                        on_item(item)
+
+        try:
+            await asyncio.wait_for(read(), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f"{self.name} model call exceeded its deadline")
+        return "".join(chunks)
+
+    async def generate_structured_async(self, contents, decoder, timeout=None, model=None, on_item=None,
+                                        key="suggestions"):
+        """
+        Same as generate_structured, without blocking the event loop. With
+        `on_item` the response is streamed and each finished element of the
+        array `key` is passed to it before the rest arrives; elements seen
+        before a repair are not passed again.
+        """
+        deadline = time.monotonic() + (timeout or self.policy.timeout)
+        config = json_config(decoder.schema)
+        if on_item is None:
+            text = (await self.generate_async(contents, timeout, config, model)).text
+        else:
+            response = await self.generate_async(contents, timeout, config, model, stream=True)
+            text = await self._read_stream(response, decoder, on_item, key, deadline)
+        try:
+            return self._decode(decoder, text)
+        except SchemaError as e:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise
+            count("wattwise_json_repairs_total", agent=self.name, kind="model")
+            fixed = await self.generate_async(repair_prompt(text, decoder.schema, e.errors), remaining, config, model)
+            return self._decode(decoder, fixed.text)
+
+    async def generate_routed_async(self, contents, decoder, accept=None, timeout=None, on_item=None, **complexity):
+        """
+        Same as generate_routed, without blocking the event loop. `on_item`
+        streams each tier's answer as in generate_structured_async, so an
+        escalation can pass an element again.
+        """
+        deadline = time.monotonic() + (timeout or self.policy.timeout)
+        tiers = self.router.cascade(self.model_name, **complexity)
+        count("wattwise_route_requests_total", agent=self.name, tier=tiers[0])
+        for i, tier in enumerate(tiers):
+            last = i == len(tiers) - 1 or deadline - time.monotonic() <= 0
+            try:
+                value = await self.generate_structured_async(
+                    contents, decoder, deadline - time.monotonic(), self.model_for(tier), on_item
+                )
+            except SchemaError:
+                if last:
+                    raise
+                self._escalate(tier, "invalid")
+                continue
+            if last or accept is None or accept(value):
+                _answered_by.set(tier)
+                return value
+            self._escalate(tier, "low_confidence")
+
+    async def generate_text_async(self, contents, timeout=None):
+        response = await self.generate_async(contents, timeout)
+        with span(f"{self.name}.parse"):
+            return response.text.strip()
@@ -0,0 +1,181 @@
+"""
+Deterministic savings suggestions for the appliances in the app's preset
+catalogue (be/src/data/presets.ts). Each appliance kind has a few rules
+picked by daily hours and rated watts; appliances the index does not know
+are left for the model.
+"""
+import re
+
+# Suggestions per request, like the model is asked for
+TOP_APPLIANCES = 4
+REDUCTION_RANGE = (0.05, 0.30)
+
+# Preset names and common aliases, normalized -> appliance kind
+ALIASES = {
+    "ceiling fan": "fan", "table fan": "fan", "fan": "fan", "pedestal fan": "fan", "exhaust fan": "fan",
+    "ac 1 0 ton": "ac", "ac 1 5 ton": "ac", "ac 2 0 ton": "ac", "ac": "ac", "air conditioner": "ac",
+    "split ac": "ac", "window ac": "ac", "inverter ac": "ac",
+    "cooler": "cooler", "air cooler": "cooler", "desert cooler": "cooler",
+    "led bulb": "led", "led": "led", "bulb": "bulb", "incandescent bulb": "bulb",
+    "tube light led": "led", "led tube light": "led", "tube light old": "tube", "tube light": "tube",
+    "cfl": "cfl",
+    "refrigerator single door": "fridge", "refrigerator double door": "fridge", "refrigerator": "fridge",
+    "fridge": "fridge",
+    "microwave": "microwave", "microwave oven": "microwave", "oven": "microwave",
+    "induction cooktop": "induction", "induction": "induction", "induction stove": "induction",
+    "electric kettle": "kettle", "kettle": "kettle", "toaster": "toaster",
+    "mixer grinder": "mixer", "mixer": "mixer", "dishwasher": "dishwasher",
+    "washing machine": "washer", "electric iron": "iron", "iron": "iron",
+    "tv led 32 43": "tv", "tv led 50": "tv", "tv": "tv", "television": "tv", "led tv": "tv",
+    "desktop computer": "desktop", "desktop": "desktop", "computer": "desktop", "pc": "desktop",
+    "laptop": "laptop", "gaming console": "console",
+    "geyser instant": "instant_geyser", "instant geyser": "instant_geyser",
+    "geyser storage": "geyser", "geyser": "geyser", "water heater": "geyser",
+    "room heater": "heater", "heater": "heater", "water pump": "pump", "motor": "pump",
+}
+
+# kind -> rules as (minimum hours/day, minimum watts, reduction, strategy); the
+# first rule the appliance meets applies. {pct} is filled with the reduction.
+RULES = {
+    "ac": (
+        (8, 0, 0.25, "Set the AC to 24°C and use the sleep timer at night to save about {pct}%"),
+        (0, 0, 0.15, "Keep the AC at 24-26°C and clean its filters monthly to save about {pct}%"),
+    ),
+    "fan": (
+        (12, 70, 0.30, "Replace it with a BLDC fan (about 30W) to save about {pct}%"),
+        (0, 0, 0.10, "Switch fans off in empty rooms to save about {pct}%"),
+    ),
+    "cooler": (
+        (0, 0, 0.10, "Keep the cooler pads wet and run it on low speed at night to save about {pct}%"),
+    ),
+    "bulb": (
+        (0, 20, 0.30, "Replace it with a 9W LED bulb to save about {pct}%"),
+        (0, 0, 0.10, "Use daylight and switch lights off when leaving a room to save about {pct}%"),
+    ),
+    "tube": (
+        (0, 30, 0.30, "Replace the old tube light with a 20W LED batten to save about {pct}%"),
+        (0, 0, 0.10, "Switch lights off when leaving a room to save about {pct}%"),
+    ),
+    "cfl": (
+        (0, 0, 0.30, "Replace the CFL with an LED of the same brightness to save about {pct}%"),
+    ),
+    "led": (
+        (0, 0, 0.05, "Switch lights off when leaving a room to save about {pct}%"),
+    ),
+    "fridge": (
+        (0, 200, 0.10, "Keep the door closed, the coils clean and the thermostat at medium to save about {pct}%"),
+        (0, 0, 0.05, "Leave space behind the fridge for ventilation to save about {pct}%"),
+    ),
+    "microwave": (
+        (0, 0, 0.05, "Reheat small portions in the microwave instead of the stove, not both, to save about {pct}%"),
+    ),
+    "induction": (
+        (2, 0, 0.15, "Use flat-bottomed pans and lids to cut cooking time by about {pct}%"),
+        (0, 0, 0.10, "Cover pans while cooking to save about {pct}%"),
+    ),
+    "kettle": (
+        (0, 0, 0.20, "Boil only the water you need to save about {pct}%"),
+    ),
+    "toaster": (
+        (0, 0, 0.05, "Toast in full batches to save about {pct}%"),
+    ),
+    "mixer": (
+        (0, 0, 0.05, "Run the mixer in short bursts at the lowest speed that works to save about {pct}%"),
+    ),
+    "dishwasher": (
+        (0, 0, 0.15, "Run the dishwasher only when full and use the eco cycle to save about {pct}%"),
+    ),
+    "washer": (
+        (1, 0, 0.20, "Wash full loads in cold water to save about {pct}%"),
+        (0, 0, 0.10, "Use the quick or eco cycle for lightly soiled clothes to save about {pct}%"),
+    ),
+    "iron": (
+        (0, 0, 0.15, "Iron clothes in one batch and switch off a few minutes early to save about {pct}%"),
+    ),
+    "tv": (
+        (6, 0, 0.15, "Lower the backlight and switch off at the plug instead of standby to save about {pct}%"),
+        (0, 0, 0.10, "Switch off at the plug instead of leaving it on standby to save about {pct}%"),
+    ),
+    "desktop": (
+        (6, 0, 0.20, "Enable sleep after 10 idle minutes and turn the monitor off when away to save about {pct}%"),
+        (0, 0, 0.10, "Enable power-saving mode to save about {pct}%"),
+    ),
+    "laptop": (
+        (0, 0, 0.05, "Unplug the charger once the battery is full to save about {pct}%"),
+    ),
+    "console": (
+        (0, 0, 0.15, "Turn off instant-on standby mode to save about {pct}%"),
+    ),
+    "instant_geyser": (
+        (0, 0, 0.15, "Keep showers short and switch the geyser off right after use to save about {pct}%"),
+    ),
+    "geyser": (
+        (1, 0, 0.25, "Set the geyser thermostat to 50°C and use a timer to heat water once a day to save about {pct}%"),
+        (0, 0, 0.15, "Switch the geyser off once the water is hot to save about {pct}%"),
+    ),
+    "heater": (
+        (4, 0, 0.25, "Use the thermostat and heat one closed room only to save about {pct}%"),
+        (0, 0, 0.15, "Switch the heater off once the room is warm to save about {pct}%"),
+    ),
+    "pump": (
+        (1, 0, 0.20, "Fit an automatic tank level controller so the pump stops when the tank is full to save about {pct}%"),
+        (0, 0, 0.10, "Fix leaks so the pump runs less to save about {pct}%"),
+    ),
+}
+
+def normalize_name(name):
+    return " ".join(re.findall(r"[a-z0-9]+", (name or "").lower()))
+
+def cost(item):
+    """What ranks an appliance: its estimated cost, or its units when there is no cost."""
+    return float(item.get('estimatedCost') or item.get('monthlyUnits') or 0)
+
+class SavingsRules:
+    """
+    Savings suggestions from a precomputed name index. Names are matched
+    whole first, then by their longest known phrase ("Bedroom Split AC" ->
+    "split ac").
+    """
+
+    def __init__(self, aliases=None, rules=None):
+        self.rules = rules or RULES
+        self.index = {normalize_name(k): v for k, v in (aliases or ALIASES).items()}
+        # Longest phrases first so "tube light old" wins over "tube light"
+        self._phrases = sorted(self.index, key=len, reverse=True)
+        self._kinds = {}
+
+    def kind(self, name):
+        """The appliance kind for a name, or None if the index does not know it."""
+        key = normalize_name(name)
+        if key not in self._kinds:
+            kind = self.index.get(key)
+            if kind is None:
+                padded = f" {key} "
+                kind = next((self.index[p] for p in self._phrases if f" {p} " in padded), None)
+            self._kinds[key] = kind
+        return self._kinds[key]
+
+    def suggest(self, item):
+        """A suggestion for one breakdown line, or None for an unknown appliance."""
+        kind = self.kind(item.get('name'))
+        if kind is None:
+            return None
+        hours = float(item.get('hours') or 0)
+        watts = float(item.get('watts') or item.get('wattageUsed') or 0)
+        for min_hours, min_watts, reduction, strategy in self.rules[kind]:
+            if hours >= min_hours and watts >= min_watts:
+                reduction = min(max(reduction, REDUCTION_RANGE[0]), REDUCTION_RANGE[1])
+                return {
+                    "name": item.get('name'),
+                    "reductionPercentage": reduction,
+                    "strategy": strategy.format(pct=round(reduction * 100)),
+                }
+        return None
+
+    def recommend(self, breakdown, top=TOP_APPLIANCES):
+        """
+        Ranks the breakdown by cost and returns (item, suggestion) for the top
+        appliances, suggestion None where the model has to be asked.
+        """
+        ranked = sorted(breakdown, key=cost, reverse=True)[:top]
+        return [(item, self.suggest(item)) for item in ranked]
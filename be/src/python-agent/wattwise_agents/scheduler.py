@@ -0,0 +1,410 @@
+"""
+Admission control for model calls, shared by every agent in the process.
+
+Each model has token buckets for requests and tokens per minute. A call that
+finds them empty waits in that model's queue, ordered by priority class then
+arrival; when the queue is full the lowest-priority waiter is shed (or the
+newcomer, if nothing queued ranks below it) with an Overloaded error rather
+than letting a burst drain the quota for everyone. Identical prompts already
+in flight share one call.
+
+Settings:
+    WATTWISE_SCHEDULER      "off" sends every call straight to the model
+    WATTWISE_QUOTA_RPM      requests per minute per model (default 1000)
+    WATTWISE_QUOTA_TPM      tokens per minute per model (default 1000000)
+    WATTWISE_MODEL_QUOTAS   per-model overrides, '{"gemini-2.5-pro": {"rpm": 150, "tpm": 2000000}}'
+    WATTWISE_QUEUE_LIMIT    waiting calls per model before shedding (default 64)
+    WATTWISE_SINGLE_FLIGHT  "off" sends identical concurrent prompts separately
+
+Queue depth is exported as the wattwise_scheduler_queue_depth gauge, time
+spent queued as the scheduler.wait span, and outcomes as
+wattwise_scheduler_requests_total; stats() has the same for the worker.
+"""
+import os
+import json
+import time
+import bisect
+import hashlib
+import itertools
+import threading
+import contextlib
+import contextvars
+from concurrent.futures import Future
+
+from wattwise_agents.metrics import count, gauge, span
+from wattwise_agents.prompts import count_tokens
+
+ENABLED = os.getenv("WATTWISE_SCHEDULER", "on") != "off"
+DEFAULT_RPM = float(os.getenv("WATTWISE_QUOTA_RPM", "1000"))
+DEFAULT_TPM = float(os.getenv("WATTWISE_QUOTA_TPM", "1000000"))
+QUEUE_LIMIT = int(os.getenv("WATTWISE_QUEUE_LIMIT", "64"))
+SINGLE_FLIGHT = os.getenv("WATTWISE_SINGLE_FLIGHT", "on") != "off"
+
+# Lower runs first: a user waiting on an upload beats an analysis beats batch work
+PRIORITIES = {"interactive": 0, "default": 1, "background": 2}
+
+# Gemini bills an image or a PDF page at about this many tokens; the answer
+# is budgeted up front and corrected from usage_metadata afterwards
+DATA_PART_TOKENS = 258
+RESPONSE_TOKENS = 256
+
+# How long a queued call sleeps between checks at most
+POLL_SECONDS = 0.05
+
+class Overloaded(RuntimeError):
+    """The model's queue is full, or the call could not be admitted before its deadline."""
+
+_priority = contextvars.ContextVar("wattwise_priority", default=None)
+
+@contextlib.contextmanager
+def priority(name):
+    """Runs model calls made inside the block at priority `name`, whatever the agent's default."""
+    if name not in PRIORITIES:
+        raise ValueError(f"Unknown priority: {name}")
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def current_priority(default="default"):
+    return _priority.get() or default
+
+_pacer = contextvars.ContextVar("wattwise_pacer", default=None)
+
+@contextlib.contextmanager
+def paced(pacer):
+    """
+    Waits on `pacer` (anything with a blocking wait(), e.g. batch.RateLimiter)
+    before each model call made inside the block. Work that needs no model
+    call is not held back.
+    """
+    token = _pacer.set(pacer)
+    try:
+        yield
+    finally:
+        _pacer.reset(token)
+
+def current_pacer():
+    return _pacer.get()
+
+def estimate_tokens(contents):
+    """Tokens a call will use: its text, its inline data parts and a response allowance."""
+    if isinstance(contents, str):
+        return count_tokens(contents) + RESPONSE_TOKENS
+    text = sum(count_tokens(part) for part in contents if isinstance(part, str))
+    data = sum(DATA_PART_TOKENS for part in contents if isinstance(part, dict))
+    return text + data + RESPONSE_TOKENS
+
+def flight_key(model_name, contents, options):
+    digest = hashlib.sha256(model_name.encode("utf-8"))
+    for part in [contents] if isinstance(contents, str) else contents:
+        if isinstance(part, dict):
+            digest.update(part.get("mime_type", "").encode("utf-8"))
+            digest.update(part.get("data") or b"")
+        else:
+            digest.update(str(part).encode("utf-8"))
+    digest.update(json.dumps(options, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+class TokenBucket:
+    """Refills continuously at `per_minute`, holding at most a minute's worth."""
+
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until `amount` is available (a request bigger than the bucket waits for a full one)."""
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate) if self.rate else float("inf")
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+class Waiter:
+    __slots__ = ("rank", "seq", "priority", "shed")
+
+    def __init__(self, priority, seq):
+        self.rank = PRIORITIES[priority]
+        self.seq = seq
+        self.priority = priority
+        self.shed = False
+
+    def __lt__(self, other):
+        return (self.rank, self.seq) < (other.rank, other.seq)
+
+class ModelQueue:
+    """The buckets and waiting calls of one model."""
+
+    def __init__(self, name, rpm, tpm, limit):
+        self.name = name
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.limit = limit
+        self.waiting = []  # sorted, next to run first
+        self.stats = {"admitted": 0, "shed": 0, "timedOut": 0, "waitSeconds": 0.0, "maxWaitSeconds": 0.0}
+
+    def wait_time(self, tokens, now):
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        return max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+
+    def take(self, tokens):
+        self.requests.take(1)
+        self.tokens.take(tokens)
+
+    def depth(self):
+        depth = dict.fromkeys(PRIORITIES, 0)
+        for waiter in self.waiting:
+            depth[waiter.priority] += 1
+        return depth
+
+class Scheduler:
+    def __init__(self, enabled=ENABLED, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM, quotas=None, queue_limit=QUEUE_LIMIT,
+                 single_flight=SINGLE_FLIGHT):
+        self.enabled = enabled
+        self.rpm = rpm
+        self.tpm = tpm
+        self.quotas = quotas or {}
+        self.queue_limit = queue_limit
+        self.single_flight = single_flight
+        self.queues = {}
+        self.flights = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(quotas=json.loads(os.getenv("WATTWISE_MODEL_QUOTAS", "{}")))
+
+    def queue(self, model_name):
+        queue = self.queues.get(model_name)
+        if queue is None:
+            quota = self.quotas.get(model_name, {})
+            with self._lock:
+                queue = self.queues.setdefault(model_name, ModelQueue(
+                    model_name, quota.get("rpm", self.rpm), quota.get("tpm", self.tpm), self.queue_limit
+                ))
+        return queue
+
+    def _report_depth(self, queue):
+        for name, depth in queue.depth().items():
+            gauge("wattwise_scheduler_queue_depth", depth, model=queue.name, priority=name)
+
+    def _enqueue(self, queue, priority_name):
+        """Adds a waiter, shedding the lowest-priority one if the queue is full. Call with the lock held."""
+        waiter = Waiter(priority_name, next(self._seq))
+        if len(queue.waiting) >= queue.limit:
+            lowest = queue.waiting[-1]
+            if not waiter < lowest:
+                return None
+            lowest.shed = True
+            queue.waiting.pop()
+        bisect.insort(queue.waiting, waiter)
+        return waiter
+
+    def _try(self, queue, waiter, tokens):
+        """Admits the waiter if it is first in line and the buckets allow; else seconds to sleep."""
+        with self._lock:
+            if waiter.shed:
+                raise Overloaded(f"{queue.name} queue is full")
+            pause = queue.wait_time(tokens, time.monotonic())
+            if queue.waiting[0] is waiter and pause == 0:
+                queue.take(tokens)
+                queue.waiting.pop(0)
+                return None
+            return min(max(pause, 0.001), POLL_SECONDS)
+
+    def _admit(self, queue, priority_name, tokens):
+        """Admits at once if nothing is queued and the buckets allow; else returns a waiter."""
+        with self._lock:
+            if not queue.waiting and queue.wait_time(tokens, time.monotonic()) == 0:
+                queue.take(tokens)
+                return None
+            waiter = self._enqueue(queue, priority_name)
+        if waiter is None:
+            self._done(queue, priority_name, "shed")
+            raise Overloaded(f"{queue.name} queue is full")
+        self._report_depth(queue)
+        return waiter
+
+    def _leave(self, queue, waiter):
+        with self._lock:
+            if waiter in queue.waiting:
+                queue.waiting.remove(waiter)
+
+    def _done(self, queue, priority_name, outcome, waited=0.0):
+        with self._lock:
+            key = {"admitted": "admitted", "shed": "shed", "timeout": "timedOut"}[outcome]
+            queue.stats[key] += 1
+            queue.stats["waitSeconds"] += waited
+            queue.stats["maxWaitSeconds"] = max(queue.stats["maxWaitSeconds"], waited)
+        count("wattwise_scheduler_requests_total", model=queue.name, priority=priority_name, outcome=outcome)
+
+    def acquire(self, model_name, contents, priority_name="default", timeout=None):
+        """
+        Blocks until a call to `model_name` may start and returns the tokens
+        charged for it. Raises Overloaded when shed or after `timeout` seconds.
+        """
+        tokens = estimate_tokens(contents)
+        if not self.enabled:
+            return tokens
+        queue = self.queue(model_name)
+        waiter = self._admit(queue, priority_name, tokens)
+        if waiter is None:
+            self._done(queue, priority_name, "admitted")
+            return tokens
+
+        started = time.monotonic()
+        with span("scheduler.wait", model=model_name, priority=priority_name):
+            try:
+                while True:
+                    pause = self._try(queue, waiter, tokens)
+                    if pause is None:
+                        break
+                    if timeout is not None and time.monotonic() - started + pause > timeout:
+                        self._done(queue, priority_name, "timeout", time.monotonic() - started)
+                        raise Overloaded(f"{model_name} quota did not admit the call within {timeout:g}s")
+                    time.sleep(pause)
+            except BaseException:
+                self._leave(queue, waiter)
+                if waiter.shed:
+                    self._done(queue, priority_name, "shed", time.monotonic() - started)
+                raise
+            finally:
+                self._report_depth(queue)
+        self._done(queue, priority_name, "admitted", time.monotonic() - started)
+        return tokens
+
+    async def acquire_async(self, model_name, contents, priority_name="default", timeout=None):
+        """Same as acquire, sleeping on the event loop instead of the thread."""
+        import asyncio
+
+        tokens = estimate_tokens(contents)
+        if not self.enabled:
+            return tokens
+        queue = self.queue(model_name)
+        waiter = self._admit(queue, priority_name, tokens)
+        if waiter is None:
+            self._done(queue, priority_name, "admitted")
+            return tokens
+
+        started = time.monotonic()
+        with span("scheduler.wait", model=model_name, priority=priority_name):
+            try:
+                while True:
+                    pause = self._try(queue, waiter, tokens)
+                    if pause is None:
+                        break
+                    if timeout is not None and time.monotonic() - started + pause > timeout:
+                        self._done(queue, priority_name, "timeout", time.monotonic() - started)
+                        raise Overloaded(f"{model_name} quota did not admit the call within {timeout:g}s")
+                    await asyncio.sleep(pause)
+            except BaseException:
+                self._leave(queue, waiter)
+                if waiter.shed:
+                    self._done(queue, priority_name, "shed", time.monotonic() - started)
+                raise
+            finally:
+                self._report_depth(queue)
+        self._done(queue, priority_name, "admitted", time.monotonic() - started)
+        return tokens
+
+    def settle(self, model_name, charged, response):
+        """Corrects the token bucket with what the call actually used, when the SDK reports it."""
+        if not self.enabled:
+            return
+        try:
+            usage = response.usage_metadata
+            used = (usage.prompt_token_count or 0) + (usage.candidates_token_count or 0)
+        except Exception:  # not reported, or a stream not read yet
+            return
+        if not used:
+            return
+        queue = self.queue(model_name)
+        with self._lock:
+            queue.tokens.level = min(queue.tokens.capacity, queue.tokens.level + charged - used)
+
+    def _join(self, key):
+        """(future, leader): the in-flight call for `key`, or a new one this caller must run."""
+        with self._lock:
+            future = self.flights.get(key)
+            if future is not None:
+                return future, False
+            future = self.flights[key] = Future()
+            return future, True
+
+    def _land(self, key, future, result=None, error=None):
+        with self._lock:
+            self.flights.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def shared(self, key, call):
+        """call(), unless an identical call is in flight; then that call's result."""
+        if not self.single_flight:
+            return call()
+        future, leader = self._join(key)
+        if not leader:
+            count("wattwise_single_flight_total", outcome="shared")
+            return future.result()
+        try:
+            result = call()
+        except BaseException as e:
+            self._land(key, future, error=e)
+            raise
+        self._land(key, future, result)
+        return result
+
+    async def shared_async(self, key, call):
+        """Same as shared for a coroutine function; works across threads and event loops."""
+        import asyncio
+
+        if not self.single_flight:
+            return await call()
+        future, leader = self._join(key)
+        if not leader:
+            count("wattwise_single_flight_total", outcome="shared")
+            return await asyncio.wrap_future(future)
+        try:
+            result = await call()
+        except BaseException as e:
+            self._land(key, future, error=e)
+            raise
+        self._land(key, future, result)
+        return result
+
+    def stats(self):
+        """Per model: queue depth by priority, bucket levels and admission counts."""
+        with self._lock:
+            now = time.monotonic()
+            report = {}
+            for name, queue in self.queues.items():
+                queue.requests.refill(now)
+                queue.tokens.refill(now)
+                report[name] = {
+                    "queueDepth": queue.depth(),
+                    "requestsAvailable": round(queue.requests.level, 1),
+                    "tokensAvailable": round(queue.tokens.level),
+                    **{k: round(v, 3) if isinstance(v, float) else v for k, v in queue.stats.items()},
+                }
+            return {"enabled": self.enabled, "inFlight": len(self.flights), "models": report}
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler.from_env()
+        return _scheduler
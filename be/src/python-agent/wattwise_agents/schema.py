@@ -0,0 +1,254 @@
+"""
+Output schemas for the JSON-producing agents, precompiled validators and a
+decoder that repairs nearly-valid model output locally before anyone pays
+for another round-trip.
+
+Schemas use the OpenAPI subset Gemini accepts as `response_schema`
+(type, properties, required, items, enum, nullable).
+"""
+import re
+import json
+
+try:
+    import orjson
+except ImportError:  # Optional: a faster drop-in for json.loads
+    orjson = None
+
+class SchemaError(ValueError):
+    """Model output that is not valid JSON for its schema, even after repair."""
+
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors or []
+
+def loads(text):
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+def object_schema(properties, required=None):
+    return {"type": "OBJECT", "properties": properties, "required": list(required or properties)}
+
+# One saving suggestion, shared by the recommendation and carbon agents
+SUGGESTIONS = {
+    "type": "ARRAY",
+    "items": object_schema({
+        "name": {"type": "STRING"},
+        "reductionPercentage": {"type": "NUMBER"},
+        "strategy": {"type": "STRING"},
+    }),
+}
+
+def compile_schema(schema):
+    """
+    Turns a schema into a function value -> list of error strings, so the
+    schema is walked once instead of on every response.
+    """
+    kind = schema["type"].upper()
+    nullable = schema.get("nullable", False)
+
+    if kind == "OBJECT":
+        properties = {name: compile_schema(sub) for name, sub in schema.get("properties", {}).items()}
+        required = tuple(schema.get("required", ()))
+
+        def check(value, path):
+            if not isinstance(value, dict):
+                return [f"{path}: expected an object"]
+            errors = [f"{path}.{name}: missing" for name in required if name not in value]
+            for name, sub in properties.items():
+                if name in value:
+                    errors += sub(value[name], f"{path}.{name}")
+            return errors
+    elif kind == "ARRAY":
+        item = compile_schema(schema["items"])
+
+        def check(value, path):
+            if not isinstance(value, list):
+                return [f"{path}: expected an array"]
+            errors = []
+            for i, element in enumerate(value):
+                errors += item(element, f"{path}[{i}]")
+            return errors
+    else:
+        types = {
+            "STRING": (str,),
+            "NUMBER": (int, float),
+            "INTEGER": (int,),
+            "BOOLEAN": (bool,),
+        }[kind]
+        enum = set(schema.get("enum", ())) or None
+
+        def check(value, path):
+            if isinstance(value, bool) and kind != "BOOLEAN" or not isinstance(value, types):
+                return [f"{path}: expected {kind.lower()}"]
+            if enum is not None and value not in enum:
+                return [f"{path}: expected one of {sorted(enum)}"]
+            return []
+
+    def validate(value, path="$"):
+        if value is None:
+            return [] if nullable else [f"{path}: must not be null"]
+        return check(value, path)
+
+    return validate
+
+_NUMBER = re.compile(r"^[^\d\-.]*(-?[\d,]*\.?\d+)\s*(%?)")
+
+def coerce(value, schema):
+    """
+    Fixes the type slips models make most: numbers as strings ("₹3,450.50",
+    "15%"), enum values in the wrong case, and nullable fields left out.
+    """
+    kind = schema["type"].upper()
+    if value is None:
+        return None
+    if kind == "OBJECT" and isinstance(value, dict):
+        properties = schema.get("properties", {})
+        fixed = {k: coerce(v, properties[k]) if k in properties else v for k, v in value.items()}
+        for name in schema.get("required", ()):
+            if name not in fixed and properties.get(name, {}).get("nullable"):
+                fixed[name] = None
+        return fixed
+    if kind == "ARRAY" and isinstance(value, list):
+        return [coerce(v, schema["items"]) for v in value]
+    if kind in ("NUMBER", "INTEGER") and isinstance(value, str):
+        match = _NUMBER.match(value.strip())
+        if match:
+            number = float(match.group(1).replace(",", ""))
+            if match.group(2):
+                number /= 100
+            return int(number) if kind == "INTEGER" or number.is_integer() else number
+    if kind == "STRING" and isinstance(value, (int, float)) and not isinstance(value, bool) and "enum" not in schema:
+        return str(value)
+    if kind == "STRING" and isinstance(value, str) and "enum" in schema:
+        lowered = value.strip().lower()
+        return next((e for e in schema["enum"] if e.lower() == lowered), value)
+    return value
+
+def _scan(text):
+    """
+    Walks JSON-ish text outside of strings. Returns (end, stack, in_string,
+    commas): where the top-level value closes (or None), the brackets still
+    open, whether the text stops inside a string, and structural commas.
+    """
+    stack, commas = [], []
+    in_string = escaped = False
+    for i, c in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif c == "\\":
+                escaped = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c in "{[":
+            stack.append("}" if c == "{" else "]")
+        elif c in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                return i + 1, [], False, commas
+        elif c == ",":
+            commas.append(i)
+    return None, stack, in_string, commas
+
+def _strip_comments(text):
+    out, i, in_string = [], 0, False
+    while i < len(text):
+        c = text[i]
+        if in_string:
+            out.append(c)
+            if c == "\\" and i + 1 < len(text):
+                out.append(text[i + 1])
+                i += 1
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+            out.append(c)
+        elif text.startswith("//", i):
+            while i < len(text) and text[i] != "\n":
+                i += 1
+            continue
+        elif text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = len(text) if end == -1 else end + 2
+            continue
+        else:
+            out.append(c)
+        i += 1
+    return "".join(out)
+
+def repair_text(text):
+    """
+    Best-effort local repair of almost-JSON: markdown fences, prose around
+    the value, // comments, Python literals and single quotes, trailing
+    commas and output cut off mid-value. Returns the parsed value or None.
+    """
+    text = text.replace("```json", "").replace("```", "")
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        return None
+    text = _strip_comments(text[min(starts):])
+    if '"' not in text:
+        text = text.replace("'", '"')
+    text = re.sub(r"\bNone\b", "null", text)
+    text = re.sub(r"\bTrue\b", "true", re.sub(r"\bFalse\b", "false", text))
+    text = re.sub(r",\s*([}\]])", r"\1", text)
+
+    end, stack, in_string, commas = _scan(text)
+    if end is not None:
+        candidates = [text[:end]]
+    else:
+        # Truncated: close what is open, dropping incomplete members from the end
+        candidates = [text] + [text[:i] for i in reversed(commas[-50:])]
+    for candidate in candidates:
+        _, open_stack, open_string, _ = _scan(candidate)
+        closed = candidate.rstrip() + ('"' if open_string else "")
+        closed = re.sub(r"[,:]\s*$", "", closed.rstrip()) + "".join(reversed(open_stack))
+        try:
+            return loads(closed)
+        except ValueError:
+            continue
+    return None
+
+class Decoder:
+    """Parses and validates model output against one precompiled schema."""
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.validate = compile_schema(schema)
+
+    def decode(self, text):
+        """
+        Returns (value, repaired). Raises SchemaError when neither a strict
+        parse nor a local repair gives a value that matches the schema.
+        """
+        try:
+            value = loads(text)
+        except ValueError:
+            value = None
+        if value is not None and not self.validate(value):
+            return value, False
+
+        candidates = [value] if value is not None else []
+        repaired = repair_text(text)
+        if repaired is not None:
+            candidates.append(repaired)
+        errors = ["not JSON"]
+        for candidate in candidates:
+            fixed = coerce(candidate, self.schema)
+            errors = self.validate(fixed)
+            if not errors:
+                return fixed, True
+        raise SchemaError(f"Model output does not match the schema: {'; '.join(errors[:5])}", errors)
+
+def repair_prompt(text, schema, errors):
+    """A short prompt asking only to fix the output, not to redo the task."""
+    return (
+        "Fix this JSON so it matches the schema. Keep every value that is already correct.\n"
+        f"Problems: {'; '.join(errors[:5])}\n"
+        f"Schema: {json.dumps(schema, separators=(',', ':'))}\n"
+        f"JSON: {text[:4000]}\n"
+        "Return only the corrected JSON."
+    )
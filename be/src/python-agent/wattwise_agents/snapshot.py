@@ -0,0 +1,258 @@
+"""
+Weather snapshot: a refresher process fetches current conditions and the
+next day's forecast for every city we serve, and predictions read them from
+a memory-mapped file instead of calling OpenWeatherMap.
+
+The file is a header (magic, written-at time, record count) followed by
+fixed-size records sorted by normalized city name, so a lookup is a binary
+search over the mapping with no parsing and no network I/O. Each record
+carries the time its conditions were fetched; a city whose fetch failed
+keeps its previous record, and one older than WATTWISE_WEATHER_SNAPSHOT_MAX_AGE
+reads as missing, which leaves the prediction to climatology alone.
+
+    python -m wattwise_agents weather-refresh --cities cities.txt
+    WATTWISE_WEATHER_SNAPSHOT=.cache/weather.snapshot python -m wattwise_agents serve
+"""
+import os
+import sys
+import math
+import mmap
+import time
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from wattwise_agents.cache import CACHE_DIR
+from wattwise_agents.metrics import count, gauge, span
+from wattwise_agents.weather import CITY_COORDINATES, WeatherService, normalize_city
+
+DEFAULT_PATH = os.path.join(CACHE_DIR, "weather.snapshot")
+MAX_AGE = float(os.getenv("WATTWISE_WEATHER_SNAPSHOT_MAX_AGE", "3600"))
+# How often readers look for a newer file
+RELOAD_SECONDS = 1.0
+
+MAGIC = b"WWS1"
+HEADER = struct.Struct("<4sdI")  # magic, written at, records
+# city, fetched at, temperature, humidity, next-day temperature and humidity (NaN if unknown), description
+RECORD = struct.Struct("<32sdffff32s")
+
+def log(message):
+    print(f"[WeatherSnapshot] {message}", file=sys.stderr)
+
+def _text(raw):
+    return raw.rstrip(b"\0").decode("utf-8", "ignore")
+
+def _optional(value):
+    return None if math.isnan(value) else round(value, 1)
+
+def write_snapshot(path, records, written_at=None):
+    """
+    Atomically replaces `path` with `records` (city -> (fetched_at, conditions)),
+    so readers see either the old file or the new one.
+    """
+    entries = sorted((normalize_city(city).encode("utf-8")[:32], entry) for city, entry in records.items())
+    tmp = f"{path}.{os.getpid()}.tmp"
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, written_at or time.time(), len(entries)))
+        for name, (fetched_at, conditions) in entries:
+            forecast_temp = conditions.get("forecastTemp")
+            forecast_humidity = conditions.get("forecastHumidity")
+            f.write(RECORD.pack(
+                name, fetched_at, conditions["currentTemp"], conditions["humidity"],
+                math.nan if forecast_temp is None else forecast_temp,
+                math.nan if forecast_humidity is None else forecast_humidity,
+                (conditions.get("description") or "").encode("utf-8")[:32],
+            ))
+    os.replace(tmp, path)
+
+class WeatherSnapshot:
+    """Reads a snapshot file through mmap, picking up each new file the refresher writes."""
+
+    def __init__(self, path=DEFAULT_PATH, max_age=MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self._view = None  # (identity, mmap, written_at, records)
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        now = time.monotonic()
+        if self._view is not None and now - self._checked < RELOAD_SECONDS:
+            return self._view
+        with self._lock:
+            self._checked = now
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                self._view = None
+                return None
+            identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if self._view is not None and self._view[0] == identity:
+                return self._view
+            if stat.st_size < HEADER.size:
+                return self._view
+            with open(self.path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, written_at, records = HEADER.unpack_from(mapped, 0)
+            if magic != MAGIC or len(mapped) < HEADER.size + records * RECORD.size:
+                log(f"Ignoring {self.path}: not a complete snapshot")
+                return self._view
+            # The previous mapping closes once no reader holds it
+            self._view = (identity, mapped, written_at, records)
+            gauge("wattwise_weather_snapshot_written_at_seconds", written_at)
+            return self._view
+
+    def age(self):
+        """Seconds since the refresher wrote the current file, or None without one."""
+        view = self._load()
+        return None if view is None else time.time() - view[2]
+
+    def _find(self, view, key):
+        _, mapped, _, records = view
+        low, high = 0, records
+        while low < high:
+            middle = (low + high) // 2
+            name = mapped[HEADER.size + middle * RECORD.size:HEADER.size + middle * RECORD.size + 32].rstrip(b"\0")
+            if name < key:
+                low = middle + 1
+            elif name > key:
+                high = middle
+            else:
+                return RECORD.unpack_from(mapped, HEADER.size + middle * RECORD.size)
+        return None
+
+    def lookup(self, city):
+        """The recorded conditions for `city` with their "age" in seconds, however old, or None."""
+        view = self._load()
+        if view is None:
+            return None
+        record = self._find(view, normalize_city(city).encode("utf-8")[:32])
+        if record is None:
+            return None
+        _, fetched_at, temp, humidity, forecast_temp, forecast_humidity, description = record
+        return {
+            "currentTemp": round(temp, 1),
+            "humidity": round(humidity),
+            "description": _text(description),
+            "forecastTemp": _optional(forecast_temp),
+            "forecastHumidity": _optional(forecast_humidity),
+            "age": round(time.time() - fetched_at),
+        }
+
+    def current(self, city):
+        """Conditions for `city` when fetched within max_age seconds, else None."""
+        with span("weather.snapshot"):
+            conditions = self.lookup(city)
+        if conditions is None:
+            count("wattwise_weather_snapshot_total", outcome="missing")
+            return None
+        if conditions["age"] > self.max_age:
+            count("wattwise_weather_snapshot_total", outcome="stale")
+            return None
+        count("wattwise_weather_snapshot_total", outcome="fresh")
+        return conditions
+
+    def records(self):
+        """Every record as city -> (fetched_at, conditions), for carrying forward."""
+        view = self._load()
+        if view is None:
+            return {}
+        _, mapped, _, records = view
+        result = {}
+        for i in range(records):
+            name, fetched_at, temp, humidity, forecast_temp, forecast_humidity, description = RECORD.unpack_from(
+                mapped, HEADER.size + i * RECORD.size
+            )
+            result[_text(name)] = (fetched_at, {
+                "currentTemp": temp,
+                "humidity": humidity,
+                "description": _text(description),
+                "forecastTemp": _optional(forecast_temp),
+                "forecastHumidity": _optional(forecast_humidity),
+            })
+        return result
+
+def read_cities(path):
+    """City names from a file with one per line (e.g. an export of users' cities)."""
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+class SnapshotRefresher:
+    """
+    Fetches conditions for `cities` (default: every city with known
+    coordinates) with at most `concurrency` requests in flight, once per
+    location however many names share it, and writes the snapshot.
+    """
+
+    def __init__(self, fetcher, path=DEFAULT_PATH, cities=None, concurrency=8, service=None):
+        self.fetcher = fetcher
+        self.path = path
+        self.cities = sorted({normalize_city(c) for c in (cities or [])} | set(CITY_COORDINATES))
+        self.concurrency = concurrency
+        self.service = service or WeatherService(fetcher)
+
+    def fetch(self, coords):
+        conditions = self.fetcher.current(*coords)
+        try:
+            conditions.update(self.fetcher.forecast(*coords))
+        except Exception as e:
+            log(f"Forecast for {coords} unavailable: {e}")
+        return time.time(), conditions
+
+    def refresh(self):
+        """One pass over every city; returns counts of what was fetched, kept and lost."""
+        started = time.monotonic()
+        previous = WeatherSnapshot(self.path).records()
+        by_location = {}
+        unknown = 0
+        for city in self.cities:
+            try:
+                coords = self.service.locate(city)
+            except Exception as e:
+                log(f"Could not locate {city}: {e}")
+                coords = None
+            if coords is None:
+                unknown += 1
+                continue
+            by_location.setdefault(coords, []).append(city)
+
+        records, failed, carried = {}, 0, 0
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = {coords: pool.submit(self.fetch, coords) for coords in by_location}
+            for coords, future in futures.items():
+                try:
+                    entry = future.result()
+                except Exception as e:
+                    log(f"Conditions for {', '.join(by_location[coords])} unavailable: {e}")
+                    failed += 1
+                    entry = None
+                for city in by_location[coords]:
+                    if entry is not None:
+                        records[city] = entry
+                    elif city in previous:
+                        records[city] = previous[city]
+                        carried += 1
+
+        write_snapshot(self.path, records)
+        summary = {
+            "cities": len(records),
+            "locations": len(by_location),
+            "failedLocations": failed,
+            "carriedForward": carried,
+            "unknownCities": unknown,
+            "seconds": round(time.monotonic() - started, 2),
+        }
+        count("wattwise_weather_refreshes_total", outcome="partial" if failed else "ok")
+        return summary
+
+    def run(self, interval, once=False):
+        while True:
+            try:
+                log(f"Refreshed {self.path}: {self.refresh()}")
+            except Exception as e:
+                log(f"Refresh failed, keeping the previous snapshot: {e}")
+            if once:
+                return
+            time.sleep(interval)
@@ -0,0 +1,96 @@
+"""
+Streaming output: NDJSON progress events, and pulling finished array items
+out of JSON while the model is still writing it.
+
+Events are JSON objects with a "type" and "ms" (milliseconds since the
+request started):
+    footprint   carbonFootprint and impact numbers, computed locally
+    forecast    nextMonth, weatherFactor and predictedBill, computed locally
+    suggestion  one savings suggestion, as soon as it is known
+    section     one agent's complete result ("name", "result")
+    done        the complete response ("result"), always last; the worker
+                sends its usual {"id", "result"} line instead
+"""
+import sys
+import json
+import time
+import threading
+
+class Emitter:
+    """Writes events through `write`, stamped with the time since it was created."""
+
+    def __init__(self, write):
+        self.write = write
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def __call__(self, type, **data):
+        event = {"type": type, "ms": round((time.perf_counter() - self.started) * 1000, 1), **data}
+        with self._lock:
+            self.write(event)
+
+def stdout_emitter(stream=None):
+    """An Emitter printing one event per line, flushed at once."""
+    def write(event):
+        out = stream or sys.stdout
+        out.write(json.dumps(event) + "\n")
+        out.flush()
+
+    return Emitter(write)
+
+def null_emit(type, **data):
+    pass
+
+class ItemStream:
+    """
+    Fed chunks of a JSON object as they arrive, returns each element of its
+    top-level array `key` as soon as the element's closing bracket is in.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.buffer = ""
+        self.pos = 0
+        self.stack = []
+        self.in_string = self.escaped = False
+        self.string_start = None
+        self.last_string = None
+        self.array_depth = None
+        self.item_start = None
+
+    def feed(self, text):
+        self.buffer += text
+        items = []
+        for i in range(self.pos, len(self.buffer)):
+            c = self.buffer[i]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif c == "\\":
+                    self.escaped = True
+                elif c == '"':
+                    self.in_string = False
+                    if len(self.stack) == 1:
+                        self.last_string = self.buffer[self.string_start + 1:i]
+            elif c == '"':
+                self.in_string = True
+                self.string_start = i
+            elif c in "{[":
+                self.stack.append(c)
+                if c == "[" and len(self.stack) == 2 and self.last_string == self.key:
+                    self.array_depth = 2
+                elif self.array_depth is not None and len(self.stack) == self.array_depth + 1:
+                    self.item_start = i
+            elif c in "}]":
+                if self.stack:
+                    self.stack.pop()
+                if self.array_depth is not None and len(self.stack) == self.array_depth and self.item_start is not None:
+                    try:
+                        items.append(json.loads(self.buffer[self.item_start:i + 1]))
+                    except ValueError:
+                        pass
+                    self.item_start = None
+                elif self.array_depth is not None and len(self.stack) < self.array_depth:
+                    self.array_depth = None
+        self.pos = len(self.buffer)
+        return items
@@ -0,0 +1,112 @@
+import os
+import sys
+import json
+import time
+import base64
+
+# Pages sent to the model for a bill with a text layer; scans without one send page 1 only
+MAX_PAGES = int(os.getenv("WATTWISE_VISION_MAX_PAGES", "2"))
+# Longest edge of a rasterized page, and the resolution it is capped at
+MAX_EDGE = int(os.getenv("WATTWISE_VISION_MAX_EDGE", "1600"))
+MAX_DPI = 150
+JPEG_QUALITY = int(os.getenv("WATTWISE_VISION_JPEG_QUALITY", "70"))
+# Documents below this size are sent untouched
+MIN_BYTES = int(os.getenv("WATTWISE_VISION_MIN_BYTES", str(256 * 1024)))
+
+SUMMARY_KEYWORDS = (
+    "amount payable", "total amount", "net amount", "bill amount", "amount due",
+    "units consumed", "consumption", "billing period", "bill month", "due date",
+    "consumer no", "account no",
+)
+
+def log(message):
+    print(f"[BillVision] {message}", file=sys.stderr)
+
+def read_request(stream):
+    """
+    Reads a bill parser request from a binary stream. The first line is the
+    JSON payload; when it declares "pdfBytes": N, the next N bytes are the raw
+    PDF and are returned as payload["pdfData"] without any base64 copy.
+    """
+    header = stream.readline()
+    if not header.strip():
+        return None
+    try:
+        payload = json.loads(header)
+    except ValueError:
+        # Pretty-printed JSON spans several lines
+        return json.loads(header + stream.read())
+    size = payload.pop("pdfBytes", None)
+    if size is not None:
+        payload["pdfData"] = stream.read(int(size))
+    return payload
+
+def load_pdf(payload):
+    """Raw PDF bytes from pdfData, pdfPath or (legacy) pdfBase64."""
+    if payload.get("pdfData") is not None:
+        return payload["pdfData"]
+    if payload.get("pdfPath"):
+        with open(payload["pdfPath"], "rb") as f:
+            return f.read()
+    return base64.b64decode(payload["pdfBase64"])
+
+def select_pages(page_texts, max_pages=MAX_PAGES):
+    """
+    Indices of the pages most likely to hold the billing summary, in document
+    order, ranked by summary keywords in their text layer. Pure scans have no
+    text to rank, so they always get [0]: only the first page is sent, since
+    Indian utility bills put their summary there.
+    """
+    scores = [sum(keyword in text.lower() for keyword in SUMMARY_KEYWORDS) for text in page_texts]
+    ranked = sorted((i for i, score in enumerate(scores) if score), key=lambda i: (-scores[i], i))
+    return sorted(ranked[:max_pages]) or [0]
+
+def prepare(pdf_bytes):
+    """
+    Returns (parts, report): the content parts to send to Gemini and a summary
+    of what preprocessing saved. Only the summary pages are rasterized, in
+    grayscale at bounded resolution, and JPEG-compressed; for a scan without
+    a text layer that is the first page only (see select_pages). Falls back
+    to the original PDF when PyMuPDF is missing or the images would not be
+    smaller.
+    """
+    started = time.perf_counter()
+    original = {"mime_type": "application/pdf", "data": pdf_bytes}
+    report = {"originalBytes": len(pdf_bytes), "sentBytes": len(pdf_bytes), "pages": None}
+
+    def done(parts, **extra):
+        report.update(extra)
+        report["savedBytes"] = report["originalBytes"] - report["sentBytes"]
+        report["elapsedMs"] = round((time.perf_counter() - started) * 1000, 1)
+        log(f"Preprocessing: {json.dumps(report)}")
+        return parts, report
+
+    if len(pdf_bytes) < MIN_BYTES:
+        return done([original], mode="original", reason="small document")
+    try:
+        import fitz  # PyMuPDF
+    except ImportError:
+        return done([original], mode="original", reason="PyMuPDF not installed")
+
+    try:
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+            texts = [page.get_text() for page in doc]
+            pages = select_pages(texts)
+            if not any(text.strip() for text in texts):
+                report["reason"] = "no text layer, first page only"
+            images = []
+            for index in pages:
+                page = doc[index]
+                zoom = min(MAX_DPI / 72, MAX_EDGE / max(page.rect.width, page.rect.height))
+                pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY)
+                images.append(pixmap.tobytes("jpeg", jpg_quality=JPEG_QUALITY))
+            total_pages = doc.page_count
+    except Exception as e:
+        return done([original], mode="original", reason=f"rasterization failed: {e}")
+
+    sent = sum(len(image) for image in images)
+    if sent >= len(pdf_bytes):
+        return done([original], mode="original", reason="images not smaller", totalPages=total_pages)
+    report["sentBytes"] = sent
+    parts = [{"mime_type": "image/jpeg", "data": image} for image in images]
+    return done(parts, mode="pages", pages=[i + 1 for i in pages], totalPages=total_pages)
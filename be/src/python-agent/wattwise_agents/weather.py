@@ -0,0 +1,228 @@
+import os
+import sys
+import time
+import threading
+
+from wattwise_agents.cache import get_cache
+from wattwise_agents.metrics import span
+
+# Precomputed (lat, lon) for the cities our users are in, so the common case
+# needs no geocoding round-trip. Anything else is geocoded once and cached.
+CITY_COORDINATES = {
+    "mumbai": (19.0760, 72.8777),
+    "thane": (19.2183, 72.9781),
+    "navi mumbai": (19.0330, 73.0297),
+    "pune": (18.5204, 73.8567),
+    "nagpur": (21.1458, 79.0882),
+    "nashik": (19.9975, 73.7898),
+    "delhi": (28.7041, 77.1025),
+    "new delhi": (28.6139, 77.2090),
+    "noida": (28.5355, 77.3910),
+    "gurugram": (28.4595, 77.0266),
+    "gurgaon": (28.4595, 77.0266),
+    "ghaziabad": (28.6692, 77.4538),
+    "faridabad": (28.4089, 77.3178),
+    "bengaluru": (12.9716, 77.5946),
+    "bangalore": (12.9716, 77.5946),
+    "mysuru": (12.2958, 76.6394),
+    "hyderabad": (17.3850, 78.4867),
+    "chennai": (13.0827, 80.2707),
+    "coimbatore": (11.0168, 76.9558),
+    "madurai": (9.9252, 78.1198),
+    "kochi": (9.9312, 76.2673),
+    "thiruvananthapuram": (8.5241, 76.9366),
+    "visakhapatnam": (17.6868, 83.2185),
+    "vijayawada": (16.5062, 80.6480),
+    "kolkata": (22.5726, 88.3639),
+    "bhubaneswar": (20.2961, 85.8245),
+    "patna": (25.5941, 85.1376),
+    "ranchi": (23.3441, 85.3096),
+    "guwahati": (26.1445, 91.7362),
+    "shillong": (25.5788, 91.8933),
+    "ahmedabad": (23.0225, 72.5714),
+    "surat": (21.1702, 72.8311),
+    "vadodara": (22.3072, 73.1812),
+    "rajkot": (22.3039, 70.8022),
+    "jaipur": (26.9124, 75.7873),
+    "jodhpur": (26.2389, 73.0243),
+    "lucknow": (26.8467, 80.9462),
+    "kanpur": (26.4499, 80.3319),
+    "agra": (27.1767, 78.0081),
+    "varanasi": (25.3176, 82.9739),
+    "meerut": (28.9845, 77.7064),
+    "indore": (22.7196, 75.8577),
+    "bhopal": (23.2599, 77.4126),
+    "raipur": (21.2514, 81.6296),
+    "chandigarh": (30.7333, 76.7794),
+    "ludhiana": (30.9010, 75.8573),
+    "amritsar": (31.6340, 74.8723),
+    "dehradun": (30.3165, 78.0322),
+    "shimla": (31.1048, 77.1734),
+    "jammu": (32.7266, 74.8570),
+    "srinagar": (34.0837, 74.7973),
+    "panaji": (15.4909, 73.8278),
+    "goa": (15.4909, 73.8278),
+}
+
+GEOCODE_TTL = 30 * 86400
+CONDITIONS_TTL = float(os.getenv("WATTWISE_WEATHER_TTL", "900"))
+
+def normalize_city(city):
+    return " ".join((city or "").split()).casefold()
+
+class OpenWeatherFetcher:
+    """
+    Talks to OpenWeatherMap over one pooled keep-alive session. Point
+    OPENWEATHER_BASE_URL at a local stub server to test without the real API.
+    """
+
+    def __init__(self, api_key, base_url=None, timeout=5, pool_size=16):
+        self.api_key = api_key
+        self.base_url = (base_url or os.getenv("OPENWEATHER_BASE_URL", "https://api.openweathermap.org")).rstrip("/")
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._session = session
+        return self._session
+
+    def geocode(self, city):
+        with span("weather.http.geocode"):
+            response = self.session.get(
+                f"{self.base_url}/geo/1.0/direct",
+                params={"q": f"{city},IN", "limit": 1, "appid": self.api_key},
+                timeout=self.timeout,
+            )
+            geo_data = response.json()
+        if not geo_data:
+            return None
+        return geo_data[0]['lat'], geo_data[0]['lon']
+
+    def current(self, lat, lon):
+        with span("weather.http.current"):
+            response = self.session.get(
+                f"{self.base_url}/data/2.5/weather",
+                params={"lat": lat, "lon": lon, "appid": self.api_key, "units": "metric"},
+                timeout=self.timeout,
+            )
+            weather_data = response.json()
+        return {
+            "currentTemp": weather_data['main']['temp'],
+            "humidity": weather_data['main']['humidity'],
+            "description": weather_data['weather'][0]['description'],
+        }
+
+    def forecast(self, lat, lon, hours=24):
+        """Mean temperature and humidity over the next `hours` of the 3-hourly forecast."""
+        with span("weather.http.forecast"):
+            response = self.session.get(
+                f"{self.base_url}/data/2.5/forecast",
+                params={"lat": lat, "lon": lon, "appid": self.api_key, "units": "metric", "cnt": max(hours // 3, 1)},
+                timeout=self.timeout,
+            )
+            steps = response.json()['list']
+        return {
+            "forecastTemp": sum(step['main']['temp'] for step in steps) / len(steps),
+            "forecastHumidity": sum(step['main']['humidity'] for step in steps) / len(steps),
+        }
+
+class WeatherService:
+    """
+    Current conditions per city, shared by every prediction in the process.
+    Conditions are cached for CONDITIONS_TTL seconds and concurrent requests
+    for the same city wait for a single upstream fetch. With a `snapshot`
+    (see snapshot.py) conditions are only read from it, never fetched.
+    """
+
+    def __init__(self, fetcher=None, ttl=CONDITIONS_TTL, cache=None, snapshot=None):
+        self.fetcher = fetcher
+        self.snapshot = snapshot
+        self.ttl = ttl
+        self.cache = cache or get_cache()
+        self.coordinates = dict(CITY_COORDINATES)
+        self.conditions = {}  # city -> (fetched_at, conditions)
+        self._city_locks = {}
+        self._lock = threading.Lock()
+
+    def _city_lock(self, key):
+        with self._lock:
+            return self._city_locks.setdefault(key, threading.Lock())
+
+    def locate(self, city):
+        key = normalize_city(city)
+        coords = self.coordinates.get(key)
+        if coords is not None:
+            return coords
+        cached = self.cache.get("geocode", {"city": key})
+        if cached is not None:
+            coords = (cached["lat"], cached["lon"])
+        else:
+            coords = self.fetcher.geocode(city)
+            if coords is None:
+                return None
+            self.cache.set("geocode", {"city": key}, {"lat": coords[0], "lon": coords[1]})
+        self.coordinates[key] = coords
+        return coords
+
+    def current(self, city):
+        """
+        Returns current temperature, humidity and description, or None when
+        no fetcher is configured or the upstream call fails.
+        """
+        if self.snapshot is not None:
+            return self.snapshot.current(city) if city else None
+        if self.fetcher is None or not city:
+            return None
+        key = normalize_city(city)
+        entry = self.conditions.get(key)
+        if entry is not None and time.time() - entry[0] < self.ttl:
+            return entry[1]
+
+        with self._city_lock(key):
+            entry = self.conditions.get(key)
+            if entry is not None and time.time() - entry[0] < self.ttl:
+                return entry[1]
+            try:
+                coords = self.locate(city)
+                if coords is None:
+                    return None
+                conditions = self.fetcher.current(*coords)
+            except Exception as e:
+                print(f"Weather API error: {e}", file=sys.stderr)
+                return None
+            self.conditions[key] = (time.time(), conditions)
+            return conditions
+
+_shared = None
+_shared_lock = threading.Lock()
+
+def get_weather_service():
+    """
+    The process-wide weather service: reading the refresher's snapshot when
+    WATTWISE_WEATHER_SNAPSHOT names one, else using OPENWEATHER_API_KEY when set.
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            snapshot_path = os.getenv("WATTWISE_WEATHER_SNAPSHOT")
+            api_key = os.getenv("OPENWEATHER_API_KEY")
+            if snapshot_path:
+                from wattwise_agents.snapshot import WeatherSnapshot
+
+                _shared = WeatherService(snapshot=WeatherSnapshot(snapshot_path))
+            else:
+                _shared = WeatherService(OpenWeatherFetcher(api_key) if api_key else None)
+        return _shared
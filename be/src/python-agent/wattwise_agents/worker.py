@@ -0,0 +1,171 @@
+import sys
+import json
+import os
+import threading
+import importlib
+import socketserver
+from concurrent.futures import ThreadPoolExecutor
+
+from wattwise_agents.metrics import span
+from wattwise_agents.streaming import Emitter
+
+# agent name -> ("module:Class", method called with the request payload)
+AGENTS = {
+    "carbon": ("agent:CarbonFootprintAgent", "analyze"),
+    "co2": ("co2_agent:CO2Agent", "analyze"),
+    "recommendation": ("recommendation_agent:RecommendationAgent", "analyze"),
+    "combined": ("combined_agent:CombinedAnalysisAgent", "analyze"),
+    "weather": ("weather_prediction_agent:WeatherPredictionAgent", "predict"),
+    "bill": ("bill_parser_agent:BillPdfParserAgent", "parse"),
+    "analyze": ("wattwise_agents.dispatcher:AnalysisDispatcher", "run"),
+}
+
+def log(message):
+    """Log to stderr so it doesn't interfere with the NDJSON stdout protocol"""
+    print(f"[AgentWorker] {message}", file=sys.stderr)
+
+def _resolve(target):
+    if callable(target):
+        return target
+    module_name, class_name = target.split(":")
+    with span("worker.import", module=module_name):
+        module = importlib.import_module(module_name)
+    return getattr(module, class_name)
+
+class AgentWorker:
+    """
+    Keeps one warm instance of every agent and answers newline-delimited JSON
+    requests of the form {"id": ..., "agent": "co2", "payload": {...}}.
+
+    A request with "stream": true, to an agent that has a stream method, also
+    gets {"id": ..., "event": {...}} lines (see streaming.py) as results become
+    ready, before its usual response line.
+    """
+
+    def __init__(self, agents=None, max_workers=None):
+        self.specs = agents or AGENTS
+        self.max_workers = max_workers or int(os.getenv("WATTWISE_WORKER_THREADS", "8"))
+        self.instances = {}
+        self._lock = threading.RLock()
+
+    def get_agent(self, name):
+        """Returns the resident instance of an agent, constructing it on first use."""
+        agent = self.instances.get(name)
+        if agent is not None:
+            return agent
+        with self._lock:
+            if name not in self.instances:
+                target, _ = self.specs[name]
+                factory = _resolve(target)
+                with span("worker.construct", agent=name):
+                    if getattr(factory, "composite", False):
+                        # Composite agents share the resident instances of the others
+                        self.instances[name] = factory(self.get_agent)
+                    else:
+                        self.instances[name] = factory()
+                log(f"Agent ready: {name}")
+            return self.instances[name]
+
+    def warm(self):
+        """
+        Constructs every agent up front, and loads the Gemini SDK the agents
+        would otherwise import lazily, so the first request pays nothing.
+        """
+        for name in self.specs:
+            try:
+                model = getattr(self.get_agent(name), "model", None)
+                if hasattr(model, "load"):
+                    model.load()
+            except Exception as e:
+                log(f"Could not warm {name}: {e}")
+
+    def handle(self, request, send=None):
+        """
+        Runs a single request and returns the tagged response. Streaming
+        requests pass their event lines to `send`.
+        """
+        request_id = request.get("id")
+        name = request.get("agent")
+
+        if name == "ping":
+            return {"id": request_id, "result": {"agents": sorted(self.instances)}}
+        if name == "stats":
+            from wattwise_agents.cache import get_cache
+            from wattwise_agents.scheduler import get_scheduler
+            return {"id": request_id, "result": {"cache": get_cache().stats(), "scheduler": get_scheduler().stats()}}
+        if name not in self.specs:
+            return {"id": request_id, "error": f"Unknown agent: {name}"}
+
+        try:
+            agent = self.get_agent(name)
+            method = getattr(agent, self.specs[name][1])
+            payload = request.get("payload") or {}
+            stream = getattr(agent, "stream", None) if request.get("stream") and send else None
+            with span("worker.request", agent=name):
+                if stream is not None:
+                    result = stream(payload, Emitter(lambda event: send({"id": request_id, "event": event})))
+                else:
+                    result = method(payload)
+        except Exception as e:
+            return {"id": request_id, "error": str(e)}
+
+        if isinstance(result, dict) and "error" in result:
+            return {"id": request_id, "error": result["error"]}
+        return {"id": request_id, "result": result}
+
+    def handle_line(self, line, send=None):
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return {"id": None, "error": "Invalid JSON request"}
+        if not isinstance(request, dict):
+            return {"id": None, "error": "Request must be a JSON object"}
+        return self.handle(request, send)
+
+    def serve_stream(self, infile=None, outfile=None):
+        """
+        Serves requests from a line stream (stdin by default). Requests run
+        concurrently and responses are written as soon as each one finishes,
+        so callers must match them up by id.
+        """
+        infile = infile or sys.stdin
+        outfile = outfile or sys.stdout
+        write_lock = threading.Lock()
+
+        def send(message):
+            with write_lock:
+                outfile.write(json.dumps(message) + "\n")
+                outfile.flush()
+
+        def respond(line):
+            send(self.handle_line(line, send))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for line in infile:
+                if line.strip():
+                    pool.submit(respond, line)
+
+    def serve_unix(self, socket_path):
+        """Serves the same protocol on a local Unix socket, one thread per connection."""
+        worker = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def send(self, message):
+                self.wfile.write((json.dumps(message) + "\n").encode("utf-8"))
+                self.wfile.flush()
+
+            def handle(self):
+                for raw in self.rfile:
+                    line = raw.decode("utf-8")
+                    if not line.strip():
+                        continue
+                    self.send(worker.handle_line(line, self.send))
+
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        with socketserver.ThreadingUnixStreamServer(socket_path, Handler) as server:
+            log(f"Listening on {socket_path}")
+            try:
+                server.serve_forever()
+            finally:
+                os.unlink(socket_path)
@@ -1,122 +1,151 @@
 import sys
 import json
 import os
-import requests
-import google.generativeai as genai
-from dotenv import load_dotenv
-from datetime import datetime
-
-# Load environment variables
-load_dotenv()
-
-class WeatherPredictionAgent:
-    def __init__(self):
-        self.api_key = os.getenv("GEMINI_API_KEY")
-        self.weather_api_key = os.getenv("OPENWEATHER_API_KEY")  # Optional
-        if not self.api_key:
-            raise ValueError("GEMINI_API_KEY not found")
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-2.0-flash')
+from wattwise_agents.cache import get_cache
+from wattwise_agents.climatology import Climatology, explain
+from wattwise_agents.metrics import span
+from wattwise_agents.runtime import CallPolicy, GeminiAgent
+from wattwise_agents.streaming import null_emit
+from wattwise_agents.weather import get_weather_service
+
+# "model" asks Gemini to phrase the reasoning, "template" never calls it
+REASONING_MODE = os.getenv("WATTWISE_WEATHER_REASONING", "model")
+REASONING_TIMEOUT = float(os.getenv("WATTWISE_WEATHER_REASONING_TIMEOUT", "3"))
+
+class WeatherPredictionAgent(GeminiAgent):
+    name = "weather"
+    model_name = 'gemini-2.0-flash'
+    # The template is a fine answer, so one quick retry at most
+    policy = CallPolicy(timeout=REASONING_TIMEOUT, retries=1, backoff=0.2)
+    # Queues behind uploads and analyses when quota is short; the template covers it
+    priority = "background"
+
+    def __init__(self, cache=None, weather=None, climatology=None):
+        # The forecast is computed locally; the model is only used for wording
+        super().__init__(use_model=REASONING_MODE == "model", require_model=False)
+        self.cache = cache or get_cache()
+        self.weather = weather or get_weather_service()  # Live conditions are optional
+        self.climatology = climatology or Climatology()
     
     def get_weather_data(self, city):
         """
         Fetch current weather data from OpenWeatherMap API (optional).
         Returns current temperature, humidity, and description.
         """
-        if not self.weather_api_key:
-            return None
-        
-        try:
-            # Get city coordinates first
-            geo_url = f"http://api.openweathermap.org/geo/1.0/direct?q={city},IN&limit=1&appid={self.weather_api_key}"
-            geo_response = requests.get(geo_url, timeout=5)
-            geo_data = geo_response.json()
-            
-            if not geo_data:
-                return None
-            
-            lat = geo_data[0]['lat']
-            lon = geo_data[0]['lon']
-            
-            # Get current weather
-            weather_url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={self.weather_api_key}&units=metric"
-            weather_response = requests.get(weather_url, timeout=5)
-            weather_data = weather_response.json()
-            
-            return {
-                "currentTemp": weather_data['main']['temp'],
-                "humidity": weather_data['main']['humidity'],
-                "description": weather_data['weather'][0]['description']
-            }
-        except Exception as e:
-            print(f"Weather API error: {e}", file=sys.stderr)
-            return None
+        return self.weather.current(city)
     
-    def predict(self, data):
-        """
-        Predicts next month's bill change based on weather/seasonal factors.
-        """
-        city = data.get('city')
-        current_month = data.get('currentMonth')  # e.g., "November"
-        current_bill = data.get('currentBill')
-        appliances = data.get('appliances', [])
-        
-        # Try to get real weather data
-        weather_data = self.get_weather_data(city)
+    def build_prompt(self, data, prediction, weather_data):
+        climate = prediction["climate"]
         weather_context = ""
-        
         if weather_data:
-            weather_context = f"""
-            Current Weather Data for {city}:
-            - Temperature: {weather_data['currentTemp']}°C
-            - Humidity: {weather_data['humidity']}%
-            - Conditions: {weather_data['description']}
-            
-            Use this real data to make more accurate predictions.
-            """
-        
-        prompt = f"""
+            weather_context = (
+                f"Current conditions: {weather_data['currentTemp']}°C, "
+                f"{weather_data['humidity']}% humidity, {weather_data['description']}."
+            )
+            if weather_data.get("forecastTemp") is not None:
+                weather_context += (
+                    f" Next 24 hours: {weather_data['forecastTemp']}°C, "
+                    f"{weather_data['forecastHumidity']}% humidity."
+                )
+
+        return f"""
         You are a Weather-Based Energy Consumption Predictor for India.
-        
-        Input Data:
-        - City: {city}
-        - Current Month: {current_month}
-        - Current Bill: ₹{current_bill}
-        - Appliances: {json.dumps(appliances, indent=2)}
-        
+        Explain this forecast to a household in two or three sentences.
+
+        - City: {data.get('city')}
+        - Current Month: {data.get('currentMonth')}, next month: {prediction['nextMonth']}
+        - Next month normals: {climate['nextMonthTemp']}°C, {climate['nextMonthHumidity']}% humidity
+        - Usage change by appliance class (next / current): {json.dumps(climate['classRatios'])}
+        - Bill factor: {prediction['weatherFactor']} (₹{data.get('currentBill')} -> ₹{prediction['predictedBill']})
         {weather_context}
-        
-        Task:
-        1. Analyze typical weather patterns for {city} in the NEXT month (consider Indian climate)
-        2. Consider seasonal changes (temperature, humidity, monsoon, summer, winter)
-        3. Predict how appliance usage will change:
-           - AC/Cooling: increases in summer (Mar-Jun), decreases in winter/monsoon
-           - Fans: high in summer, moderate in other seasons
-           - Heating: increases in winter (Dec-Feb) in northern cities
-           - Refrigerator: slightly higher in summer
-           - Other appliances: minimal seasonal change
-        
-        4. Calculate the percentage change in total bill for next month
-        
-        Important: Be realistic. Most changes are between 0.8x to 1.5x
-        
-        Output JSON Format:
-        {{
-            "nextMonth": "December",
-            "weatherFactor": 1.2,
-            "predictedBill": {current_bill * 1.2},
-            "reasoning": "December in {city} is typically cooler (15-20°C), reducing AC usage by 80% but fans still used moderately. Net effect: 20% increase in bill due to increased lighting hours."
-        }}
-        
-        Return ONLY valid JSON.
+
+        Use exactly these numbers. Return ONLY the explanation, no JSON or markdown.
         """
-        
+
+    def cache_key(self, data):
+        return {
+            "city": data.get('city'),
+            "currentMonth": data.get('currentMonth'),
+            "currentBill": data.get('currentBill'),
+            "appliances": data.get('appliances', []),
+        }
+
+    def predict(self, data):
+        """
+        Predicts next month's bill change based on weather/seasonal factors.
+        """
+        return self.cache.get_or_compute("weather", self.cache_key(data), lambda: self._predict(data))
+
+    async def predict_async(self, data, emit=null_emit):
+        """
+        Same as predict, but runs the weather lookup off the event loop and awaits the model call.
+        The numbers are also passed to emit("forecast", ...) before the reasoning is asked for.
+        """
+        return await self.cache.get_or_compute_async(
+            "weather", self.cache_key(data), lambda: self._predict_async(data, emit)
+        )
+
+    def stream(self, data, emit):
+        """predict for the worker's streaming requests."""
+        import asyncio
+
+        return asyncio.run(self.predict_async(data, emit))
+
+    def _result(self, data, prediction, reasoning, degraded=None):
+        result = {
+            "nextMonth": prediction["nextMonth"],
+            "weatherFactor": prediction["weatherFactor"],
+            "predictedBill": prediction["predictedBill"],
+            "reasoning": reasoning or explain(data, prediction),
+        }
+        if degraded is not None:
+            # The template stood in for a failed model call; not cached, so the next request retries
+            result["degraded"] = degraded
+        return result
+
+    def _predict(self, data):
+        try:
+            # Try to get real weather data
+            with span("weather.conditions"):
+                weather_data = self.get_weather_data(data.get('city'))
+            with span("weather.climatology"):
+                prediction = self.climatology.predict(data, live=weather_data)
+        except Exception as e:
+            return {"error": str(e)}
+
+        reasoning = degraded = None
+        if self.model is not None:
+            with span("weather.prompt"):
+                prompt = self.build_prompt(data, prediction, weather_data)
+            try:
+                reasoning = self.generate_text(prompt)
+            except Exception as e:
+                print(f"Weather reasoning fell back to template: {e}", file=sys.stderr)
+                degraded = str(e)
+        return self._result(data, prediction, reasoning, degraded)
+
+    async def _predict_async(self, data, emit=null_emit):
+        import asyncio  # Only the dispatcher's event loop takes this path
+
         try:
-            response = self.model.generate_content(prompt)
-            text = response.text.replace('```json', '').replace('```', '').strip()
-            return json.loads(text)
+            with span("weather.conditions"):
+                weather_data = await asyncio.to_thread(self.get_weather_data, data.get('city'))
+            with span("weather.climatology"):
+                prediction = self.climatology.predict(data, live=weather_data)
         except Exception as e:
             return {"error": str(e)}
+        emit("forecast", **{field: prediction[field] for field in ("nextMonth", "weatherFactor", "predictedBill")})
+
+        reasoning = degraded = None
+        if self.model is not None:
+            with span("weather.prompt"):
+                prompt = self.build_prompt(data, prediction, weather_data)
+            try:
+                reasoning = await self.generate_text_async(prompt)
+            except Exception as e:
+                print(f"Weather reasoning fell back to template: {e}", file=sys.stderr)
+                degraded = str(e)
+        return self._result(data, prediction, reasoning, degraded)
 
 if __name__ == "__main__":
     try:
@@ -4,5 +4,6 @@ import { AIController } from "../controllers/AIController";
 const router = Router();
 
 router.post("/analyze", AIController.analyze);
+router.post("/analyze/stream", AIController.analyzeStream);
 
 export default router;
@@ -0,0 +1,127 @@
+import { spawn, ChildProcessWithoutNullStreams } from "child_process";
+import path from "path";
+import readline from "readline";
+import { AILogger } from "../utils/aiLogger";
+
+interface PendingCall {
+  label: string;
+  resolve: (result: any) => void;
+  reject: (error: Error) => void;
+  onEvent?: (event: any) => void;
+}
+
+/**
+ * Client for the resident Python agent worker (`python -m wattwise_agents serve`).
+ * The worker is started once and keeps every agent warm; requests are sent as
+ * newline-delimited JSON and matched to responses by id. Streaming calls also
+ * receive the worker's {id, event} lines before their response.
+ */
+export class AgentWorker {
+  private static process: ChildProcessWithoutNullStreams | null = null;
+  private static pending = new Map<string, PendingCall>();
+  private static nextId = 0;
+
+  static pythonExecutable = path.resolve(
+    __dirname,
+    "../../venv/Scripts/python.exe"
+  );
+  static agentDir = path.join(__dirname, "../python-agent");
+
+  private static start(): ChildProcessWithoutNullStreams {
+    if (this.process) {
+      return this.process;
+    }
+
+    AILogger.log("Starting resident Python agent worker...");
+    const child = spawn(
+      this.pythonExecutable,
+      ["-m", "wattwise_agents", "serve"],
+      { cwd: this.agentDir }
+    );
+
+    readline
+      .createInterface({ input: child.stdout })
+      .on("line", (line) => this.onLine(line));
+
+    child.stderr.on("data", (data) => {
+      console.log(`[AgentWorker] ${data.toString()}`);
+    });
+
+    child.stdin.on("error", (err) => {
+      AILogger.error("Agent worker stdin error", err);
+    });
+
+    child.on("error", (err) => {
+      AILogger.error("Failed to start agent worker", err);
+      this.failAll(new Error(`Failed to start agent worker: ${err.message}`));
+    });
+
+    child.on("close", (code) => {
+      AILogger.error(`Agent worker exited with code ${code}`);
+      this.failAll(new Error("Agent worker exited"));
+    });
+
+    this.process = child;
+    return child;
+  }
+
+  private static onLine(line: string) {
+    let message: any;
+    try {
+      message = JSON.parse(line);
+    } catch (e) {
+      AILogger.error("Invalid line from agent worker", line);
+      return;
+    }
+
+    const call = this.pending.get(String(message.id));
+    if (!call) {
+      return;
+    }
+    if (message.event !== undefined) {
+      call.onEvent?.(message.event);
+      return;
+    }
+    this.pending.delete(String(message.id));
+
+    if (message.error) {
+      AILogger.error(`${call.label} Agent failed`, message.error);
+      call.reject(new Error(message.error));
+    } else {
+      call.resolve(message.result);
+    }
+  }
+
+  private static failAll(error: Error) {
+    this.process = null;
+    for (const call of this.pending.values()) {
+      call.reject(error);
+    }
+    this.pending.clear();
+  }
+
+  /**
+   * Sends a payload to one of the resident agents (co2, recommendation,
+   * weather, bill) and resolves with its result. With onEvent the request
+   * is streamed: footprint, forecast and suggestion events are passed to it
+   * as they become ready.
+   */
+  static call(
+    agent: string,
+    payload: unknown,
+    label = agent,
+    onEvent?: (event: any) => void
+  ): Promise<any> {
+    const child = this.start();
+    const id = String(++this.nextId);
+
+    return new Promise((resolve, reject) => {
+      this.pending.set(id, { label, resolve, reject, onEvent });
+      AILogger.log(`Dispatching to ${label} Agent (request ${id})...`);
+      const request = onEvent
+        ? { id, agent, payload, stream: true }
+        : { id, agent, payload };
+      child.stdin.write(JSON.stringify(request) + "\n");
+    });
+  }
+}